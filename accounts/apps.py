@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "accounts"
+
+    def ready(self):
+        from core.metrics import registry
+
+        from . import signals  # noqa: F401
+        from .hashing import hashing_pool
+
+        registry.register_collector(hashing_pool.collect_metrics)
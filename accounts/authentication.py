@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from core.cache import local_timeout
+
+from .models import TokenRevocation
+
+
+def _revoked_key(user_id):
+    return f"accounts:jwt-revoked:{user_id}"
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of verified access tokens, keyed by their signature.
+
+    Entries expire with the token's ``exp`` claim.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, raw_token):
+        signature = raw_token.rpartition(b".")[2]
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                return None
+            token, user, validated_token, expires_at = entry
+            if token != raw_token or expires_at <= time.time():
+                del self._entries[signature]
+                return None
+            self._entries.move_to_end(signature)
+        return user, validated_token
+
+    def set(self, raw_token, user, validated_token):
+        signature = raw_token.rpartition(b".")[2]
+        expires_at = validated_token.get("exp", 0)
+        with self._lock:
+            self._entries[signature] = (raw_token, user, validated_token, expires_at)
+            self._entries.move_to_end(signature)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard_user(self, user_id):
+        """Remove every cached token of a user."""
+        with self._lock:
+            for signature, entry in list(self._entries.items()):
+                if entry[1].id == user_id:
+                    del self._entries[signature]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = VerifiedTokenCache(settings.JWT_AUTH_CACHE_SIZE)
+
+
+def revocation_timeout():
+    """Return the seconds a revocation matters, the longest token lifetime."""
+    lifetime = max(
+        jwt_settings.ACCESS_TOKEN_LIFETIME, jwt_settings.REFRESH_TOKEN_LIFETIME
+    )
+    return int(lifetime.total_seconds()) + 1
+
+
+def revoke_user_tokens(user_id):
+    """
+    Reject every access and refresh token issued to a user before the
+    current second, e.g. after the user was deactivated or changed their
+    password. Tokens issued in the same second, such as those of the login
+    that follows a password change, stay valid.
+
+    The revocation is stored in the database and in the default cache, see
+    `get_revoked_at`.
+    """
+    revoked_at = int(time.time())
+    token_cache.discard_user(user_id)
+    TokenRevocation.objects.update_or_create(
+        user_id=user_id, defaults={"revoked_at": revoked_at}
+    )
+    cache = caches[DEFAULT_CACHE_ALIAS]
+    cache.set(
+        _revoked_key(user_id), revoked_at, local_timeout(cache, revocation_timeout())
+    )
+
+
+def get_revoked_at(user_id):
+    """
+    Return the second before which the tokens of a user are revoked, 0 when
+    they never were.
+
+    Read from the default cache, falling back to the database when the cache
+    does not have it. A per process cache misses the revocations made by
+    other workers, so it only keeps them for ``LOCAL_CACHE_TIMEOUT``
+    seconds.
+    """
+    cache = caches[DEFAULT_CACHE_ALIAS]
+    key = _revoked_key(user_id)
+    revoked_at = cache.get(key)
+    if revoked_at is None:
+        revoked_at = _stored_revoked_at(user_id)
+        # add() does not overwrite a revocation made meanwhile
+        cache.add(key, revoked_at, local_timeout(cache, revocation_timeout()))
+    return revoked_at
+
+
+async def aget_revoked_at(user_id):
+    """Same as `get_revoked_at`, for async views."""
+    cache = caches[DEFAULT_CACHE_ALIAS]
+    key = _revoked_key(user_id)
+    revoked_at = await cache.aget(key)
+    if revoked_at is None:
+        revoked_at = await _astored_revoked_at(user_id)
+        await cache.aadd(key, revoked_at, local_timeout(cache, revocation_timeout()))
+    return revoked_at
+
+
+def _revocations(user_id):
+    return TokenRevocation.objects.filter(user_id=user_id).values_list(
+        "revoked_at", flat=True
+    )
+
+
+def _stored_revoked_at(user_id):
+    return _revocations(user_id).first() or 0
+
+
+async def _astored_revoked_at(user_id):
+    return await _revocations(user_id).afirst() or 0
+
+
+def is_revoked(token, revoked_at):
+    """Return whether ``token`` was issued before ``revoked_at``."""
+    return token.get("iat", 0) < revoked_at
+
+
+class CachedJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication that does not load the user from the database.
+
+    Verified tokens are kept in an in-process LRU cache so the signature is
+    only checked the first time a token is seen, and the user is a
+    lightweight ``TokenUser`` built from the token claims instead of a row
+    loaded from ``auth_user``. Tokens issued before ``revoke_user_tokens()``
+    was called for their user are rejected, which takes no query once the
+    revocation is cached.
+    """
+
+    def authenticate(self, request):
+        user_token = self.get_cached_user_token(request)
+        if user_token is None:
+            return None
+        self.check_revoked(*user_token, get_revoked_at(user_token[0].id))
+        return user_token
+
+    async def aauthenticate(self, request):
+        """
+        Same as ``authenticate()``, for async views. ``request`` may be a
+        plain ``HttpRequest``.
+        """
+        user_token = self.get_cached_user_token(request)
+        if user_token is None:
+            return None
+        revoked_at = await aget_revoked_at(user_token[0].id)
+        self.check_revoked(*user_token, revoked_at)
+        return user_token
+
+    def get_cached_user_token(self, request):
+        """
+        Return ``(user, validated_token)`` for the request's token, from the
+        verified token cache when possible, or ``None`` without a token.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        cached = token_cache.get(raw_token)
+        if cached is None:
+            validated_token = self.get_validated_token(raw_token)
+            user = self.get_user(validated_token)
+            token_cache.set(raw_token, user, validated_token)
+            return user, validated_token
+        return cached
+
+    def check_revoked(self, user, validated_token, revoked_at):
+        if is_revoked(validated_token, revoked_at):
+            raise AuthenticationFailed(
+                _("The user's tokens have been revoked."), code="token_revoked"
+            )
@@ -0,0 +1,186 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import Throttled
+
+logger = logging.getLogger(__name__)
+
+
+class HashingPoolSaturated(Throttled):
+    """Raised when too many password hashes are already queued."""
+
+    default_detail = _("Too many login attempts in progress, please retry shortly.")
+    default_code = "hashing_pool_saturated"
+
+
+def _init_worker():
+    """Set up Django in a freshly spawned hashing worker."""
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings.settings")
+    django.setup()
+
+
+class PasswordHashingPool:
+    """
+    Bounded process pool for password hashing.
+
+    Hashing is CPU bound, running it in worker processes keeps a burst of
+    logins from holding every request thread (and the GIL). At most
+    ``PASSWORD_HASHING_MAX_PENDING`` hashes are queued or running at once,
+    further requests are shed with ``HashingPoolSaturated`` (HTTP 429).
+    ``PASSWORD_HASHING_WORKERS = 0`` hashes in the calling thread, with the
+    same queue limit.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.peak_pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        # Stop the workers before interpreter shutdown tears down the modules
+        # the executor needs.
+        atexit.register(self.shutdown)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def _reset_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """Stop the worker processes, a new pool is started when needed."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func, *args):
+        """Run ``func(*args)`` in the pool and return its result."""
+        with self._lock:
+            if self.pending >= settings.PASSWORD_HASHING_MAX_PENDING:
+                self.rejected += 1
+                logger.warning("Password hashing pool saturated: %s", self._stats())
+                raise HashingPoolSaturated(wait=1)
+            self.pending += 1
+            self.submitted += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+
+        if not settings.PASSWORD_HASHING_WORKERS:
+            try:
+                result = func(*args)
+            except BaseException:
+                self._release(succeeded=False)
+                raise
+            self._release(succeeded=True)
+            return result
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(func, *args)
+            result = future.result(timeout=settings.PASSWORD_HASHING_TIMEOUT)
+        except FutureTimeoutError:
+            # Dropped if it is still queued. A running hash cannot be stopped,
+            # it keeps its slot until it ends so the queue stays bounded.
+            future.cancel()
+            future.add_done_callback(self._release_future)
+            raise HashingPoolSaturated(wait=1)
+        except BaseException as exc:
+            self._release(succeeded=False)
+            if isinstance(exc, BrokenProcessPool):
+                # A worker died, start a new pool for the next request.
+                self._reset_executor(executor)
+            raise
+        self._release(succeeded=True)
+        return result
+
+    def _release(self, succeeded):
+        with self._lock:
+            self.pending -= 1
+            if succeeded:
+                self.completed += 1
+
+    def _release_future(self, future):
+        self._release(not future.cancelled() and future.exception() is None)
+
+    def _stats(self):
+        return {
+            "workers": settings.PASSWORD_HASHING_WORKERS,
+            "max_pending": settings.PASSWORD_HASHING_MAX_PENDING,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def stats(self):
+        """Return the pool saturation counters."""
+        with self._lock:
+            return self._stats()
+
+    def collect_metrics(self):
+        """Return the pool counters as a metrics collector, see `core.metrics`."""
+        stats = self.stats()
+        return [
+            (
+                f"password_hashing_{name}",
+                documentation,
+                kind,
+                {(): stats[name]},
+            )
+            for name, documentation, kind in (
+                ("pending", "Hashes queued or running.", "gauge"),
+                ("peak_pending", "Most hashes queued or running at once.", "gauge"),
+                ("submitted", "Hashes submitted to the pool.", "counter"),
+                ("rejected", "Hashes rejected by a saturated pool.", "counter"),
+            )
+        ]
+
+
+hashing_pool = PasswordHashingPool()
+
+
+def make_password(password):
+    """Hash ``password`` with the preferred hasher in the hashing pool."""
+    return hashing_pool.run(hashers.make_password, password)
+
+
+def check_password(user, password):
+    """
+    Check ``password`` against ``user``'s password in the hashing pool.
+
+    A correct password stored with another hasher than the preferred one (or
+    with an outdated work factor) is rehashed and saved, like
+    ``AbstractBaseUser.check_password()`` does.
+    """
+    is_correct, must_update = hashing_pool.run(
+        hashers.verify_password, password, user.password
+    )
+    if is_correct and must_update:
+        # Assigning the hash directly, a rehash is not a password change.
+        user.password = make_password(password)
+        user.save(update_fields=["password"])
+    return is_correct
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from accounts.authentication import revocation_timeout
+from accounts.models import TokenRevocation
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired refresh tokens from the outstanding tokens and the "
+        "blacklist, and the token revocations older than every token. Run it "
+        "regularly, e.g. hourly from cron, to keep the tables at the size of "
+        "the tokens in use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of tokens deleted per query (default: %(default)s).",
+        )
+
+    def handle(self, *args, **options):
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        pruned = blacklisted = 0
+        while True:
+            # Without the model ordering, the ids come from the expiry index.
+            ids = list(
+                expired.order_by().values_list("id", flat=True)[: options["batch_size"]]
+            )
+            if not ids:
+                break
+            _, deleted = OutstandingToken.objects.filter(id__in=ids).delete()
+            pruned += deleted.get("token_blacklist.OutstandingToken", 0)
+            blacklisted += deleted.get("token_blacklist.BlacklistedToken", 0)
+        # Every token issued before these revocations has expired
+        TokenRevocation.objects.filter(
+            revoked_at__lt=time.time() - revocation_timeout()
+        ).delete()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Pruned {pruned} expired tokens, {blacklisted} of them blacklisted."
+            )
+        )
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+# Indexes on the tables of rest_framework_simplejwt.token_blacklist, for
+# pruning expired tokens and syncing the blacklist filters. They are not part
+# of the app's models, so they are created and dropped by hand.
+INDEXES = [
+    (
+        "outstandingtoken",
+        models.Index(fields=["expires_at"], name="outstanding_expires_idx"),
+    ),
+    (
+        "blacklistedtoken",
+        models.Index(fields=["blacklisted_at"], name="blacklisted_at_idx"),
+    ),
+]
+
+
+def add_indexes(apps, schema_editor):
+    concurrently = schema_editor.connection.vendor == "postgresql"
+    for model_name, index in INDEXES:
+        model = apps.get_model("token_blacklist", model_name)
+        if concurrently:
+            schema_editor.add_index(model, index, concurrently=True)
+        else:
+            schema_editor.add_index(model, index)
+
+
+def remove_indexes(apps, schema_editor):
+    concurrently = schema_editor.connection.vendor == "postgresql"
+    for model_name, index in INDEXES:
+        model = apps.get_model("token_blacklist", model_name)
+        if concurrently:
+            schema_editor.remove_index(model, index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL.
+    atomic = False
+
+    dependencies = [
+        ("token_blacklist", "0012_alter_outstandingtoken_user"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_indexes, remove_indexes),
+    ]
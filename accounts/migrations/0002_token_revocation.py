@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_token_blacklist_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TokenRevocation",
+            fields=[
+                ("user_id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("revoked_at", models.BigIntegerField()),
+            ],
+        ),
+    ]
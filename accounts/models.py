@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class TokenRevocation(models.Model):
+    """
+    When the tokens of a user were last revoked, see `revoke_user_tokens`.
+
+    The user id is not a foreign key, the revocation of a deleted user must
+    outlive the user's row.
+    """
+
+    user_id = models.BigIntegerField(primary_key=True)
+    # Seconds since the epoch, compared with the ``iat`` claim of tokens
+    revoked_at = models.BigIntegerField()
+
+    def __str__(self):
+        return f"Tokens of user {self.user_id} revoked at {self.revoked_at}"
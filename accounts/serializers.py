@@ -1,6 +1,16 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.authtoken.serializers import AuthTokenSerializer
+from rest_framework_simplejwt.serializers import (
+    TokenRefreshSerializer as BaseTokenRefreshSerializer,
+)
+from rest_framework_simplejwt.serializers import (
+    TokenVerifySerializer as BaseTokenVerifySerializer,
+)
+from rest_framework_simplejwt.tokens import UntypedToken
+
+from . import hashing
+from .tokens import RefreshToken, check_revoked
 
 User = get_user_model()
 
@@ -22,8 +32,25 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         }
 
     def create(self, validated_data):
-        return User.objects.create_user(**validated_data)
+        # Same as create_user(), with the password hashed in the hashing pool.
+        validated_data["username"] = User.normalize_username(validated_data["username"])
+        validated_data["email"] = User.objects.normalize_email(validated_data["email"])
+        validated_data["password"] = hashing.make_password(validated_data["password"])
+        return User.objects.create(**validated_data)
 
 
 class UserLoginSerializer(AuthTokenSerializer):
     pass
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+class TokenVerifySerializer(BaseTokenVerifySerializer):
+    """Also rejects the tokens issued before their user's tokens were revoked."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        check_revoked(UntypedToken(attrs["token"]).payload)
+        return data
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import revoke_user_tokens
+from .tokens import blacklist_filter
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=User)
+def detect_credential_change(sender, instance, raw=False, **kwargs):
+    """
+    Flag users whose password changed or who were deactivated, so their
+    access tokens are revoked once the change is saved.
+    """
+    if raw or instance.pk is None:
+        return
+    # set_password() keeps the raw password until the user is saved, a
+    # rehash on login clears it first.
+    password_changed = instance._password is not None
+    deactivated = (
+        not instance.is_active
+        and User.objects.filter(pk=instance.pk, is_active=True).exists()
+    )
+    instance._revoke_tokens = password_changed or deactivated
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_credential_change(sender, instance, created, **kwargs):
+    if getattr(instance, "_revoke_tokens", False):
+        instance._revoke_tokens = False
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def sync_blacklist_filters(sender, instance, created, **kwargs):
+    """Have every worker add the token to its blacklist filter."""
+    if created:
+        blacklist_filter.bump_generation()
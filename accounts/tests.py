@@ -1,9 +1,30 @@
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
-
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from .authentication import CachedJWTAuthentication, token_cache
+from .hashing import HashingPoolSaturated, hashing_pool
+from .models import TokenRevocation
 from .serializers import UserLoginSerializer, UserRegisterSerializer
+from .tokens import BloomFilter, RefreshToken, blacklist_filter
 
 User = get_user_model()
 
@@ -221,3 +242,419 @@ class UserSerializersTestCase(TestCase):
         serializer = UserLoginSerializer(data=login_data)
 
         self.assertFalse(serializer.is_valid())
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    """
+    Test cases for the cached, stateless JWT authentication.
+    """
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            username="tokenuser", email="token@example.com", password="tokenpass123"
+        )
+        response = self.client.post(
+            "/accounts/login/",
+            {"username": "tokenuser", "password": "tokenpass123"},
+            format="json",
+        )
+        self.access_token = response.data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def test_authenticated_request_does_not_load_user(self):
+        """Test that authenticating a request runs no query on auth_user."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/tasks/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any("auth_user" in query["sql"] for query in queries))
+
+    def test_authentication_runs_no_query(self):
+        """Test that a cached token and revocation authenticate without a query."""
+        self.client.get("/tasks/")
+        request = APIRequestFactory().get(
+            "/tasks/", HTTP_AUTHORIZATION=f"Bearer {self.access_token}"
+        )
+
+        with self.assertNumQueries(0):
+            user, _ = CachedJWTAuthentication().authenticate(request)
+
+        self.assertEqual(user.id, self.user.id)
+
+    def test_verified_token_is_cached(self):
+        """Test that a token's signature is only verified once."""
+        self.client.get("/tasks/")
+        cached = token_cache.get(self.access_token.encode())
+
+        self.assertIsNotNone(cached)
+        self.assertEqual(cached[0].id, self.user.id)
+
+    def test_tampered_token_is_rejected(self):
+        """Test that a token with a cached signature but other claims fails."""
+        self.client.get("/tasks/")
+        header, payload, signature = self.access_token.split(".")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {header}.{payload}x.{signature}"
+        )
+
+        response = self.client.get("/tasks/")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def one_second_later(self):
+        """Move the clock past the second the tokens were issued in."""
+        return mock.patch("time.time", return_value=time.time() + 1)
+
+    def test_password_change_revokes_tokens(self):
+        """Test that tokens issued before a password change are rejected."""
+        self.client.get("/tasks/")
+        with self.one_second_later():
+            self.user.set_password("newpass12345")
+            self.user.save()
+
+        response = self.client.get("/tasks/")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_tokens_issued_in_revocation_second_are_accepted(self):
+        """Test that a login right after a password change gets usable tokens."""
+        self.user.set_password("newpass12345")
+        self.user.save()
+        self.client.credentials()
+        response = self.client.post(
+            "/accounts/login/",
+            {"username": "tokenuser", "password": "newpass12345"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        response = self.client.get("/tasks/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivation_revokes_tokens(self):
+        """Test that tokens of a deactivated user are rejected."""
+        self.client.get("/tasks/")
+        with self.one_second_later():
+            self.user.is_active = False
+            self.user.save()
+
+        response = self.client.get("/tasks/")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_by_another_worker_is_seen(self):
+        """Test that a revocation stored by another process rejects tokens."""
+        self.client.get("/tasks/")
+        TokenRevocation.objects.create(
+            user_id=self.user.id, revoked_at=int(time.time()) + 1
+        )
+        self.assertEqual(self.client.get("/tasks/").status_code, status.HTTP_200_OK)
+
+        # This worker's copy of the revocation expires
+        later = time.time() + settings.LOCAL_CACHE_TIMEOUT + 1
+        with mock.patch("time.time", return_value=later):
+            response = self.client.get("/tasks/")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_read_from_shared_cache(self):
+        """Test that a shared cache answers revocation checks without a query."""
+        with tempfile.TemporaryDirectory() as location, self.settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location,
+                }
+            }
+        ):
+            self.client.get("/tasks/")
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get("/tasks/")
+            self.assertFalse(
+                any("accounts_tokenrevocation" in query["sql"] for query in queries)
+            )
+
+            with self.one_second_later():
+                self.user.set_password("newpass12345")
+                self.user.save()
+            response = self.client.get("/tasks/")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_refresh_token_is_rejected(self):
+        """Test that a refresh token issued before a revocation cannot rotate."""
+        refresh = RefreshToken.for_user(self.user)
+        with self.one_second_later():
+            self.user.set_password("newpass12345")
+            self.user.save()
+
+        response = self.client.post(
+            "/accounts/refresh/", {"refresh": str(refresh)}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_tokens_fail_verification(self):
+        """Test that /accounts/verify/ rejects revoked access and refresh tokens."""
+        refresh = RefreshToken.for_user(self.user)
+        with self.one_second_later():
+            self.user.set_password("newpass12345")
+            self.user.save()
+
+        for token in (self.access_token, str(refresh)):
+            response = self.client.post(
+                "/accounts/verify/", {"token": token}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unrelated_change_keeps_tokens(self):
+        """Test that saving other user fields does not revoke tokens."""
+        self.user.email = "changed@example.com"
+        self.user.save()
+
+        response = self.client.get("/tasks/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class PasswordHashingPoolTestCase(APITestCase):
+    """
+    Test cases for password hashing in the bounded hashing pool.
+    """
+
+    def setUp(self):
+        self.login_url = "/accounts/login/"
+        self.user = User.objects.create_user(
+            username="pooluser", email="pool@example.com", password="poolpass123"
+        )
+
+    def test_login_hashes_in_pool(self):
+        """Test that a login check goes through the hashing pool."""
+        submitted = hashing_pool.stats()["submitted"]
+        response = self.client.post(
+            self.login_url,
+            {"username": "pooluser", "password": "poolpass123"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = hashing_pool.stats()
+        self.assertEqual(stats["submitted"], submitted + 1)
+        self.assertEqual(stats["pending"], 0)
+
+    @override_settings(PASSWORD_HASHING_MAX_PENDING=0)
+    def test_saturated_pool_sheds_load(self):
+        """Test that logins are rejected with 429 when the pool is full."""
+        rejected = hashing_pool.stats()["rejected"]
+        response = self.client.post(
+            self.login_url,
+            {"username": "pooluser", "password": "poolpass123"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(hashing_pool.stats()["rejected"], rejected + 1)
+
+    def wait_until_idle(self):
+        deadline = time.monotonic() + 10
+        while hashing_pool.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_timed_out_hash_keeps_its_slot(self):
+        """Test that a hash the request stopped waiting for holds its slot."""
+        # Start the workers, so the slow call runs as soon as it is queued
+        hashing_pool.run(abs, 1)
+        completed = hashing_pool.stats()["completed"]
+
+        with override_settings(PASSWORD_HASHING_TIMEOUT=0.05):
+            with self.assertRaises(HashingPoolSaturated):
+                hashing_pool.run(time.sleep, 0.5)
+
+        self.assertEqual(hashing_pool.stats()["pending"], 1)
+        self.wait_until_idle()
+        stats = hashing_pool.stats()
+        self.assertEqual(stats["pending"], 0)
+        self.assertEqual(stats["completed"], completed + 1)
+
+    def test_failed_hash_is_not_completed(self):
+        """Test that a hash raising an error is not counted as completed."""
+        completed = hashing_pool.stats()["completed"]
+
+        with self.assertRaises(ValueError):
+            hashing_pool.run(int, "not a number")
+
+        stats = hashing_pool.stats()
+        self.assertEqual(stats["pending"], 0)
+        self.assertEqual(stats["completed"], completed)
+
+    @override_settings(
+        PASSWORD_HASHING_WORKERS=0,
+        PASSWORD_HASHERS=[
+            "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+            "django.contrib.auth.hashers.MD5PasswordHasher",
+        ],
+    )
+    def test_login_upgrades_password_hash(self):
+        """Test that a hash from another hasher is upgraded on login."""
+        self.user.password = make_password("poolpass123", hasher="md5")
+        self.user.save()
+
+        response = self.client.post(
+            self.login_url,
+            {"username": "pooluser", "password": "poolpass123"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        self.assertTrue(self.user.check_password("poolpass123"))
+
+    def test_register_hashes_password(self):
+        """Test that registration stores a usable password hash."""
+        response = self.client.post(
+            "/accounts/register/",
+            {
+                "username": "newpooluser",
+                "email": "NewPool@EXAMPLE.COM",
+                "password": "newpoolpass123",
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(username="newpooluser")
+        self.assertEqual(user.email, "NewPool@example.com")
+        self.assertTrue(user.check_password("newpoolpass123"))
+
+
+class TokenBlacklistTestCase(APITestCase):
+    """Test cases for the blacklist filter in front of refresh token checks."""
+
+    def setUp(self):
+        cache.clear()
+        blacklist_filter.clear()
+        self.refresh_url = "/accounts/refresh/"
+        self.user = User.objects.create_user(username="tokenuser", password="x")
+        self.token = RefreshToken.for_user(self.user)
+
+    def refresh(self, token):
+        return self.client.post(
+            self.refresh_url, {"refresh": str(token)}, format="json"
+        )
+
+    def test_bloom_filter(self):
+        """Test that the Bloom filter has no false negatives and few positives."""
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for n in range(1000):
+            bloom.add(f"member-{n}")
+
+        self.assertTrue(all(f"member-{n}" in bloom for n in range(1000)))
+        false_positives = sum(f"other-{n}" in bloom for n in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_refresh_does_not_query_blacklist(self):
+        """Test that refreshing a token that is not blacklisted skips the query."""
+        self.refresh(RefreshToken.for_user(self.user))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.refresh(self.token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        queries = [query["sql"] for query in ctx.captured_queries]
+        self.assertFalse(
+            [sql for sql in queries if "token_blacklist_blacklistedtoken" in sql]
+        )
+        # the user is read and the rotated token inserted, the revocation
+        # was cached by the first refresh
+        self.assertEqual(len(queries), 2)
+        rotated = RefreshToken(response.data["refresh"])
+        outstanding = OutstandingToken.objects.get(jti=rotated["jti"])
+        self.assertEqual(outstanding.user, self.user)
+
+    def test_blacklisted_token_is_rejected(self):
+        """Test that a blacklisted token is found after the filter synced."""
+        self.assertEqual(
+            self.refresh(RefreshToken.for_user(self.user)).status_code, 200
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.blacklist()
+
+        with mock.patch.object(
+            blacklist_filter, "_rebuild", wraps=blacklist_filter._rebuild
+        ) as rebuild:
+            response = self.refresh(self.token)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        rebuild.assert_not_called()
+
+    def test_blacklist_of_another_worker_is_synced(self):
+        """Test that a per-process cache syncs the filter every LOCAL_CACHE_TIMEOUT"""
+        self.assertEqual(
+            self.refresh(RefreshToken.for_user(self.user)).status_code, 200
+        )
+        # Blacklisted by another worker, this one's filter is not told
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.get(jti=self.token["jti"])
+        )
+
+        later = time.monotonic() + settings.LOCAL_CACHE_TIMEOUT
+        with mock.patch("time.monotonic", return_value=later):
+            response = self.refresh(self.token)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_blacklist_read_from_shared_cache(self):
+        """Test that a shared cache tells other workers' filters to sync"""
+        with tempfile.TemporaryDirectory() as location, self.settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location,
+                }
+            }
+        ):
+            blacklist_filter.might_contain("warm-up")
+            later = time.monotonic() + settings.LOCAL_CACHE_TIMEOUT
+            with mock.patch("time.monotonic", return_value=later):
+                with CaptureQueriesContext(connection) as ctx:
+                    self.assertFalse(blacklist_filter.might_contain(self.token["jti"]))
+                self.assertEqual(ctx.captured_queries, [])
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.token.blacklist()
+                self.assertTrue(blacklist_filter.might_contain(self.token["jti"]))
+
+    @override_settings(JWT_BLACKLIST_FILTER_MAX_AGE=0)
+    def test_filter_rebuilt_when_old(self):
+        """Test that the filter is rebuilt without expired tokens."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.blacklist()
+        OutstandingToken.objects.filter(jti=self.token["jti"]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertFalse(blacklist_filter.might_contain(self.token["jti"]))
+
+    def test_prune_expired_tokens(self):
+        """Test that expired outstanding and blacklisted tokens are deleted."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.blacklist()
+        expired = RefreshToken.for_user(self.user)
+        OutstandingToken.objects.filter(
+            jti__in=[self.token["jti"], expired["jti"]]
+        ).update(expires_at=timezone.now() - timedelta(seconds=1))
+        live = RefreshToken.for_user(self.user)
+
+        out = StringIO()
+        call_command("prune_jwt_tokens", "--batch-size", "1", stdout=out)
+
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)), [live["jti"]]
+        )
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertIn("Pruned 2 expired tokens, 1 of them blacklisted.", out.getvalue())
@@ -0,0 +1,215 @@
+import threading
+import time
+from datetime import timedelta
+from hashlib import blake2b
+from math import ceil, log
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from core.cache import is_shared
+
+from .authentication import get_revoked_at, is_revoked
+
+GENERATION_KEY = "accounts:jwt-blacklist-generation"
+
+# Tokens blacklisted this long before a sync are fetched again, in case
+# their transaction committed after a later one.
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class BloomFilter:
+    """
+    Set of strings that may report false positives, at about
+    ``error_rate`` once ``capacity`` items were added, but never false
+    negatives.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(64, ceil(-self.capacity * log(error_rate) / log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * log(2)))
+        self.bits = bytearray(ceil(self.size / 8))
+
+    def _positions(self, item):
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * step) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class TokenBlacklistFilter:
+    """
+    Bloom filter of the blacklisted refresh tokens that have not expired,
+    kept by each worker process to answer most blacklist checks without a
+    query.
+
+    Blacklisting a token bumps a generation counter in the default cache.
+    A worker seeing a new generation fetches the tokens blacklisted since
+    its last sync, and rebuilds the filter from scratch every
+    ``JWT_BLACKLIST_FILTER_MAX_AGE`` seconds, dropping expired tokens.
+    Workers only see each other's blacklisting through a shared cache, with
+    a per process cache the filter also syncs every ``LOCAL_CACHE_TIMEOUT``
+    seconds.
+    """
+
+    def __init__(self, error_rate=0.01):
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._added = 0
+        self._generation = None
+        self._built_at = 0.0
+        self._polled_at = 0.0
+        self._synced_at = None
+
+    def get_generation(self):
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            # Start from an unpredictable value, so a filter synced before
+            # the counter was evicted never matches it again.
+            cache.add(GENERATION_KEY, time.time_ns(), None)
+            generation = cache.get(GENERATION_KEY)
+        return generation
+
+    def bump_generation(self):
+        """Tell every worker to sync once the current transaction commits."""
+
+        def bump():
+            try:
+                cache.incr(GENERATION_KEY)
+            except ValueError:
+                # A missing generation never matches a synced filter.
+                pass
+
+        transaction.on_commit(bump)
+
+    def might_contain(self, jti):
+        """
+        Return whether the token ``jti`` may be blacklisted, ``False`` means
+        it certainly is not.
+        """
+        generation = self.get_generation()
+        shared = is_shared(caches[DEFAULT_CACHE_ALIAS])
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._bloom is None
+                or self._added > self._bloom.capacity
+                or now - self._built_at > settings.JWT_BLACKLIST_FILTER_MAX_AGE
+            ):
+                self._rebuild(generation)
+            elif generation != self._generation or (
+                # Other workers' generations are not seen in a per process cache
+                not shared
+                and now - self._polled_at >= settings.LOCAL_CACHE_TIMEOUT
+            ):
+                self._sync(generation)
+            return jti in self._bloom
+
+    def _blacklisted_jtis(self, **filters):
+        return (
+            BlacklistedToken.objects.filter(
+                token__expires_at__gt=timezone.now(), **filters
+            )
+            .values_list("token__jti", flat=True)
+            .iterator(chunk_size=2000)
+        )
+
+    def _rebuild(self, generation):
+        synced_at = timezone.now()
+        jtis = list(self._blacklisted_jtis())
+        # Room for the tokens blacklisted until the next rebuild.
+        self._bloom = BloomFilter(2 * len(jtis) + 1000, self.error_rate)
+        for jti in jtis:
+            self._bloom.add(jti)
+        self._added = len(jtis)
+        self._generation = generation
+        self._built_at = self._polled_at = time.monotonic()
+        self._synced_at = synced_at
+
+    def _sync(self, generation):
+        synced_at = timezone.now()
+        for jti in self._blacklisted_jtis(
+            blacklisted_at__gte=self._synced_at - SYNC_OVERLAP
+        ):
+            self._bloom.add(jti)
+            self._added += 1
+        self._generation = generation
+        self._polled_at = time.monotonic()
+        self._synced_at = synced_at
+
+    def clear(self):
+        with self._lock:
+            self._bloom = None
+
+
+blacklist_filter = TokenBlacklistFilter()
+
+
+def check_revoked(payload):
+    """
+    Raise `TokenError` when the token ``payload`` was issued before its
+    user's tokens were revoked.
+    """
+    user_id = payload.get(jwt_settings.USER_ID_CLAIM)
+    if user_id is not None and is_revoked(payload, get_revoked_at(user_id)):
+        raise TokenError(_("Token has been revoked"))
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh token checked against the blacklist through `blacklist_filter`,
+    which only queries the database for tokens that may be blacklisted, and
+    rejected when it was issued before its user's tokens were revoked, so it
+    cannot be rotated into new tokens.
+    """
+
+    def verify(self):
+        super().verify()
+        check_revoked(self.payload)
+
+    def check_blacklist(self):
+        jti = self.payload[jwt_settings.JTI_CLAIM]
+        if (
+            blacklist_filter.might_contain(jti)
+            and BlacklistedToken.objects.filter(token__jti=jti).exists()
+        ):
+            raise TokenError(_("Token is blacklisted"))
+
+    def outstand(self):
+        """
+        Add a freshly rotated token to the outstanding tokens. Its ``jti`` is
+        new and its user was loaded when the old token was checked, so it is
+        inserted without looking up either.
+        """
+        if jwt_settings.USER_ID_FIELD != "id":
+            return super().outstand()
+        return OutstandingToken.objects.create(
+            user_id=self.payload.get(jwt_settings.USER_ID_CLAIM),
+            jti=self.payload[jwt_settings.JTI_CLAIM],
+            token=str(self),
+            created_at=self.current_time,
+            expires_at=datetime_from_epoch(self.payload["exp"]),
+        )
@@ -1,11 +1,13 @@
-from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.docs import swagger_auto_schema
+from core.throttling import AnonRateThrottle, AuthRateThrottle
 
 from .serializers import UserLoginSerializer, UserRegisterSerializer
+from .tokens import RefreshToken
 
 
 def get_tokens_for_user(user):
@@ -25,6 +27,7 @@ class UserRegisterView(APIView):
     """
 
     permission_classes = [AllowAny]
+    throttle_classes = [AnonRateThrottle, AuthRateThrottle]
 
     @swagger_auto_schema(request_body=UserRegisterSerializer)
     def post(self, request):
@@ -42,6 +45,7 @@ class UserLoginView(APIView):
     """
 
     permission_classes = [AllowAny]
+    throttle_classes = [AnonRateThrottle, AuthRateThrottle]
 
     @swagger_auto_schema(request_body=UserLoginSerializer)
     def post(self, request):
@@ -0,0 +1,82 @@
+import subprocess
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+def percentile(values, percent):
+    """Return the ``percent`` percentile of sorted ``values``."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def summarize(latencies, errors, elapsed, queries):
+    """
+    Return the throughput, latency percentiles in milliseconds and queries
+    per request of a benchmark run.
+    """
+    latencies = sorted(latencies)
+    requests = len(latencies)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": requests / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "queries_per_request": queries / requests if requests else 0.0,
+    }
+
+
+def get_commit():
+    """Return the short hash of the checked out commit, if any."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class QueryCounter:
+    """
+    Count the queries run on every database connection of the process,
+    including the connections opened by other threads while counting.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    @contextmanager
+    def counting(self):
+        """Count queries inside the block, starting from zero."""
+        self.count = 0
+        connection_created.connect(self.install)
+        for connection in connections.all(initialized_only=True):
+            self.install(connection)
+        try:
+            yield self
+        finally:
+            connection_created.disconnect(self.install)
+            for connection in connections.all(initialized_only=True):
+                if self in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(self)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared(cache):
+    """
+    Return whether the values stored in ``cache`` are seen by every worker
+    process, i.e. the cache is not kept in the memory of each process.
+    """
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def local_timeout(cache, timeout):
+    """
+    Return the seconds ``cache`` may keep a value that other workers change:
+    ``timeout`` when the cache is shared, at most ``LOCAL_CACHE_TIMEOUT``
+    when each process has its own copy and misses their changes.
+    """
+    if is_shared(cache):
+        return timeout
+    if timeout is None:
+        return settings.LOCAL_CACHE_TIMEOUT
+    return min(timeout, settings.LOCAL_CACHE_TIMEOUT)
@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+# Whether reads in the current request may go to the read replica.
+replica_reads = ContextVar("replica_reads", default=False)
+
+
+def pin_key(user_id):
+    return f"core:primary-pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """
+    Keep the reads of a user who just wrote on the primary for
+    ``DATABASE_REPLICA_PIN_SECONDS``, so they see their own writes while
+    the replica catches up.
+    """
+    if settings.DATABASE_REPLICA_ALIAS and user_id is not None:
+        cache.set(pin_key(user_id), True, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return cache.get(pin_key(user_id), False)
+
+
+def delete_rows(model, pks, using):
+    """
+    Delete the rows of ``model`` whose primary key is in ``pks`` with
+    ``DELETE ... WHERE pk IN (...)``, without loading them, sending signals
+    or cascading. Return the number of deleted rows.
+    """
+    pks = list(pks)
+    if not pks:
+        return 0
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    # One statement unless the database limits its parameters
+    batch_size = connection.features.max_query_params or len(pks)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start : start + batch_size]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {column} IN ({placeholders})", batch
+            )
+            deleted += cursor.rowcount
+    return deleted
+
+
+@contextmanager
+def use_replica_reads(enabled=True):
+    """Route the reads made inside the block to the read replica, if any."""
+    token = replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads to ``DATABASE_REPLICA_ALIAS`` inside `use_replica_reads`
+    blocks, everything else to the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = settings.DATABASE_REPLICA_ALIAS
+        if alias and replica_reads.get():
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == settings.DATABASE_REPLICA_ALIAS:
+            return False
+        return None
@@ -0,0 +1,44 @@
+# Views describe their schema with `swagger_auto_schema` from here rather
+# than from drf_yasg.utils, which imports the drf-yasg schema stack. The
+# overrides are handed to drf-yasg when a schema is first generated.
+import threading
+
+# (view method, overrides) waiting for `apply_schema_overrides`
+_pending = []
+_lock = threading.Lock()
+
+
+def swagger_auto_schema(**overrides):
+    """
+    Record drf-yasg ``swagger_auto_schema`` overrides of a view method
+    without importing drf-yasg.
+
+    ``manual_parameters`` are given as dicts of `drf_yasg.openapi.Parameter`
+    arguments, such as ``{"name": "since", "in_": "query", "type": "string"}``.
+    """
+
+    def decorator(view_method):
+        _pending.append((view_method, overrides))
+        return view_method
+
+    return decorator
+
+
+def apply_schema_overrides():
+    """Apply the overrides recorded by `swagger_auto_schema` so far."""
+    with _lock:
+        if not _pending:
+            return
+        from drf_yasg import openapi, utils
+
+        while _pending:
+            view_method, overrides = _pending.pop(0)
+            if "manual_parameters" in overrides:
+                overrides = {
+                    **overrides,
+                    "manual_parameters": [
+                        openapi.Parameter(**parameter)
+                        for parameter in overrides["manual_parameters"]
+                    ],
+                }
+            utils.swagger_auto_schema(**overrides)(view_method)
@@ -0,0 +1,495 @@
+import asyncio
+import http.client
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from math import ceil
+from pathlib import Path
+from time import perf_counter
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (
+    ThreadedWSGIServer,
+    WSGIRequestHandler,
+    get_internal_wsgi_application,
+)
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.benchmark import QueryCounter, get_commit, summarize
+from tasks.models import Task
+
+BENCHMARK_PASSWORD = "benchmark-password"
+
+# Ways requests reach the application: the WSGI and ASGI handlers called in
+# process, and a threaded HTTP server on a local port.
+MODES = ["wsgi", "asgi", "server"]
+
+
+class Session:
+    """A benchmark worker's user, tokens and tasks."""
+
+    def __init__(self, user, task_ids):
+        self.user = user
+        self.task_ids = task_ids
+        refresh = RefreshToken.for_user(user)
+        self.refresh = str(refresh)
+        self.access = str(refresh.access_token)
+
+
+def list_request(session, i, command):
+    page = i % command.pages + 1
+    return "GET", f"/tasks/?page={page}", None
+
+
+def detail_request(session, i, command):
+    return "GET", f"/tasks/{session.task_ids[i % len(session.task_ids)]}/", None
+
+
+def async_list_request(session, i, command):
+    return "GET", f"/async/tasks/?page={i % command.pages + 1}", None
+
+
+def async_detail_request(session, i, command):
+    task_id = session.task_ids[i % len(session.task_ids)]
+    return "GET", f"/async/tasks/{task_id}/", None
+
+
+def create_request(session, i, command):
+    return "POST", "/tasks/", {"title": f"Benchmark task {i}"}
+
+
+def bulk_request(session, i, command):
+    tasks = [{"title": f"Benchmark task {i}.{n}"} for n in range(command.bulk_size)]
+    return "POST", "/tasks/bulk/", tasks
+
+
+def login_request(session, i, command):
+    data = {"username": session.user.username, "password": BENCHMARK_PASSWORD}
+    return "POST", "/accounts/login/", data
+
+
+def refresh_request(session, i, command):
+    return "POST", "/accounts/refresh/", {"refresh": session.refresh}
+
+
+ENDPOINTS = {
+    "list": list_request,
+    "detail": detail_request,
+    "async-list": async_list_request,
+    "async-detail": async_detail_request,
+    "create": create_request,
+    "bulk": bulk_request,
+    "login": login_request,
+    "refresh": refresh_request,
+}
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database with users and tasks, drive the API endpoints "
+        "through the WSGI and ASGI handlers and a local HTTP server, and "
+        "report latency percentiles, requests per second and queries per "
+        "request. Results are saved as JSON to compare commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=10,
+            help="Users to seed (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--tasks",
+            type=int,
+            default=1000,
+            help="Tasks seeded per user (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests sent to each endpoint in each mode (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Concurrent clients (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--bulk-size",
+            type=int,
+            default=20,
+            help="Tasks created by each bulk request (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--mode",
+            action="append",
+            choices=MODES,
+            help="Mode to benchmark, repeat for several (default: all).",
+        )
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            choices=list(ENDPOINTS),
+            help="Endpoint to benchmark, repeat for several (default: all).",
+        )
+        parser.add_argument(
+            "--output",
+            help="JSON file to save the results to "
+            "(default: benchmarks/<commit>.json).",
+        )
+        parser.add_argument(
+            "--compare",
+            help="JSON results of an earlier run to compare against.",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="Fail when an endpoint's p95 latency grew by more than this "
+            "many percent over --compare.",
+        )
+        parser.add_argument(
+            "--in-place",
+            action="store_true",
+            help="Seed the configured database instead of a scratch one. "
+            "The seeded rows are left behind.",
+        )
+
+    def handle(self, *args, **options):
+        if options["max_regression"] is not None and not options["compare"]:
+            raise CommandError("--max-regression needs --compare.")
+        self.concurrency = options["concurrency"]
+        self.bulk_size = options["bulk_size"]
+        self.pages = ceil(options["tasks"] / settings.REST_FRAMEWORK["PAGE_SIZE"])
+        modes = options["mode"] or MODES
+        endpoints = options["endpoint"] or list(ENDPOINTS)
+
+        # Hosts of the test clients and the local server.
+        allowed_hosts = [*settings.ALLOWED_HOSTS, "testserver", "127.0.0.1"]
+        # Throttles are still checked, with rates the benchmark cannot reach.
+        rest_framework = {
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {
+                scope: rate and f"{10**9}/s"
+                for scope, rate in settings.REST_FRAMEWORK[
+                    "DEFAULT_THROTTLE_RATES"
+                ].items()
+            },
+        }
+        with self.scratch_database(options["in_place"]), override_settings(
+            ALLOWED_HOSTS=allowed_hosts, REST_FRAMEWORK=rest_framework
+        ):
+            self.seed(options["users"], options["tasks"])
+            self.results = {}
+            for mode in modes:
+                self.results[mode] = {}
+                for endpoint in endpoints:
+                    result = self.run_endpoint(mode, endpoint, options["requests"])
+                    self.results[mode][endpoint] = result
+                    self.write_result(mode, endpoint, result)
+
+        report = {
+            "commit": get_commit(),
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "users": options["users"],
+            "tasks_per_user": options["tasks"],
+            "requests": options["requests"],
+            "concurrency": self.concurrency,
+            "results": self.results,
+        }
+        output = Path(
+            options["output"]
+            or settings.BASE_DIR
+            / "benchmarks"
+            / f"{report['commit'] or 'results'}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(f"Results saved to {output}")
+
+        if options["compare"]:
+            self.compare(
+                json.loads(Path(options["compare"]).read_text()),
+                options["max_regression"],
+            )
+
+    @contextmanager
+    def scratch_database(self, in_place):
+        """
+        Run the block on a scratch copy of the default database, created and
+        migrated like the test database.
+        """
+        if in_place:
+            yield
+            return
+        self.stdout.write("Creating the scratch database...")
+        test_settings = connection.settings_dict["TEST"]
+        test_name = test_settings["NAME"]
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == "sqlite":
+                # A file, the in-memory test database of SQLite cannot be
+                # shared by the server threads.
+                test_settings["NAME"] = str(Path(directory) / "benchmark.sqlite3")
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                yield
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings["NAME"] = test_name
+
+    def seed(self, users, tasks):
+        """
+        Create ``users`` users with ``tasks`` tasks each, cycling through the
+        tasks of the ``db.json`` fixture.
+        """
+        fixture = json.loads((settings.BASE_DIR / "db.json").read_text())
+        templates = [
+            item["fields"] for item in fixture if item["model"] == "tasks.task"
+        ]
+        User = get_user_model()
+        password = make_password(BENCHMARK_PASSWORD)
+        usernames = [f"benchmark-{n}" for n in range(users)]
+        User.objects.bulk_create(
+            (User(username=username, password=password) for username in usernames),
+            ignore_conflicts=True,
+        )
+        seeded = list(User.objects.filter(username__in=usernames))
+        for user in seeded:
+            Task.objects.bulk_create(
+                (
+                    Task(
+                        owner=user,
+                        title=templates[n % len(templates)]["title"],
+                        description=templates[n % len(templates)]["description"],
+                        completed=templates[n % len(templates)]["completed"],
+                    )
+                    for n in range(tasks)
+                ),
+                batch_size=1000,
+            )
+        self.users = seeded
+        self.task_ids = {
+            user.pk: list(
+                Task.objects.filter(owner=user).values_list("id", flat=True)[:100]
+            )
+            for user in seeded
+        }
+        self.stdout.write(f"Seeded {users} users with {tasks} tasks each")
+
+    def get_sessions(self):
+        return [
+            Session(user, self.task_ids[user.pk])
+            for user in (
+                self.users[n % len(self.users)] for n in range(self.concurrency)
+            )
+        ]
+
+    def run_endpoint(self, mode, endpoint, requests):
+        """Send ``requests`` requests to ``endpoint`` and summarize them."""
+        sessions = self.get_sessions()
+        build = ENDPOINTS[endpoint]
+        latencies, errors = [], []
+        counter = QueryCounter()
+        with counter.counting():
+            started = perf_counter()
+            if mode == "asgi":
+                async_to_sync(self.run_asgi)(
+                    sessions, build, requests, latencies, errors
+                )
+            elif mode == "server":
+                self.run_server(sessions, build, requests, latencies, errors)
+            else:
+                self.run_threads(
+                    self.wsgi_sender(), sessions, build, requests, latencies, errors
+                )
+            elapsed = perf_counter() - started
+        return summarize(latencies, len(errors), elapsed, counter.count)
+
+    def requests_of(self, worker, requests):
+        return range(worker, requests, self.concurrency)
+
+    def record(self, session, status_code, body, started, latencies, errors):
+        latencies.append(perf_counter() - started)
+        if status_code >= 400:
+            errors.append(status_code)
+        elif isinstance(body, dict) and "refresh" in body:
+            # Refresh tokens are rotated, the next refresh uses the new one.
+            session.refresh = body["refresh"]
+
+    def wsgi_sender(self):
+        def send(session, method, path, data):
+            client = Client(raise_request_exception=False)
+            response = client.generic(
+                method,
+                path,
+                json.dumps(data) if data is not None else "",
+                content_type="application/json",
+                headers={"Authorization": f"Bearer {session.access}"},
+            )
+            return response.status_code, self.parse(response.content)
+
+        return send
+
+    def server_sender(self, host, port):
+        def send(session, method, path, data):
+            client = http.client.HTTPConnection(host, port)
+            try:
+                client.request(
+                    method,
+                    path,
+                    json.dumps(data) if data is not None else None,
+                    {
+                        "Authorization": f"Bearer {session.access}",
+                        "Content-Type": "application/json",
+                    },
+                )
+                response = client.getresponse()
+                return response.status, self.parse(response.read())
+            finally:
+                client.close()
+
+        return send
+
+    def parse(self, content):
+        try:
+            return json.loads(content)
+        except ValueError:
+            return None
+
+    def run_threads(self, send, sessions, build, requests, latencies, errors):
+        """Send the requests from a thread per session, inline for one."""
+
+        def work(worker, session):
+            for i in self.requests_of(worker, requests):
+                method, path, data = build(session, i, self)
+                started = perf_counter()
+                status_code, body = send(session, method, path, data)
+                self.record(session, status_code, body, started, latencies, errors)
+
+        def work_in_thread(worker, session):
+            try:
+                work(worker, session)
+            finally:
+                connection.close()
+
+        if len(sessions) == 1:
+            work(0, sessions[0])
+            return
+        threads = [
+            threading.Thread(target=work_in_thread, args=(worker, session))
+            for worker, session in enumerate(sessions)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_server(self, sessions, build, requests, latencies, errors):
+        server = ThreadedWSGIServer(("127.0.0.1", 0), QuietWSGIRequestHandler)
+        server.set_app(get_internal_wsgi_application())
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            host, port = server.server_address[:2]
+            self.run_threads(
+                self.server_sender(host, port),
+                sessions,
+                build,
+                requests,
+                latencies,
+                errors,
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    async def run_asgi(self, sessions, build, requests, latencies, errors):
+        async def work(worker, session):
+            client = AsyncClient(raise_request_exception=False)
+            for i in self.requests_of(worker, requests):
+                method, path, data = build(session, i, self)
+                started = perf_counter()
+                response = await client.generic(
+                    method,
+                    path,
+                    json.dumps(data) if data is not None else "",
+                    content_type="application/json",
+                    headers={"Authorization": f"Bearer {session.access}"},
+                )
+                self.record(
+                    session,
+                    response.status_code,
+                    self.parse(response.content),
+                    started,
+                    latencies,
+                    errors,
+                )
+
+        await asyncio.gather(
+            *(work(worker, session) for worker, session in enumerate(sessions))
+        )
+
+    def write_result(self, mode, endpoint, result):
+        if not hasattr(self, "_header_written"):
+            self._header_written = True
+            self.stdout.write(
+                f"{'mode':<8}{'endpoint':<14}{'requests':>9}{'errors':>8}"
+                f"{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                f"{'queries':>9}"
+            )
+        self.stdout.write(
+            f"{mode:<8}{endpoint:<14}{result['requests']:>9}{result['errors']:>8}"
+            f"{result['throughput']:>9.0f}{result['p50']:>9.2f}"
+            f"{result['p95']:>9.2f}{result['p99']:>9.2f}"
+            f"{result['queries_per_request']:>9.1f}"
+        )
+
+    def compare(self, baseline, max_regression):
+        """
+        Print the change of throughput and p95 latency against ``baseline``,
+        failing when a p95 latency grew by more than ``max_regression`` percent.
+        """
+        self.stdout.write(f"Compared with {baseline.get('commit') or 'the baseline'}:")
+        regressions = []
+        for mode, endpoints in self.results.items():
+            for endpoint, result in endpoints.items():
+                before = baseline["results"].get(mode, {}).get(endpoint)
+                if not before or not before["p95"] or not before["throughput"]:
+                    continue
+                p95_change = (result["p95"] / before["p95"] - 1) * 100
+                throughput_change = (
+                    result["throughput"] / before["throughput"] - 1
+                ) * 100
+                line = (
+                    f"{mode:<8}{endpoint:<14}p95 {p95_change:+7.1f}%  "
+                    f"req/s {throughput_change:+7.1f}%"
+                )
+                if max_regression is not None and p95_change > max_regression:
+                    regressions.append(f"{mode} {endpoint}")
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(line)
+        if regressions:
+            raise CommandError(
+                f"p95 latency regressed by more than {max_regression}%: "
+                + ", ".join(regressions)
+            )
@@ -0,0 +1,156 @@
+import tempfile
+import threading
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from core.benchmark import percentile
+
+# Connection settings compared by the benchmark. "default" is SQLite with
+# Django's defaults, a connection per request and deferred transactions.
+PROFILES = {
+    "default": {"OPTIONS": {}, "CONN_MAX_AGE": 0},
+    "tuned": {
+        "OPTIONS": settings.SQLITE_TUNED_OPTIONS,
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent writers against a scratch SQLite database with the "
+        "default and the tuned connection settings, and compare throughput, "
+        "latency and 'database is locked' errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--writers",
+            type=int,
+            default=8,
+            help="Number of concurrent writer threads (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--transactions",
+            type=int,
+            default=200,
+            help="Transactions run by each writer (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--profile",
+            action="append",
+            choices=sorted(PROFILES),
+            help="Profile to benchmark, repeat for several (default: all).",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['writers']} writers x {options['transactions']} "
+            "transactions (read, then insert)"
+        )
+        self.stdout.write(
+            f"{'profile':<10}{'committed':>10}{'locked':>8}{'tx/s':>10}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        self.results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name in options["profile"] or sorted(PROFILES):
+                result = self.run_profile(
+                    name,
+                    Path(directory) / f"{name}.sqlite3",
+                    options["writers"],
+                    options["transactions"],
+                )
+                self.results[name] = result
+                self.stdout.write(
+                    f"{name:<10}{result['committed']:>10}{result['locked']:>8}"
+                    f"{result['throughput']:>10.0f}{result['p50']:>9.2f}"
+                    f"{result['p95']:>9.2f}{result['p99']:>9.2f}"
+                )
+
+    def run_profile(self, name, path, writers, transactions):
+        alias = f"benchmark_{name}"
+        database = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": str(path),
+            **PROFILES[name],
+        }
+        # configure_settings() fills in the defaults but insists on a
+        # "default" alias.
+        connections.settings[alias] = connections.configure_settings(
+            {DEFAULT_DB_ALIAS: dict(database), alias: database}
+        )[alias]
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(
+                    "CREATE TABLE benchmark_task "
+                    "(id INTEGER PRIMARY KEY, owner_id INTEGER, title TEXT)"
+                )
+                cursor.execute(
+                    "CREATE INDEX benchmark_task_owner ON benchmark_task (owner_id)"
+                )
+            connections[alias].close()
+
+            latencies, locked = [], []
+            barrier = threading.Barrier(writers)
+            threads = [
+                threading.Thread(
+                    target=self.write,
+                    args=(alias, owner_id, transactions, barrier, latencies, locked),
+                )
+                for owner_id in range(writers)
+            ]
+            started = perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = perf_counter() - started
+        finally:
+            connections[alias].close()
+            del connections.settings[alias]
+
+        latencies.sort()
+        return {
+            "committed": len(latencies),
+            "locked": len(locked),
+            "throughput": len(latencies) / elapsed,
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+        }
+
+    def write(self, alias, owner_id, transactions, barrier, latencies, locked):
+        """
+        Run ``transactions`` read-then-write transactions, closing the
+        connection after each one the way the end of a request does.
+        """
+        connection = connections[alias]
+        barrier.wait()
+        for i in range(transactions):
+            started = perf_counter()
+            try:
+                with transaction.atomic(using=alias):
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            "SELECT COUNT(*) FROM benchmark_task WHERE owner_id = %s",
+                            [owner_id],
+                        )
+                        cursor.fetchone()
+                        cursor.execute(
+                            "INSERT INTO benchmark_task (owner_id, title) "
+                            "VALUES (%s, %s)",
+                            [owner_id, f"Task {i}"],
+                        )
+            except OperationalError:
+                locked.append(perf_counter() - started)
+            else:
+                latencies.append(perf_counter() - started)
+            finally:
+                connection.close_if_unusable_or_obsolete()
+        connection.close()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.schema import generate_schema, write_schema_files
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema served by /docs/ and write it to "
+        "OPENAPI_SCHEMA_DIR. Run it on every deployment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output-dir",
+            help="Directory to write the schema files to (default: OPENAPI_SCHEMA_DIR).",
+        )
+
+    def handle(self, *args, **options):
+        schema = generate_schema()
+        for path in write_schema_files(schema, options["output_dir"]):
+            self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
@@ -0,0 +1,196 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.benchmark import get_commit
+
+# Code run by each measured interpreter: what a worker does before it can
+# answer its first request, loading the application and the URL conf.
+TARGETS = {
+    "wsgi": "import settings.wsgi",
+    "asgi": "import settings.asgi",
+}
+READY = "from django.urls import get_resolver; get_resolver().url_patterns"
+
+
+def parse_importtime(output):
+    """
+    Return ``{module: (self, cumulative)}`` in microseconds from the
+    ``python -X importtime`` lines of ``output``.
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # The header line
+            continue
+        modules[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Start fresh interpreters with `python -X importtime`, load the WSGI "
+        "or ASGI application and the URL conf as a worker does, and report "
+        "the cold-start time and the import time of each package. Results "
+        "are saved as JSON to compare commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            choices=list(TARGETS),
+            default="wsgi",
+            help="Application to load (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Cold starts to measure, after one discarded warm-up start "
+            "(default: %(default)s).",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=15,
+            help="Packages with the largest import time to list "
+            "(default: %(default)s).",
+        )
+        parser.add_argument(
+            "--output",
+            help="JSON file to save the results to "
+            "(default: benchmarks/startup-<commit>.json).",
+        )
+        parser.add_argument(
+            "--compare",
+            help="JSON results of an earlier run to compare against.",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="Fail when the median start time grew by more than this "
+            "many percent over --compare.",
+        )
+
+    def handle(self, *args, **options):
+        if options["max_regression"] is not None and not options["compare"]:
+            raise CommandError("--max-regression needs --compare.")
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        script = f"{TARGETS[options['target']]}; {READY}"
+
+        # The warm-up start writes the bytecode caches of changed modules.
+        self.start(script)
+        starts = [self.start(script) for _ in range(options["repeat"])]
+
+        packages = {}
+        for _, modules in starts:
+            for module, (own, _) in modules.items():
+                package = module.partition(".")[0]
+                packages[package] = packages.get(package, 0) + own
+        # Milliseconds per start
+        packages = {
+            package: total / len(starts) / 1000
+            for package, total in sorted(
+                packages.items(), key=lambda item: item[1], reverse=True
+            )
+        }
+        wall_times = [wall for wall, _ in starts]
+        import_times = [
+            sum(own for own, _ in modules.values()) / 1000 for _, modules in starts
+        ]
+        report = {
+            "commit": get_commit(),
+            "created_at": timezone.now().isoformat(),
+            "target": options["target"],
+            "python": sys.version.split()[0],
+            "starts": wall_times,
+            "median": statistics.median(wall_times),
+            "max": max(wall_times),
+            "import_median": statistics.median(import_times),
+            "modules": len(starts[-1][1]),
+            "packages": packages,
+        }
+        self.write_report(report, options["top"])
+
+        output = Path(
+            options["output"]
+            or settings.BASE_DIR
+            / "benchmarks"
+            / f"startup-{report['commit'] or 'results'}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(f"Results saved to {output}")
+
+        if options["compare"]:
+            self.compare(
+                report,
+                json.loads(Path(options["compare"]).read_text()),
+                options["max_regression"],
+            )
+
+    def start(self, script):
+        """
+        Run ``script`` in a new interpreter. Return its wall time in
+        milliseconds and its imports, see `parse_importtime`.
+        """
+        env = {**os.environ}
+        env.setdefault("DJANGO_SETTINGS_MODULE", "settings.settings")
+        started = perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        wall = (perf_counter() - started) * 1000
+        if process.returncode:
+            errors = [
+                line
+                for line in process.stderr.splitlines()
+                if not line.startswith("import time:")
+            ]
+            raise CommandError(
+                "The application failed to start:\n" + "\n".join(errors[-20:])
+            )
+        return wall, parse_importtime(process.stderr)
+
+    def write_report(self, report, top):
+        self.stdout.write(
+            f"{report['target']} cold start: median {report['median']:.0f} ms, "
+            f"max {report['max']:.0f} ms over {len(report['starts'])} starts"
+        )
+        self.stdout.write(
+            f"Imports: {report['import_median']:.0f} ms, {report['modules']} modules"
+        )
+        self.stdout.write(f"{'package':<32}{'import ms':>10}")
+        for package, milliseconds in list(report["packages"].items())[:top]:
+            self.stdout.write(f"{package:<32}{milliseconds:>10.1f}")
+
+    def compare(self, report, baseline, max_regression):
+        """
+        Print the change of the median start time against ``baseline``,
+        failing when it grew by more than ``max_regression`` percent.
+        """
+        change = (report["median"] / baseline["median"] - 1) * 100
+        line = (
+            f"Compared with {baseline.get('commit') or 'the baseline'}: "
+            f"median start {change:+.1f}%"
+        )
+        if max_regression is not None and change > max_regression:
+            self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f"Start time regressed by more than {max_regression}%.")
+        self.stdout.write(line)
@@ -0,0 +1,215 @@
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+# Upper bounds of the histogram buckets, in seconds and in queries.
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Timings of the request being handled, None when it is not sampled.
+current_timings = ContextVar("current_timings", default=None)
+
+
+class RequestTimings:
+    """Database and serializer time spent by one request."""
+
+    __slots__ = ("db_time", "queries", "serializer_time", "serializing")
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding the query to the request's timings."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_time += perf_counter() - started
+        timings.queries += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    """Time the queries of a new database connection, see `record_query`."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def measure_serialization(func):
+    """
+    Add the time spent in ``func`` to the request's serializer time. Nested
+    calls, such as a list serializer calling its child, are counted once.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        timings = current_timings.get()
+        if timings is None or timings.serializing:
+            return func(*args, **kwargs)
+        timings.serializing = True
+        started = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.serializer_time += perf_counter() - started
+            timings.serializing = False
+
+    return wrapper
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    return ",".join(
+        f'{name}="{escape_label(value)}"' for name, value in zip(names, values)
+    )
+
+
+class Histogram:
+    """Prometheus histogram with a fixed set of label names."""
+
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        # label values -> [[count per bucket, then +Inf], sum]
+        self.samples = {}
+
+    def observe(self, labels, value):
+        sample = self.samples.get(labels)
+        if sample is None:
+            sample = self.samples[labels] = [[0] * (len(self.buckets) + 1), 0]
+        sample[0][bisect_left(self.buckets, value)] += 1
+        sample[1] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, (counts, total) in sorted(self.samples.items()):
+            label_text = format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Request metrics of this process, rendered in the Prometheus text format.
+
+    Apps add their own counters with `register_collector`, a callable
+    returning ``(name, documentation, type, {labels: value})`` tuples, where
+    ``labels`` is a tuple of ``(name, value)`` pairs.
+    """
+
+    label_names = ("route", "method")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collectors = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.histograms = {
+                "duration": Histogram(
+                    "http_request_duration_seconds",
+                    "Time spent handling requests.",
+                    self.label_names,
+                    DURATION_BUCKETS,
+                ),
+                "db": Histogram(
+                    "http_request_db_duration_seconds",
+                    "Time spent in database queries per request.",
+                    self.label_names,
+                    DURATION_BUCKETS,
+                ),
+                "queries": Histogram(
+                    "http_request_queries",
+                    "Database queries per request.",
+                    self.label_names,
+                    QUERY_BUCKETS,
+                ),
+                "serializer": Histogram(
+                    "http_request_serializer_duration_seconds",
+                    "Time spent serializing responses per request.",
+                    self.label_names,
+                    DURATION_BUCKETS,
+                ),
+            }
+
+    def register_collector(self, collector):
+        self._collectors.append(collector)
+
+    def observe(self, route, method, status, duration, timings):
+        labels = (route, method)
+        with self._lock:
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.histograms["duration"].observe(labels, duration)
+            self.histograms["db"].observe(labels, timings.db_time)
+            self.histograms["queries"].observe(labels, timings.queries)
+            self.histograms["serializer"].observe(labels, timings.serializer_time)
+
+    def render(self):
+        with self._lock:
+            lines = [
+                "# HELP http_requests_total Sampled requests handled.",
+                "# TYPE http_requests_total counter",
+            ]
+            for labels, count in sorted(self.requests.items()):
+                label_text = format_labels((*self.label_names, "status"), labels)
+                lines.append(f"http_requests_total{{{label_text}}} {count}")
+            for histogram in self.histograms.values():
+                lines.extend(histogram.render())
+
+        for collector in self._collectors:
+            for name, documentation, kind, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples.items():
+                    label_text = format_labels(
+                        [label for label, _ in labels], [value for _, value in labels]
+                    )
+                    lines.append(
+                        f"{name}{{{label_text}}} {value}"
+                        if label_text
+                        else f"{name} {value}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,105 @@
+from random import random
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import RequestTimings, current_timings, registry
+
+
+class InstrumentationMiddleware:
+    """
+    Record the wall time, database time, query count and serializer time of
+    a sample of ``METRICS_SAMPLE_RATE`` requests in histograms per route,
+    served at ``/metrics``. With ``METRICS_SERVER_TIMING`` they are also
+    sent to the client in a ``Server-Timing`` header.
+
+    Requests that are not sampled only pay for the sampling decision, and
+    their queries for a context variable lookup.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sample():
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.record(request, response, perf_counter() - started, timings)
+
+    async def __acall__(self, request):
+        if not self.sample():
+            return await self.get_response(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.record(request, response, perf_counter() - started, timings)
+
+    def sample(self):
+        rate = settings.METRICS_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random() < rate)
+
+    def record(self, request, response, duration, timings):
+        # View names keep the number of label values small, unlike paths.
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        registry.observe(route, request.method, response.status_code, duration, timings)
+        if settings.METRICS_SERVER_TIMING:
+            response["Server-Timing"] = (
+                f"total;dur={duration * 1000:.2f}, "
+                f'db;dur={timings.db_time * 1000:.2f};desc="{timings.queries} queries", '
+                f"serializer;dur={timings.serializer_time * 1000:.2f}"
+            )
+        return response
+
+
+class RateLimitMiddleware:
+    """
+    Send the budget left by the throttles of the request, see
+    `core.throttling`, in ``RateLimit-*`` headers.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.add_headers(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.add_headers(request, await self.get_response(request))
+
+    def add_headers(self, request, response):
+        rate_limit = getattr(request, "rate_limit", None)
+        if rate_limit is not None:
+            limit, remaining, reset, duration = rate_limit
+            response["RateLimit-Limit"] = str(limit)
+            response["RateLimit-Remaining"] = str(remaining)
+            response["RateLimit-Reset"] = str(reset)
+            response["RateLimit-Policy"] = f"{limit};w={duration}"
+        return response
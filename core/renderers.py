@@ -0,0 +1,98 @@
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.utils import encoders
+
+# Options giving the bytes of the DRF encoder: "Z" for UTC datetimes, and
+# non-string dict keys converted like `json.dumps` does.
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+# Converts the objects orjson and msgpack do not serialize natively, such as
+# lazy strings, decimals and querysets, like the DRF JSON encoder.
+encode_default = encoders.JSONEncoder().default
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    `JSONRenderer` encoding with orjson, with the same output.
+
+    Datetimes are formatted natively as the DRF encoder formats them.
+    Pretty printed or ASCII-only output, and data orjson cannot encode such
+    as integers larger than 64 bits, go through `JSONRenderer`. orjson writes
+    floats in exponent form as ``1e16`` rather than ``1e+16`` and non-finite
+    floats as ``null``, the task API has no floats.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like `JSONRenderer` does, for a strict JavaScript subset
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class ORJSONParser(JSONParser):
+    """
+    `JSONParser` decoding with orjson. Integers larger than 64 bits are
+    parsed as floats.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if encoding.lower().replace("_", "-") not in ("utf-8", "utf8"):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    Renderer for MessagePack, selected with ``Accept: application/msgpack``
+    or ``?format=msgpack``. Values are those of the JSON output, datetimes
+    included, so clients decode the same data.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encode_default)
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parser for MessagePack request bodies. Timestamps are parsed as UTC
+    datetimes.
+    """
+
+    media_type = "application/msgpack"
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, timestamp=3)
+        except (msgpack.UnpackException, ValueError) as exc:
+            raise ParseError("MessagePack parse error - %s" % str(exc))
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import _SpecRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+from .docs import apply_schema_overrides
+
+API_INFO = openapi.Info(
+    title="Task Manager API",
+    default_version="v1",
+    description="API documentation for Task Manager application",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="support@taskmanager.local"),
+)
+
+# Precomputed schema file and codec for each spec renderer format.
+SCHEMA_FILES = {
+    "json": ("openapi.json", OpenAPICodecJson),
+    "openapi": ("openapi.json", OpenAPICodecJson),
+    "yaml": ("openapi.yaml", OpenAPICodecYaml),
+}
+
+
+class SchemaGenerator(OpenAPISchemaGenerator):
+    """Schema generator applying the overrides recorded by `core.docs`."""
+
+    def get_overrides(self, view, method):
+        # The URL conf, and so every view, is loaded by now.
+        apply_schema_overrides()
+        return super().get_overrides(view, method)
+
+
+LiveSchemaView = get_schema_view(
+    API_INFO,
+    public=True,
+    generator_class=SchemaGenerator,
+    permission_classes=(permissions.AllowAny,),
+)
+
+
+def generate_schema():
+    """Generate the public OpenAPI schema without a request."""
+    generator = LiveSchemaView.generator_class(API_INFO)
+    return generator.get_schema(request=None, public=True)
+
+
+def write_schema_files(schema, directory=None):
+    """
+    Encode ``schema`` in every spec format and write it to ``directory``,
+    ``OPENAPI_SCHEMA_DIR`` by default. Return the paths written.
+    """
+    directory = Path(directory or settings.OPENAPI_SCHEMA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for filename, codec_class in dict(SCHEMA_FILES.values()).items():
+        path = directory / filename
+        # Write to a temporary file first so workers never read a partial file.
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_bytes(codec_class(validators=[]).encode(schema))
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+class _SchemaFile:
+    """A precomputed schema file, reloaded when it changes on disk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.content = None
+        self.etag = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Return ``(content, etag, mtime)``, or ``None`` if the file is missing."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+        if mtime != self.mtime:
+            with self.lock:
+                if mtime != self.mtime:
+                    content = Path(self.path).read_bytes()
+                    self.etag = '"%s"' % hashlib.sha256(content).hexdigest()
+                    self.content = content
+                    self.mtime = mtime
+        return self.content, self.etag, self.mtime
+
+
+_schema_files = {}
+
+
+def get_schema_file(filename):
+    path = Path(settings.OPENAPI_SCHEMA_DIR) / filename
+    if path not in _schema_files:
+        _schema_files[path] = _SchemaFile(path)
+    return _schema_files[path]
+
+
+class SchemaView(LiveSchemaView):
+    """
+    Schema view serving the schema precomputed by ``manage.py generate_schema``
+    with ``ETag`` and ``Last-Modified`` headers, so unchanged schemas are
+    answered with ``304 Not Modified``.
+
+    The schema is generated per request, as before, when no precomputed file
+    exists. The HTML UI is not affected, it only needs the API info.
+    """
+
+    def get(self, request, version="", format=None):
+        renderer = request.accepted_renderer
+        schema_file = None
+        if isinstance(renderer, _SpecRenderer) and renderer.format in SCHEMA_FILES:
+            schema_file = get_schema_file(SCHEMA_FILES[renderer.format][0]).load()
+        if schema_file is None:
+            return super().get(request, version, format)
+
+        content, etag, mtime = schema_file
+        last_modified = int(mtime)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = HttpResponse(content, content_type=renderer.media_type)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
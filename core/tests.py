@@ -0,0 +1,819 @@
+import datetime
+import json
+import tempfile
+import timeit
+import uuid
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import msgpack
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework import throttling as drf_throttling
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.db import (
+    ReplicaRouter,
+    is_pinned_to_primary,
+    replica_reads,
+    use_replica_reads,
+)
+from core.management.commands.benchmark_api import Command as BenchmarkAPI
+from core.management.commands.benchmark_sqlite_writers import (
+    Command as BenchmarkSQLiteWriters,
+)
+from core.metrics import registry
+from core.middleware import InstrumentationMiddleware
+from core.renderers import (
+    MessagePackParser,
+    MessagePackRenderer,
+    ORJSONParser,
+    ORJSONRenderer,
+)
+from core.throttling import (
+    CacheStore,
+    LocalStore,
+    UserRateThrottle,
+    get_store,
+    retry_after,
+)
+from tasks.models import Task
+from tasks.serializers import TASK_READ_FIELDS, serialize_task_rows
+
+
+class TestPrecomputedSchema(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.schema_dir.cleanup)
+        settings_override = override_settings(OPENAPI_SCHEMA_DIR=self.schema_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_generate_schema_command(self):
+        """Test that the command writes the JSON and YAML schemas"""
+        call_command("generate_schema", stdout=StringIO())
+
+        schema = json.loads((Path(self.schema_dir.name) / "openapi.json").read_text())
+        self.assertEqual(schema["info"]["title"], "Task Manager API")
+        self.assertIn("/tasks/", schema["paths"])
+        self.assertTrue((Path(self.schema_dir.name) / "openapi.yaml").exists())
+
+    def test_schema_overrides(self):
+        """Test that the overrides recorded by core.docs reach the schema"""
+        call_command("generate_schema", stdout=StringIO())
+
+        schema = json.loads((Path(self.schema_dir.name) / "openapi.json").read_text())
+        parameters = schema["paths"]["/tasks/sync/"]["get"]["parameters"]
+        self.assertIn(
+            {
+                "name": "since",
+                "in": "query",
+                "description": "Watermark returned by the previous sync.",
+                "type": "string",
+            },
+            parameters,
+        )
+        self.assertIn(
+            "Stream of tasks as NDJSON or CSV",
+            json.dumps(schema["paths"]["/tasks/export/"]["get"]["responses"]),
+        )
+
+    def test_docs_serve_precomputed_schema(self):
+        """Test that the docs view serves the precomputed schema file"""
+        call_command("generate_schema", stdout=StringIO())
+        content = (Path(self.schema_dir.name) / "openapi.json").read_bytes()
+
+        response = self.client.get("/docs/?format=openapi")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, content)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+
+    def test_docs_conditional_request(self):
+        """Test that an unchanged schema is answered with 304"""
+        call_command("generate_schema", stdout=StringIO())
+        etag = self.client.get("/docs/?format=openapi")["ETag"]
+
+        response = self.client.get("/docs/?format=openapi", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_docs_fall_back_to_live_schema(self):
+        """Test that the schema is generated when no file was precomputed"""
+        response = self.client.get("/docs/?format=openapi")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertIn("/tasks/", json.loads(response.content)["paths"])
+
+    def test_docs_ui(self):
+        """Test that the swagger UI is still served"""
+        response = self.client.get("/docs/", HTTP_ACCEPT="text/html")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"swagger", response.content)
+
+
+class TestSQLiteTuning(TestCase):
+    def test_connection_pragmas(self):
+        """Test that new connections get the tuned PRAGMAs"""
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS["busy_timeout"]
+            )
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS["cache_size"]
+            )
+
+    def test_benchmark_sqlite_writers(self):
+        """Test that concurrent writers never hit a locked database when tuned"""
+        out = StringIO()
+        command = BenchmarkSQLiteWriters(stdout=out)
+        # The benchmark connects to scratch databases of its own.
+        aliases = {"default", "benchmark_default", "benchmark_tuned"}
+        with mock.patch.object(type(self), "databases", aliases):
+            call_command(command, "--writers", "4", "--transactions", "25")
+
+        self.assertEqual(command.results["tuned"]["committed"], 100)
+        self.assertEqual(command.results["tuned"]["locked"], 0)
+        self.assertIn("tuned", out.getvalue())
+
+
+class TestBenchmarkAPI(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output_dir.cleanup)
+        self.output = Path(self.output_dir.name) / "results.json"
+
+    def benchmark(self, *args):
+        command = BenchmarkAPI(stdout=StringIO())
+        call_command(
+            command,
+            "--in-place",
+            "--users=2",
+            "--tasks=30",
+            "--requests=6",
+            "--concurrency=1",
+            "--mode=wsgi",
+            "--mode=asgi",
+            "--endpoint=list",
+            "--endpoint=detail",
+            "--endpoint=create",
+            "--endpoint=refresh",
+            f"--output={self.output}",
+            *args,
+        )
+        return command
+
+    def test_results_saved(self):
+        """Test that every endpoint is benchmarked without errors and saved"""
+        self.benchmark()
+
+        report = json.loads(self.output.read_text())
+        self.assertEqual(report["tasks_per_user"], 30)
+        self.assertEqual(set(report["results"]), {"wsgi", "asgi"})
+        for results in report["results"].values():
+            self.assertEqual(set(results), {"list", "detail", "create", "refresh"})
+            for result in results.values():
+                self.assertEqual(result["requests"], 6)
+                self.assertEqual(result["errors"], 0)
+                self.assertGreater(result["p95"], 0)
+            self.assertGreaterEqual(results["create"]["queries_per_request"], 1)
+        self.assertEqual(Task.objects.filter(owner__username="benchmark-0").count(), 42)
+
+    def test_compare(self):
+        """Test that a p95 regression over the threshold fails the run"""
+        self.benchmark()
+        baseline = Path(self.output_dir.name) / "baseline.json"
+        report = json.loads(self.output.read_text())
+        for results in report["results"].values():
+            for result in results.values():
+                result["p95"] /= 100
+        baseline.write_text(json.dumps(report))
+
+        with self.assertRaisesMessage(CommandError, "p95 latency regressed"):
+            self.benchmark(f"--compare={baseline}", "--max-regression=50")
+
+
+class TestStartupTime(TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output_dir.cleanup)
+        self.output = Path(self.output_dir.name) / "startup.json"
+
+    def test_report(self):
+        """Test that cold starts are measured and drf-yasg is not imported"""
+        call_command(
+            "startup_time", "--repeat=1", f"--output={self.output}", stdout=StringIO()
+        )
+
+        report = json.loads(self.output.read_text())
+        self.assertEqual(len(report["starts"]), 1)
+        self.assertGreater(report["median"], 0)
+        self.assertIn("django", report["packages"])
+        self.assertIn("tasks", report["packages"])
+        self.assertNotIn("drf_yasg", report["packages"])
+
+    def test_compare(self):
+        """Test that a start time regression over the threshold fails the run"""
+        baseline = Path(self.output_dir.name) / "baseline.json"
+        baseline.write_text(json.dumps({"commit": "abc1234", "median": 1.0}))
+
+        with self.assertRaisesMessage(CommandError, "Start time regressed"):
+            call_command(
+                "startup_time",
+                "--repeat=1",
+                f"--output={self.output}",
+                f"--compare={baseline}",
+                "--max-regression=50",
+                stdout=StringIO(),
+            )
+
+
+# The default database stands in for the replica, so routing is observable
+# without a second server.
+@override_settings(DATABASE_REPLICA_ALIAS="default", TASKS_RESPONSE_CACHE_TIMEOUT=0)
+class TestReplicaRouting(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(owner=self.user, title="Task")
+
+    def tearDown(self):
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def routed_reads(self, method, url, data=None):
+        """Return the response and the aliases the router sent reads to"""
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            routed.append(db_for_read(router, model, **hints))
+            return routed[-1]
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", record):
+            response = getattr(self.client, method)(url, data, format="json")
+        return response, routed
+
+    def test_router(self):
+        """Test that reads go to the replica only inside use_replica_reads"""
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Task))
+        with use_replica_reads():
+            self.assertEqual(router.db_for_read(Task), "default")
+            with use_replica_reads(False):
+                self.assertIsNone(router.db_for_read(Task))
+        self.assertFalse(replica_reads.get())
+        self.assertIsNone(router.db_for_write(Task))
+
+    @override_settings(DATABASE_REPLICA_ALIAS=None)
+    def test_router_without_replica(self):
+        """Test that reads stay on the default database without a replica"""
+        with use_replica_reads():
+            self.assertIsNone(ReplicaRouter().db_for_read(Task))
+
+    def test_no_migrations_on_replica(self):
+        """Test that migrations are never run on the replica"""
+        router = ReplicaRouter()
+        self.assertFalse(router.allow_migrate("default", "tasks"))
+        with override_settings(DATABASE_REPLICA_ALIAS="replica"):
+            self.assertIsNone(router.allow_migrate("default", "tasks"))
+
+    def test_reads_use_replica(self):
+        """Test that task list and detail reads are routed to the replica"""
+        for url in ("/tasks/", f"/tasks/{self.task.id}/"):
+            response, routed = self.routed_reads("get", url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("default", routed)
+        self.assertFalse(replica_reads.get())
+
+    def test_export_reads_replica(self):
+        """Test that the streamed export rows are read from the replica"""
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            routed.append(db_for_read(router, model, **hints))
+            return routed[-1]
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", record):
+            response = self.client.get("/tasks/export/")
+            content = b"".join(response.streaming_content)
+
+        self.assertIn(b'"title":"Task"', content)
+        # Routed while the view runs, not while the response streams
+        self.assertEqual(routed, ["default"])
+
+    def test_sync_reads_primary(self):
+        """Test that sync reads stay on the primary"""
+        response, routed = self.routed_reads("get", "/tasks/sync/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("default", routed)
+
+    def test_write_pins_user_to_primary(self):
+        """Test that a user reads from the primary after a write"""
+        response, routed = self.routed_reads(
+            "patch", f"/tasks/{self.task.id}/", {"title": "Renamed"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("default", routed)
+        self.assertTrue(is_pinned_to_primary(self.user.id))
+
+        response, routed = self.routed_reads("get", "/tasks/")
+        self.assertEqual(response.data["results"][0]["title"], "Renamed")
+        self.assertNotIn("default", routed)
+
+    def test_failed_write_does_not_pin(self):
+        """Test that a rejected write leaves the user on the replica"""
+        response = self.client.post("/tasks/", {}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(is_pinned_to_primary(self.user.id))
+
+
+@override_settings(METRICS_SERVER_TIMING=True, TASKS_RESPONSE_CACHE_TIMEOUT=0)
+class TestInstrumentation(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        Task.objects.create(owner=self.user, title="Task")
+
+    def tearDown(self):
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def server_timing(self, response):
+        """Return the Server-Timing metrics as {name: (duration, description)}"""
+        timings = {}
+        for metric in response["Server-Timing"].split(", "):
+            name, *params = metric.split(";")
+            params = dict(param.split("=", 1) for param in params)
+            timings[name] = (float(params["dur"]), params.get("desc", ""))
+        return timings
+
+    def test_server_timing(self):
+        """Test that the timings of a request are sent in Server-Timing"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/tasks/")
+
+        timings = self.server_timing(response)
+        self.assertEqual(timings["db"][1], f'"{len(ctx.captured_queries)} queries"')
+        self.assertGreater(timings["db"][0], 0)
+        self.assertGreater(timings["serializer"][0], 0)
+        self.assertGreaterEqual(timings["total"][0], timings["db"][0])
+
+    def test_metrics_histograms(self):
+        """Test that /metrics serves histograms per route"""
+        self.client.get("/tasks/")
+        self.client.get("/tasks/")
+        self.client.get("/nowhere/")
+
+        with self.settings(METRICS_TOKEN="secret"):
+            response = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        labels = 'route="task-list",method="GET"'
+        self.assertIn(f'http_requests_total{{{labels},status="200"}} 2', body)
+        self.assertIn(
+            f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', body
+        )
+        self.assertIn(f"http_request_queries_count{{{labels}}} 2", body)
+        self.assertIn(f"http_request_serializer_duration_seconds_sum{{{labels}}}", body)
+        self.assertIn('route="unmatched",method="GET",status="404"', body)
+        self.assertIn('tasks_response_cache_lookups_total{result="hits"}', body)
+        self.assertIn("password_hashing_pending 0", body)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_sampling_off(self):
+        """Test that nothing is recorded when sampling is off"""
+        response = self.client.get("/tasks/")
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(registry.requests, {})
+
+    def test_sampling_off_overhead(self):
+        """Test that requests that are not sampled cost much less than sampled ones"""
+        request = RequestFactory().get("/tasks/")
+        request.resolver_match = None
+
+        def get_response(request):
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(get_response)
+        number = 10000
+        bare = min(timeit.repeat(lambda: get_response(request), number=number))
+        overheads = {}
+        for rate in (0, 1):
+            with override_settings(METRICS_SAMPLE_RATE=rate):
+                instrumented = min(
+                    timeit.repeat(lambda: middleware(request), number=number)
+                )
+            overheads[rate] = (instrumented - bare) / number
+        print(
+            "\ninstrumentation overhead: "
+            f"sampling off {overheads[0] * 1e6:.2f} us, "
+            f"sampled {overheads[1] * 1e6:.2f} us"
+        )
+        self.assertLess(overheads[0], overheads[1] / 2)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        """Test that /metrics requires the token when one is set"""
+        self.assertEqual(self.client.get("/metrics/").status_code, 401)
+        response = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_disabled_without_token(self):
+        """Test that /metrics is not served while no token is set"""
+        self.assertEqual(self.client.get("/metrics/").status_code, 404)
+
+    async def test_async_view_queries(self):
+        """Test that queries run by async views are counted"""
+        token = await sync_to_async(RefreshToken.for_user)(self.user)
+        response = await self.async_client.get(
+            "/async/tasks/", headers={"Authorization": f"Bearer {token.access_token}"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        description = self.server_timing(response)["db"][1]
+        self.assertNotEqual(description, '"0 queries"')
+
+
+class TestRenderers(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        Task.objects.bulk_create(
+            Task(
+                owner=self.user,
+                title=f'Task {i} é \u2028 ✓ "quoted" </script>',
+                description=None if i % 3 == 0 else f"Line\n{i}\t\u2029\x00",
+                completed=i % 2 == 0,
+            )
+            for i in range(1000)
+        )
+
+    def tearDown(self):
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def task_rows(self, size=1000):
+        return serialize_task_rows(Task.objects.values(*TASK_READ_FIELDS)[:size])
+
+    def test_json_output_is_identical(self):
+        """Test that orjson renders the bytes of the DRF JSON renderer"""
+        utc = datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+        payloads = {
+            "tasks": self.task_rows(),
+            "page": self.client.get("/tasks/").data,
+            "task": self.client.get(f"/tasks/{Task.objects.first().pk}/").data,
+            "types": {
+                "utc": utc,
+                "zero offset": timezone.localtime(
+                    utc, timezone=timezone.get_fixed_timezone(0)
+                ),
+                "kolkata": timezone.localtime(
+                    utc, timezone=timezone.get_fixed_timezone(330)
+                ),
+                "microseconds": utc.replace(microsecond=123456),
+                "naive": datetime.datetime(2025, 1, 2, 3, 4, 5),
+                "date": datetime.date(2025, 1, 2),
+                "time": datetime.time(3, 4, 5, 6),
+                "timedelta": datetime.timedelta(days=1, seconds=5),
+                "decimal": Decimal("1.5"),
+                "uuid": uuid.UUID(int=1),
+                "lazy": gettext_lazy("This field is required."),
+                "queryset": User.objects.values_list("username", flat=True),
+                "bytes": b"bytes",
+                1: [True, False, None, (1, 2), -(2**63), 2**64 - 1],
+            },
+            "big integer": [2**70],
+            "empty": {},
+            "none": None,
+        }
+        for name, data in payloads.items():
+            with self.subTest(name):
+                self.assertEqual(
+                    ORJSONRenderer().render(data), JSONRenderer().render(data)
+                )
+                indented = "application/json; indent=4"
+                self.assertEqual(
+                    ORJSONRenderer().render(data, indented),
+                    JSONRenderer().render(data, indented),
+                )
+
+    def test_json_response(self):
+        """Test that task responses are rendered with orjson"""
+        response = self.client.get("/tasks/?page_size=100")
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+        self.assertEqual(
+            response.json()["results"][0]["title"], self.task_rows(1)[0]["title"]
+        )
+
+    def test_msgpack_response(self):
+        """Test that MessagePack is served when the client accepts it"""
+        listed = self.client.get("/tasks/").json()
+
+        response = self.client.get("/tasks/", HTTP_ACCEPT="application/msgpack")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), listed)
+        # The formats are cached and validated apart
+        self.assertNotEqual(response["ETag"], self.client.get("/tasks/")["ETag"])
+        response = self.client.get("/tasks/?format=msgpack")
+        self.assertEqual(
+            msgpack.unpackb(response.content)["results"], listed["results"]
+        )
+
+    def test_msgpack_request(self):
+        """Test that tasks can be created and updated with MessagePack"""
+        response = self.client.post(
+            "/tasks/",
+            msgpack.packb({"title": "Packed", "completed": True}),
+            content_type="application/msgpack",
+            HTTP_ACCEPT="application/msgpack",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        created = msgpack.unpackb(response.content)
+        self.assertEqual(created["title"], "Packed")
+        self.assertTrue(created["completed"])
+        self.assertTrue(created["created_at"].endswith("Z"))
+
+        response = self.client.patch(
+            f"/tasks/{created['id']}/",
+            msgpack.packb({"title": "Packed", "completed": False}),
+            content_type="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["completed"])
+
+    def test_parsers(self):
+        """Test that the parsers read valid bodies and reject invalid ones"""
+        body = {"title": "Task é", "tags": [1, None, True]}
+        self.assertEqual(ORJSONParser().parse(BytesIO(json.dumps(body).encode())), body)
+        self.assertEqual(MessagePackParser().parse(BytesIO(msgpack.packb(body))), body)
+        parsed = MessagePackParser().parse(
+            BytesIO(
+                msgpack.packb(
+                    datetime.datetime(2025, 1, 2, tzinfo=datetime.timezone.utc),
+                    datetime=True,
+                )
+            )
+        )
+        self.assertEqual(parsed.isoformat(), "2025-01-02T00:00:00+00:00")
+        for parser, invalid in (
+            (ORJSONParser(), b'{"title": '),
+            (ORJSONParser(), b"NaN"),
+            (MessagePackParser(), msgpack.packb(body)[:-3]),
+            (MessagePackParser(), msgpack.packb(body) + b"\x01"),
+        ):
+            with self.subTest(parser=parser, body=invalid):
+                with self.assertRaises(ParseError):
+                    parser.parse(BytesIO(invalid))
+
+    def test_parse_error_response(self):
+        """Test that an invalid MessagePack body is a 400 error"""
+        response = self.client.post(
+            "/tasks/", b"\xc1", content_type="application/msgpack"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("MessagePack parse error", response.json()["detail"])
+
+    def test_encode_benchmark(self):
+        """Benchmark the encoding of task pages with each renderer"""
+        renderers = {
+            "json": JSONRenderer(),
+            "orjson": ORJSONRenderer(),
+            "msgpack": MessagePackRenderer(),
+        }
+        for size in (10, 100, 1000):
+            rows = self.task_rows(size)
+            number = max(1, 10000 // size)
+            times = {
+                name: min(
+                    timeit.repeat(
+                        lambda: renderer.render(rows), number=number, repeat=3
+                    )
+                )
+                / number
+                for name, renderer in renderers.items()
+            }
+            print(
+                f"\nencode {size} tasks: "
+                + ", ".join(
+                    f"{name} {seconds * 1000:.3f} ms" for name, seconds in times.items()
+                )
+            )
+            if size == 1000:
+                self.assertLess(times["orjson"], times["json"])
+                self.assertLess(times["msgpack"], times["json"])
+
+
+def throttle_rates(**rates):
+    """Override the throttle rates, the others are not limited."""
+    return override_settings(
+        REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {"user": None, "anon": None, "auth": None}
+            | rates,
+        }
+    )
+
+
+# The start of a window of any period
+NOW = 86400 * 20000
+
+
+class TestThrottling(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+
+    def tearDown(self):
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def test_sliding_window(self):
+        """Test that the previous window counts for its share still sliding"""
+        for store in (LocalStore(max_keys=10), CacheStore("default")):
+            with self.subTest(store=type(store).__name__):
+                allowed = [store.acquire("key", NOW, 60, 10)[0] for _ in range(11)]
+                self.assertEqual(allowed, [True] * 10 + [False])
+                self.assertEqual(
+                    store.acquire("key", NOW + 30, 60, 10), (False, 0, 10, 0.5)
+                )
+
+                # Half of the previous window slid out: 5 requests left
+                allowed = [store.acquire("key", NOW + 90, 60, 10)[0] for _ in range(6)]
+                self.assertEqual(allowed, [True] * 5 + [False])
+                self.assertEqual(
+                    store.acquire("key", NOW + 90, 60, 10), (False, 10, 5, 0.5)
+                )
+                # Two windows later, nothing is left of it
+                self.assertTrue(store.acquire("key", NOW + 180, 60, 10)[0])
+                self.assertTrue(store.acquire("other", NOW + 180, 60, 10)[0])
+
+    def test_retry_after(self):
+        """Test that the wait ends when one more request fits"""
+        # Full previous window, 5 requests in the current one
+        self.assertEqual(retry_after(10, 10, 5, 0.5, 60), 6)
+        # Full current window
+        self.assertEqual(retry_after(10, 0, 10, 0.5, 60), 36)
+        self.assertIsNone(retry_after(0, 0, 0, 0.5, 60))
+
+    def test_local_store_keys(self):
+        """Test that the least recently used keys are dropped"""
+        store = LocalStore(max_keys=2)
+        for key in ("a", "b", "a", "c"):
+            store.acquire(key, NOW, 60, 10)
+
+        self.assertEqual(list(store.counters), ["a", "c"])
+
+    @throttle_rates(user="3/min")
+    @mock.patch("core.throttling.time", return_value=NOW + 15)
+    def test_user_limit(self, _):
+        """Test that users get their budget in headers, then 429 responses"""
+        self.client.force_authenticate(user=self.user)
+
+        for remaining in (2, 1, 0):
+            response = self.client.get("/tasks/")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["RateLimit-Limit"], "3")
+            self.assertEqual(response["RateLimit-Remaining"], str(remaining))
+            self.assertEqual(response["RateLimit-Reset"], "45")
+            self.assertEqual(response["RateLimit-Policy"], "3;w=60")
+
+        response = self.client.get("/tasks/")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "65")
+        self.assertEqual(response["RateLimit-Remaining"], "0")
+
+        # Other users have their own budget
+        other = User.objects.create_user(username="other", password="testpassword")
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get("/tasks/").status_code, 200)
+
+    @throttle_rates(anon="4/min", auth="2/min")
+    @mock.patch("core.throttling.time", return_value=NOW)
+    def test_auth_limit(self, _):
+        """Test that login attempts are limited per IP address"""
+        credentials = {"username": "testuser", "password": "wrong"}
+        statuses = [
+            self.client.post("/accounts/login/", credentials).status_code
+            for _ in range(3)
+        ]
+
+        self.assertEqual(statuses, [400, 400, 429])
+        response = self.client.post(
+            "/accounts/login/", credentials, REMOTE_ADDR="10.0.0.1"
+        )
+        self.assertEqual(response.status_code, 400)
+        # The anonymous limit of the IP address counts the login attempts
+        refresh = {"refresh": "invalid"}
+        response = self.client.post("/accounts/refresh/", refresh)
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post("/accounts/refresh/", refresh)
+        self.assertEqual(response.status_code, 429)
+
+    @throttle_rates(user="1/min")
+    @override_settings(THROTTLE_STORE="local")
+    async def test_async_views(self):
+        """Test that the async views apply the throttles"""
+        await sync_to_async(get_store().clear)()
+        token = await sync_to_async(RefreshToken.for_user)(self.user)
+        headers = {"Authorization": f"Bearer {token.access_token}"}
+
+        response = await self.async_client.get("/async/tasks/", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["RateLimit-Remaining"], "0")
+        response = await self.async_client.get("/async/tasks/", headers=headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_throttle_benchmark(self):
+        """Benchmark the cost of a throttle check with each store"""
+        request = SimpleNamespace(
+            user=SimpleNamespace(is_authenticated=True, id=1, pk=1),
+            META={"REMOTE_ADDR": "127.0.0.1"},
+        )
+        number = 10000
+        times = {}
+        with throttle_rates(user=f"{number * 10}/min"):
+            for store in ("local", "cache"):
+                with override_settings(THROTTLE_STORE=store):
+                    times[store] = min(
+                        timeit.repeat(
+                            lambda: UserRateThrottle().allow_request(request, None),
+                            number=number,
+                            repeat=3,
+                        )
+                    )
+            # DRF's throttle, keeping the time of each request of the period
+            drf_throttling.UserRateThrottle.THROTTLE_RATES = {"user": "1000/min"}
+            try:
+                times["DRF, 1000/min"] = min(
+                    timeit.repeat(
+                        lambda: drf_throttling.UserRateThrottle().allow_request(
+                            request, None
+                        ),
+                        number=1000,
+                        repeat=3,
+                    )
+                ) * (number / 1000)
+            finally:
+                del drf_throttling.UserRateThrottle.THROTTLE_RATES
+        print(
+            "\nthrottle check: "
+            + ", ".join(
+                f"{store} {seconds / number * 1e6:.2f} us"
+                for store, seconds in times.items()
+            )
+        )
+        self.assertLess(times["local"], times["DRF, 1000/min"])
+        self.assertLess(times["cache"], times["DRF, 1000/min"])
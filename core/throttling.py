@@ -0,0 +1,223 @@
+import math
+import threading
+from functools import cache
+from time import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@cache
+def parse_rate(rate):
+    """
+    Return ``(requests, seconds)`` for a rate such as ``"100/min"``, or
+    ``(None, None)`` when there is no rate.
+    """
+    if not rate:
+        return None, None
+    requests, period = rate.split("/")
+    return int(requests), DURATIONS[period[0]]
+
+
+def retry_after(limit, previous, current, elapsed, duration):
+    """
+    Return the seconds until one more request fits in the sliding window,
+    given the request counts of the previous and current fixed windows and
+    the elapsed share of the current one.
+    """
+    if limit < 1:
+        return None
+    if current < limit:
+        # Once enough of the previous window slid out
+        share = 1 - (limit - current - 1) / previous
+        wait = max(share - elapsed, 0)
+    else:
+        # In the next window, once enough of this one slid out
+        wait = 1 - elapsed + 1 - (limit - 1) / current
+    # Rounded, as DRF rounds up Retry-After
+    return round(wait * duration, 6)
+
+
+class CacheStore:
+    """
+    Window counters kept in a Django cache, shared by the workers when the
+    cache is. Each key has one counter per fixed window, expiring once it
+    is no longer the previous window.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def acquire(self, key, now, duration, limit):
+        """
+        Count a request for ``key`` unless the sliding window already holds
+        ``limit`` requests. Return whether it was counted, the previous and
+        current window counts and the elapsed share of the current window.
+        """
+        index, elapsed = divmod(now / duration, 1)
+        current_key = f"{key}:{int(index)}"
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            if self.cache.add(current_key, 1, duration * 2):
+                current = 1
+            else:
+                current = self.cache.incr(current_key)
+        previous = self.cache.get(f"{key}:{int(index) - 1}", 0)
+        if previous * (1 - elapsed) + current <= limit:
+            return True, previous, current, elapsed
+        try:
+            # Denied requests do not count
+            self.cache.decr(current_key)
+        except ValueError:
+            pass
+        return False, previous, current - 1, elapsed
+
+
+class LocalStore:
+    """
+    Window counters kept in the memory of the process, for single process
+    servers or limits per worker. Holds at most ``max_keys`` keys, dropping
+    the least recently used.
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        # {key: [window index, previous count, current count]}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, key, now, duration, limit):
+        """See `CacheStore.acquire`."""
+        index, elapsed = divmod(now / duration, 1)
+        with self.lock:
+            counter = self.counters.pop(key, None)
+            if counter is None:
+                counter = [index, 0, 0]
+            elif counter[0] != index:
+                counter[1] = counter[2] if counter[0] == index - 1 else 0
+                counter[0], counter[2] = index, 0
+            # Reinserted last, so the first key is the least recently used
+            self.counters[key] = counter
+            if len(self.counters) > self.max_keys:
+                del self.counters[next(iter(self.counters))]
+            _, previous, current = counter
+            allowed = previous * (1 - elapsed) + current + 1 <= limit
+            if allowed:
+                current = counter[2] = current + 1
+        return allowed, previous, current, elapsed
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+
+
+_stores = {}
+
+
+def get_store():
+    """Return the store selected by ``THROTTLE_STORE``."""
+    if settings.THROTTLE_STORE == "local":
+        name = ("local", settings.THROTTLE_LOCAL_MAX_KEYS)
+    else:
+        name = ("cache", settings.THROTTLE_CACHE_ALIAS)
+    store = _stores.get(name)
+    if store is None:
+        store = _stores[name] = (
+            LocalStore(name[1]) if name[0] == "local" else CacheStore(name[1])
+        )
+    return store
+
+
+class SlidingWindowRateThrottle(BaseThrottle):
+    """
+    Throttle to the ``DEFAULT_THROTTLE_RATES`` rate of ``scope``, counting
+    the requests of the last period with a sliding window counter.
+
+    The count is estimated from the counts of the current and previous
+    fixed windows, weighting the previous one by how much of it is still in
+    the sliding window, so each key needs two counters whatever its rate.
+    The remaining budget is recorded for `RateLimitMiddleware`.
+    """
+
+    scope = None
+
+    def __init__(self):
+        self.limit, self.duration = parse_rate(
+            api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        )
+        self.wait_seconds = None
+
+    def get_ident_key(self, request, view):
+        """Return the key of the client to throttle, None to not throttle."""
+        raise NotImplementedError(".get_ident_key() must be overridden")
+
+    def allow_request(self, request, view):
+        if self.limit is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        allowed, previous, current, elapsed = get_store().acquire(
+            f"throttle:{self.scope}:{ident}", time(), self.duration, self.limit
+        )
+        if not allowed:
+            self.wait_seconds = retry_after(
+                self.limit, previous, current, elapsed, self.duration
+            )
+        self.record(request, previous * (1 - elapsed) + current, elapsed)
+        return allowed
+
+    def record(self, request, count, elapsed):
+        """Record the budget left, keeping the smallest of the throttles."""
+        remaining = max(self.limit - math.ceil(count), 0)
+        request = getattr(request, "_request", request)
+        recorded = getattr(request, "rate_limit", None)
+        if recorded is None or remaining < recorded[1]:
+            request.rate_limit = (
+                self.limit,
+                remaining,
+                math.ceil((1 - elapsed) * self.duration),
+                self.duration,
+            )
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserRateThrottle(SlidingWindowRateThrottle):
+    """Throttle authenticated requests per user."""
+
+    scope = "user"
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.id
+        return None
+
+
+class AnonRateThrottle(SlidingWindowRateThrottle):
+    """Throttle anonymous requests per client IP address."""
+
+    scope = "anon"
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.get_ident(request)
+
+
+class AuthRateThrottle(SlidingWindowRateThrottle):
+    """
+    Throttle requests to the login and register endpoints, which hash
+    passwords, per client IP address.
+    """
+
+    scope = "auth"
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
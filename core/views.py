@@ -0,0 +1,42 @@
+from functools import cache
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+
+from .metrics import registry
+
+
+def metrics(request):
+    """
+    Serve the request metrics of this process in the Prometheus text
+    format to scrapers sending ``METRICS_TOKEN`` as a bearer token. The
+    endpoint is not found while no token is set.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404
+    if not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@cache
+def get_docs_view():
+    from .schema import SchemaView
+
+    return SchemaView.with_ui("swagger", cache_timeout=0)
+
+
+@csrf_exempt
+def docs(request, *args, **kwargs):
+    """
+    Serve the Swagger UI and the OpenAPI schema. drf-yasg and the schema
+    views are imported on the first request, not when the URL conf loads.
+    """
+    return get_docs_view()(request, *args, **kwargs)
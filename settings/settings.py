@@ -3,7 +3,6 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
-from django.core.management.utils import get_random_secret_key
 from environs import Env
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -14,39 +13,33 @@ ENVIRONMENT = os.environ.get("ENV")
 
 if ENVIRONMENT == "dev":
     PATH = "envs/.env.dev"
-    print(3 * "\n")
-    print(50 * "#")
-    print("Loading Env Variables from: " + PATH)
-    print(50 * "#")
-    print(3 * "\n")
 # defaulting to local env for this project, otherwise dev should be default
 else:
     PATH = "envs/.env.local"
-    print(3 * "\n")
-    print(50 * "#")
-    print("Loading Env Variables from: " + PATH)
-    print(50 * "#")
-    print(3 * "\n")
 
 env = Env()
 # reading the env vars from the selected path
 env.read_env(PATH)
 
 
-# method to get the env values
-def getenv_default(value):
-    env_str = os.getenv(value, get_random_secret_key())
-    return env_str if env_str else get_random_secret_key()
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = env.bool("DEBUG", default=False)
 
+# getting secret key from env vars. Every worker process must share it to
+# verify the tokens signed by the others, a random one is only generated for
+# DEBUG runs.
+SECRET_KEY = env.str("SECRET_KEY", "")
+if not SECRET_KEY:
+    if not DEBUG:
+        from django.core.exceptions import ImproperlyConfigured
 
-# getting secret key from env vars
-SECRET_KEY = getenv_default("SECRET_KEY")
+        raise ImproperlyConfigured("SECRET_KEY must be set when DEBUG is off.")
+    from django.core.management.utils import get_random_secret_key
 
-# SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = env.bool("DEBUG", default=False)
+    SECRET_KEY = get_random_secret_key()
 
 # getting allowed hosts from env vars
-ALLOWED_HOSTS = getenv_default("ALLOWED_HOSTS").split(",")
+ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", default=[])
 
 # Application definition
 
@@ -60,15 +53,28 @@ INSTALLED_APPS = [
     # 3rd party
     "rest_framework",
     "django_filters",
-    "drf_yasg",
     "rest_framework_simplejwt",
     "rest_framework_simplejwt.token_blacklist",
     # local
-    "accounts",
+    "core",
     "tasks",
+    # After tasks, so a fresh database numbers the content types of tasks
+    # like db.json does
+    "accounts",
 ]
 
+# Serve the Swagger UI and schema at /docs/. API-only workers can turn it off
+# to skip drf-yasg entirely, it is otherwise only imported on first use.
+API_DOCS_ENABLED = env.bool("API_DOCS_ENABLED", default=True)
+if API_DOCS_ENABLED:
+    # For the Swagger UI templates and static files
+    INSTALLED_APPS.append("drf_yasg")
+
 MIDDLEWARE = [
+    # First, so its timings include the other middleware
+    "core.middleware.InstrumentationMiddleware",
+    # Sends the RateLimit-* headers of the throttles, see core.throttling
+    "core.middleware.RateLimitMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,30 +84,109 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Share of requests whose timings are recorded for /metrics, 0 turns it off
+METRICS_SAMPLE_RATE = env.float("METRICS_SAMPLE_RATE", default=1.0)
+# Send the timings of sampled requests to clients in a Server-Timing header
+METRICS_SERVER_TIMING = env.bool("METRICS_SERVER_TIMING", default=DEBUG)
+# Bearer token required to read /metrics, which is disabled when empty
+METRICS_TOKEN = env.str("METRICS_TOKEN", default="")
+
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         # This line enforces user authentication for all API views
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        # This line sets JWT authentication as the default method
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # This line sets JWT authentication as the default method, it caches
+        # verified tokens and does not load the user from the database
+        "accounts.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_FILTER_BACKENDS": [
         # This line enables filtering capabilities in API views
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        # JSON is encoded with orjson, MessagePack is served on request with
+        # "Accept: application/msgpack"
+        "core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "core.renderers.MessagePackRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.renderers.ORJSONParser",
+        "core.renderers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "DEFAULT_THROTTLE_CLASSES": [
+        # Sliding window limits per user, and per IP address for anonymous
+        # requests, the login and register views also limit each IP address
+        "core.throttling.UserRateThrottle",
+        "core.throttling.AnonRateThrottle",
+    ],
+    # Requests per second, minute, hour or day, empty to not limit
+    "DEFAULT_THROTTLE_RATES": {
+        "user": env.str("THROTTLE_RATE_USER", default="1000/min") or None,
+        "anon": env.str("THROTTLE_RATE_ANON", default="100/min") or None,
+        "auth": env.str("THROTTLE_RATE_AUTH", default="20/min") or None,
+    },
     # This line sets the default pagination class for API responses
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
 }
 
+# Maximum number of tasks accepted by one request to the bulk endpoints
+TASKS_BULK_MAX_ITEMS = env.int("TASKS_BULK_MAX_ITEMS", default=500)
+# Number of rows written per INSERT/UPDATE statement by the bulk endpoints
+TASKS_BULK_BATCH_SIZE = 500
+# Number of rows fetched per database round trip by the export endpoint
+TASKS_EXPORT_CHUNK_SIZE = env.int("TASKS_EXPORT_CHUNK_SIZE", default=2000)
+# Seconds a cached task count is kept before it is counted again
+TASKS_COUNT_CACHE_TIMEOUT = env.int("TASKS_COUNT_CACHE_TIMEOUT", default=300)
+# Uncached counts estimated by the query planner above this many rows are
+# served as the estimate instead of being counted (PostgreSQL only)
+TASKS_COUNT_ESTIMATE_THRESHOLD = env.int(
+    "TASKS_COUNT_ESTIMATE_THRESHOLD", default=100000
+)
+# Cache alias of the task list/detail response cache
+TASKS_RESPONSE_CACHE_ALIAS = env.str("TASKS_RESPONSE_CACHE_ALIAS", default="default")
+# Seconds unused task responses are cached, 0 disables the response cache,
+# which is also off when the cache is per process
+TASKS_RESPONSE_CACHE_TIMEOUT = env.int("TASKS_RESPONSE_CACHE_TIMEOUT", default=300)
+# Maximum number of changed tasks, and of deleted tasks, per sync response
+TASKS_SYNC_PAGE_SIZE = env.int("TASKS_SYNC_PAGE_SIZE", default=500)
+# Days tombstones of deleted tasks are kept, older sync watermarks are rejected
+TASKS_SYNC_TOMBSTONE_RETENTION_DAYS = env.int(
+    "TASKS_SYNC_TOMBSTONE_RETENTION_DAYS", default=30
+)
+# Days after their last update that completed tasks are moved to the archive
+# by `manage.py archive_tasks`
+TASKS_ARCHIVE_AFTER_DAYS = env.int("TASKS_ARCHIVE_AFTER_DAYS", default=90)
+
+# Where throttles count requests: "cache" in the THROTTLE_CACHE_ALIAS cache,
+# shared by the workers when the cache is, or "local" in each process
+THROTTLE_STORE = env.str("THROTTLE_STORE", default="cache")
+THROTTLE_CACHE_ALIAS = env.str("THROTTLE_CACHE_ALIAS", default="default")
+# Maximum number of clients counted by each process with the local store
+THROTTLE_LOCAL_MAX_KEYS = env.int("THROTTLE_LOCAL_MAX_KEYS", default=100000)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=10),
     "REFRESH_TOKEN_LIFETIME": timedelta(minutes=20),
     "ROTATE_REFRESH_TOKENS": True,
+    # Checks the blacklist through a Bloom filter, see accounts.tokens
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.TokenRefreshSerializer",
+    # Rejects revoked tokens, see accounts.authentication
+    "TOKEN_VERIFY_SERIALIZER": "accounts.serializers.TokenVerifySerializer",
 }
 
+# Seconds after which each worker rebuilds its filter of blacklisted refresh
+# tokens, dropping the expired ones
+JWT_BLACKLIST_FILTER_MAX_AGE = env.int("JWT_BLACKLIST_FILTER_MAX_AGE", default=300)
+
+# Maximum number of verified access tokens cached by each worker process
+JWT_AUTH_CACHE_SIZE = env.int("JWT_AUTH_CACHE_SIZE", default=10000)
+
 SWAGGER_SETTINGS = {
     "SECURITY_DEFINITIONS": {
         "Bearer": {
@@ -113,6 +198,9 @@ SWAGGER_SETTINGS = {
     }
 }
 
+# Directory of the OpenAPI schema written by `manage.py generate_schema`
+OPENAPI_SCHEMA_DIR = BASE_DIR / "openapi"
+
 
 ROOT_URLCONF = "settings.urls"
 
@@ -137,12 +225,155 @@ WSGI_APPLICATION = "settings.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# Database engine: sqlite or postgresql, set in the env file
+DB_ENGINE = env.str("DB_ENGINE", default="sqlite")
+
+# PRAGMAs run on every new SQLite connection. WAL lets readers run while a
+# write is in progress, NORMAL syncs only at checkpoints in WAL mode.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": env.int("SQLITE_BUSY_TIMEOUT", default=5000),
+    "mmap_size": env.int("SQLITE_MMAP_SIZE", default=128 * 1024 * 1024),
+    # negative values are in KiB
+    "cache_size": env.int("SQLITE_CACHE_SIZE", default=-64 * 1024),
+    "temp_store": "MEMORY",
+}
+
+# Connection options of the tuned SQLite profile
+SQLITE_TUNED_OPTIONS = {
+    "init_command": ";".join(
+        f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+    ),
+    # Take the write lock when a transaction starts, so writers queue on the
+    # busy timeout instead of failing to upgrade a read lock.
+    "transaction_mode": "IMMEDIATE",
+}
+
+if DB_ENGINE == "postgresql":
+    DB_POOL = env.bool("DB_POOL", default=True)
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": env.str("DB_NAME", default="taskmanager"),
+            "USER": env.str("DB_USER", default="taskmanager"),
+            "PASSWORD": env.str("DB_PASSWORD", default=""),
+            "HOST": env.str("DB_HOST", default="localhost"),
+            "PORT": env.str("DB_PORT", default="5432"),
+            # A psycopg connection pool per worker process, needs psycopg[pool]
+            "OPTIONS": (
+                {
+                    "pool": {
+                        "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+                        "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+                        "timeout": env.int("DB_POOL_TIMEOUT", default=10),
+                    }
+                }
+                if DB_POOL
+                else {}
+            ),
+            # Pooled connections go back to the pool after each request,
+            # unpooled ones are kept for CONN_MAX_AGE.
+            "CONN_MAX_AGE": 0 if DB_POOL else env.int("CONN_MAX_AGE", default=600),
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+    DB_REPLICA_HOST = env.str("DB_REPLICA_HOST", default="")
+    if DB_REPLICA_HOST:
+        DATABASES["replica"] = {
+            **DATABASES["default"],
+            "HOST": DB_REPLICA_HOST,
+            "PORT": env.str("DB_REPLICA_PORT", default=DATABASES["default"]["PORT"]),
+            # Tests read the replica through the default connection
+            "TEST": {"MIRROR": "default"},
+        }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": env.str("DB_NAME", default=str(BASE_DIR / "db.sqlite3")),
+            # Set SQLITE_TUNING=false to use SQLite's defaults
+            "OPTIONS": (
+                SQLITE_TUNED_OPTIONS if env.bool("SQLITE_TUNING", default=True) else {}
+            ),
+            # Keep connections open between requests, checked before reuse
+            "CONN_MAX_AGE": env.int("CONN_MAX_AGE", default=600),
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+
+# Alias reads of the task API are routed to, None without a replica
+DATABASE_REPLICA_ALIAS = "replica" if "replica" in DATABASES else None
+# Seconds a user's reads stay on the primary after a write, longer than the
+# replication lag so users read their own writes
+DATABASE_REPLICA_PIN_SECONDS = env.int("DB_REPLICA_PIN_SECONDS", default=5)
+DATABASE_ROUTERS = ["core.db.ReplicaRouter"]
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHE_BACKENDS = {
+    # per process, see LOCAL_CACHE_TIMEOUT, the task response cache is off
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    # any Redis protocol server, needs the redis package
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+CACHE_BACKEND = env.str("CACHE_BACKEND", default="locmem")
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": env.str(
+            "CACHE_LOCATION",
+            default={
+                "locmem": "",
+                "file": str(BASE_DIR / ".cache"),
+                "redis": "redis://127.0.0.1:6379/0",
+            }[CACHE_BACKEND],
+        ),
+    }
+}
+if CACHE_BACKEND != "redis":
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": env.int("CACHE_MAX_ENTRIES", default=10000)
     }
+# Seconds a worker relies on its own copy of state that other workers change,
+# e.g. revoked tokens, when the cache is per process. Its own changes are
+# seen at once.
+LOCAL_CACHE_TIMEOUT = env.int("LOCAL_CACHE_TIMEOUT", default=5)
+
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+
+PASSWORD_HASHER_CLASSES = {
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "pbkdf2_sha1": "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "bcrypt_sha256": "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
 }
+# New passwords are hashed with the preferred hasher, existing hashes are
+# upgraded to it the next time their user logs in. argon2 and bcrypt_sha256
+# need the argon2-cffi and bcrypt packages.
+PASSWORD_HASHER = env.str("PASSWORD_HASHER", default="pbkdf2")
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    hasher
+    for name, hasher in PASSWORD_HASHER_CLASSES.items()
+    if name != PASSWORD_HASHER
+]
+
+AUTHENTICATION_BACKENDS = [
+    # Checks passwords in the password hashing process pool
+    "accounts.backends.PooledModelBackend",
+]
+
+# Number of worker processes hashing passwords, 0 hashes in the request thread
+PASSWORD_HASHING_WORKERS = env.int("PASSWORD_HASHING_WORKERS", default=2)
+# Maximum number of hashes queued or running, logins beyond it get a 429
+PASSWORD_HASHING_MAX_PENDING = env.int("PASSWORD_HASHING_MAX_PENDING", default=16)
+# Seconds to wait for a hash before answering with a 429
+PASSWORD_HASHING_TIMEOUT = 10
 
 
 # Password validation
@@ -1,28 +1,15 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Task Manager API",
-        default_version="v1",
-        description="API documentation for Task Manager application",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="support@taskmanager.local"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from core.views import docs, metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path(
-        "docs/",
-        schema_view.with_ui("swagger", cache_timeout=0),
-        name="schema-swagger-ui",
-    ),
     path("", include("tasks.urls")),
     path("accounts/", include("accounts.urls")),
+    path("metrics/", metrics, name="metrics"),
 ]
+
+if settings.API_DOCS_ENABLED:
+    urlpatterns.append(path("docs/", docs, name="schema-swagger-ui"))
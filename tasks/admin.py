@@ -1,5 +1,6 @@
 from django.contrib import admin
 
-from tasks.models import Task
+from tasks.models import ArchivedTask, Task
 
 admin.site.register(Task)
+admin.site.register(ArchivedTask)
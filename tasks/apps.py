@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class TasksConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tasks"
+
+    def ready(self):
+        from core.metrics import registry
+
+        from . import signals  # noqa: F401
+        from .response_cache import response_cache
+
+        registry.register_collector(response_cache.collect_metrics)
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from core.db import delete_rows
+
+from .counts import invalidate_task_counts
+from .models import ArchivedTask, Task, TaskTombstone
+from .response_cache import response_cache
+
+# Columns shared by the live and the archived tasks.
+TASK_COLUMNS = (
+    "id",
+    "owner_id",
+    "title",
+    "description",
+    "completed",
+    "created_at",
+    "updated_at",
+)
+ARCHIVE_VIEW = "tasks_task_with_archived"
+ARCHIVE_VIEW_QUERY = (
+    f"SELECT {', '.join(TASK_COLUMNS)}, FALSE AS archived FROM tasks_task "
+    "UNION ALL "
+    f"SELECT {', '.join(TASK_COLUMNS)}, TRUE AS archived FROM tasks_archivedtask"
+)
+DROP_ARCHIVE_VIEW_SQL = f"DROP VIEW IF EXISTS {ARCHIVE_VIEW}"
+
+
+def install_archive_view(connection):
+    """
+    Create the view of the live and archived tasks, read by
+    `TaskWithArchived`.
+
+    Views get in the way of migrations rebuilding or altering the task
+    tables, so the view is dropped before every ``migrate`` and created
+    again after it.
+    """
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        if "tasks_task" not in tables or "tasks_archivedtask" not in tables:
+            return
+        create = (
+            "CREATE OR REPLACE VIEW"
+            if connection.vendor == "postgresql"
+            else "CREATE VIEW IF NOT EXISTS"
+        )
+        cursor.execute(f"{create} {ARCHIVE_VIEW} AS {ARCHIVE_VIEW_QUERY}")
+
+
+def drop_archive_view(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(DROP_ARCHIVE_VIEW_SQL)
+
+
+def get_archive_cutoff(days=None):
+    """
+    Return the time before which completed tasks are archived, by default
+    ``TASKS_ARCHIVE_AFTER_DAYS`` ago.
+    """
+    if days is None:
+        days = settings.TASKS_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_tasks(cutoff, batch_size, using=DEFAULT_DB_ALIAS):
+    """
+    Move the completed tasks last updated before ``cutoff`` to the archive,
+    ``batch_size`` tasks per transaction, and yield the number of tasks
+    moved by each transaction.
+
+    The tasks keep their ids and timestamps. Syncing clients get them as
+    deleted, they left the tasks listed by default, and the counts and
+    cached responses of their owners are invalidated.
+    """
+    archivable = Task.objects.using(using).filter(
+        completed__in=[True], updated_at__lt=cutoff
+    )
+    last_id = 0
+    while True:
+        with transaction.atomic(using=using):
+            # In id order, each batch goes on from the previous one
+            rows = list(
+                archivable.filter(id__gt=last_id)
+                .select_for_update()
+                .order_by("id")
+                .values(*TASK_COLUMNS)[:batch_size]
+            )
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            now = timezone.now()
+            archived = ArchivedTask.objects.using(using).bulk_create(
+                ArchivedTask(**row, archived_at=now) for row in rows
+            )
+            # A single DELETE, without loading the tasks to send signals.
+            # The moved tasks are accounted for below.
+            delete_rows(Task, [row["id"] for row in rows], using)
+            TaskTombstone.objects.using(using).bulk_create(
+                TaskTombstone(task_id=row["id"], owner_id=row["owner_id"])
+                for row in rows
+            )
+            invalidate_task_counts(task.owner_id for task in archived)
+            response_cache.invalidate_tasks(archived)
+        yield len(rows)
@@ -0,0 +1,218 @@
+import io
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from accounts.authentication import CachedJWTAuthentication
+from core.db import pin_to_primary
+from core.renderers import ORJSONParser, ORJSONRenderer
+
+from .counts import get_count_filter, get_task_count
+from .filters import TaskFilter, includes_archived
+from .models import Task, TaskWithArchived
+from .serializers import TASK_READ_FIELDS, TaskSerializer, serialize_task_rows
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """
+    Base class for async JSON API views.
+
+    Authentication, permission checks and database access do not block the
+    event loop, so under ASGI a worker serves many slow clients at once.
+    Requests and responses have the same format as the DRF views.
+    """
+
+    authentication_class = CachedJWTAuthentication
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            method = request.method.lower()
+            handler = (
+                getattr(self, method, None)
+                if method in self.http_method_names
+                else None
+            )
+            if handler is None:
+                raise exceptions.MethodNotAllowed(request.method)
+            await self.check_authentication(request)
+            await self.check_throttles(request)
+            response = await handler(request, *args, **kwargs)
+            if method not in ("get", "head", "options") and response.status_code < 400:
+                await sync_to_async(pin_to_primary)(request.user.id)
+            return response
+        except Http404:
+            return self.handle_exception(exceptions.NotFound())
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def check_authentication(self, request):
+        """Authenticate the request, only authenticated users are allowed."""
+        authenticator = self.authentication_class()
+        user_token = await authenticator.aauthenticate(request)
+        if user_token is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = user_token
+
+    async def check_throttles(self, request):
+        """Apply the default throttles, like DRF views do."""
+        throttles = [throttle() for throttle in api_settings.DEFAULT_THROTTLE_CLASSES]
+        if settings.THROTTLE_STORE == "local":
+            allowed = [throttle.allow_request(request, self) for throttle in throttles]
+        else:
+            # The cache may be over the network
+            allowed = await sync_to_async(
+                lambda: [
+                    throttle.allow_request(request, self) for throttle in throttles
+                ]
+            )()
+        if not all(allowed):
+            waits = [
+                throttle.wait() for throttle, ok in zip(throttles, allowed) if not ok
+            ]
+            waits = [wait for wait in waits if wait is not None]
+            raise exceptions.Throttled(max(waits, default=None))
+
+    def handle_exception(self, exc):
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+        response = self.render(data, exc.status_code)
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            response.status_code = status.HTTP_401_UNAUTHORIZED
+            response["WWW-Authenticate"] = (
+                self.authentication_class().authenticate_header(None)
+            )
+        if getattr(exc, "wait", None):
+            response["Retry-After"] = "%d" % exc.wait
+        return response
+
+    def parse(self, request):
+        """Parse the JSON request body."""
+        if not request.body:
+            return {}
+        return ORJSONParser().parse(io.BytesIO(request.body))
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        if data is None:
+            return HttpResponse(status=status_code)
+        return HttpResponse(
+            ORJSONRenderer().render(data),
+            status=status_code,
+            content_type="application/json",
+        )
+
+
+class AsyncTaskMixin:
+    """Queryset and lookups shared by the async task views."""
+
+    def get_queryset(self, request, archived=False):
+        """Return the user's tasks, with the archived ones if ``archived``."""
+        model = TaskWithArchived if archived else Task
+        return model.objects.filter(owner_id=request.user.id)
+
+    async def get_task(self, request, pk):
+        try:
+            return await self.get_queryset(request).aget(pk=pk)
+        except Task.DoesNotExist:
+            raise exceptions.NotFound("No Task matches the given query.")
+
+
+class AsyncTaskListView(AsyncTaskMixin, AsyncAPIView):
+    """Async list and create handlers for tasks."""
+
+    page_size = api_settings.PAGE_SIZE
+    page_query_param = "page"
+
+    async def get(self, request):
+        filterset = TaskFilter(
+            request.GET,
+            queryset=self.get_queryset(request, includes_archived(request.GET)),
+        )
+        if not filterset.is_valid():
+            raise exceptions.ValidationError(filterset.errors)
+        queryset = filterset.qs.values(*TASK_READ_FIELDS)
+
+        count_filter = get_count_filter(filterset)
+        if count_filter is None:
+            count = await queryset.acount()
+        else:
+            count = await sync_to_async(get_task_count)(
+                request.user.id, count_filter["completed"], queryset
+            )
+        try:
+            page = int(request.GET.get(self.page_query_param, 1))
+        except ValueError:
+            page = 0
+        last_page = max(1, -(-count // self.page_size))
+        if not 1 <= page <= last_page:
+            raise exceptions.NotFound("Invalid page.")
+
+        offset = (page - 1) * self.page_size
+        rows = [row async for row in queryset[offset : offset + self.page_size]]
+        url = request.build_absolute_uri()
+        if page == 2:
+            previous = remove_query_param(url, self.page_query_param)
+        elif page > 2:
+            previous = replace_query_param(url, self.page_query_param, page - 1)
+        else:
+            previous = None
+        return self.render(
+            {
+                "count": count,
+                "next": (
+                    replace_query_param(url, self.page_query_param, page + 1)
+                    if page < last_page
+                    else None
+                ),
+                "previous": previous,
+                "results": serialize_task_rows(rows),
+            }
+        )
+
+    async def post(self, request):
+        serializer = TaskSerializer(data=self.parse(request))
+        serializer.is_valid(raise_exception=True)
+        task = await Task.objects.acreate(
+            owner_id=request.user.id, **serializer.validated_data
+        )
+        return self.render(TaskSerializer(task).data, status.HTTP_201_CREATED)
+
+
+class AsyncTaskDetailView(AsyncTaskMixin, AsyncAPIView):
+    """Async retrieve, update and delete handlers for tasks."""
+
+    async def get(self, request, pk):
+        queryset = self.get_queryset(request, includes_archived(request.GET))
+        try:
+            row = await queryset.values(*TASK_READ_FIELDS).aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            raise exceptions.NotFound("No Task matches the given query.")
+        return self.render(serialize_task_rows([row])[0])
+
+    async def put(self, request, pk, partial=False):
+        task = await self.get_task(request, pk)
+        serializer = TaskSerializer(task, data=self.parse(request), partial=partial)
+        serializer.is_valid(raise_exception=True)
+        for attr, value in serializer.validated_data.items():
+            setattr(task, attr, value)
+        await task.asave()
+        return self.render(TaskSerializer(task).data)
+
+    async def patch(self, request, pk):
+        return await self.put(request, pk, partial=True)
+
+    async def delete(self, request, pk):
+        task = await self.get_task(request, pk)
+        await task.adelete()
+        return self.render(None, status.HTTP_204_NO_CONTENT)
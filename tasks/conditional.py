@@ -0,0 +1,47 @@
+from hashlib import sha256
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGet:
+    """
+    Validators of a task response for conditional GET requests.
+
+    The ETag is weak since the same data is rendered differently per media
+    type, and it is derived from the requesting user, the full path and the
+    accepted media type, plus the ``parts`` that change with the data.
+    ``Last-Modified`` is only sent when ``last_modified`` is given, it only
+    has a resolution of a second, clients should prefer ``If-None-Match``,
+    which takes precedence when both are sent.
+    """
+
+    def __init__(self, request, last_modified, *parts):
+        renderer = getattr(request, "accepted_renderer", None)
+        key = "|".join(
+            str(part)
+            for part in (
+                request.user.id,
+                request.get_full_path(),
+                renderer.media_type if renderer else "",
+                last_modified.isoformat() if last_modified else "",
+                *parts,
+            )
+        )
+        self.etag = "W/" + quote_etag(sha256(key.encode()).hexdigest()[:32])
+        self.last_modified = int(last_modified.timestamp()) if last_modified else None
+
+    def not_modified(self, request):
+        """Return a 304 response when the client's copy is current, or ``None``."""
+        response = get_conditional_response(
+            request, etag=self.etag, last_modified=self.last_modified
+        )
+        return response and self.set_headers(response)
+
+    def set_headers(self, response):
+        """Add the validators to a response, it is private to the user."""
+        response["ETag"] = self.etag
+        if self.last_modified is not None:
+            response["Last-Modified"] = http_date(self.last_modified)
+        patch_vary_headers(response, ("Authorization",))
+        return response
@@ -0,0 +1,142 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+# Values of the ``completed`` filter a count is kept for, ``None`` is no filter.
+COMPLETED_STATES = (None, True, False)
+
+
+def count_key(owner_id, completed=None):
+    """Return the cache key of a user's task count for a ``completed`` filter."""
+    state = "all" if completed is None else str(completed).lower()
+    return f"tasks:count:{owner_id}:{state}"
+
+
+def generation_key(owner_id):
+    """Return the cache key of the counter bumped when a user's counts change."""
+    return f"tasks:count-generation:{owner_id}"
+
+
+def get_count_generation(owner_id):
+    key = generation_key(owner_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from an unpredictable value, so a count read before the
+        # counter was evicted never matches it again.
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_count_generation(owner_id):
+    try:
+        cache.incr(generation_key(owner_id))
+    except ValueError:
+        # A missing generation never matches a read one.
+        pass
+
+
+def get_count_filter(filterset):
+    """
+    Return the ``completed`` value of the cached count matching a bound
+    task filterset as ``{"completed": value}``, or ``None`` when counts are
+    not cached for its filters.
+    """
+    if not filterset.is_valid():
+        return None
+    filters = {
+        name: value
+        for name, value in filterset.form.cleaned_data.items()
+        if value not in (None, "")
+    }
+    if filters.pop("include_archived", False):
+        # Counts are only kept for the live tasks
+        return None
+    if set(filters) - {"completed"}:
+        return None
+    return {"completed": filters.get("completed")}
+
+
+def get_task_count(owner_id, completed, queryset):
+    """
+    Return the number of tasks in ``queryset``, a user's tasks filtered on
+    ``completed``, from the counter cache.
+
+    On a miss the count is estimated by the query planner when the estimate
+    is above ``TASKS_COUNT_ESTIMATE_THRESHOLD``, and counted exactly
+    otherwise. Either way it is cached and kept up to date by the task
+    signals from then on.
+
+    Adjustments made while the count is missing are dropped, so an exact
+    count is dropped from the cache again when the user's count generation
+    was bumped while it was counted.
+    """
+    key = count_key(owner_id, completed)
+    count = cache.get(key)
+    if count is None:
+        count = estimate_count(queryset)
+        if count is not None and count >= settings.TASKS_COUNT_ESTIMATE_THRESHOLD:
+            cache.add(key, count, settings.TASKS_COUNT_CACHE_TIMEOUT)
+        else:
+            generation = get_count_generation(owner_id)
+            count = queryset.count()
+            if (
+                cache.add(key, count, settings.TASKS_COUNT_CACHE_TIMEOUT)
+                and cache.get(generation_key(owner_id)) != generation
+            ):
+                cache.delete(key)
+    return max(count, 0)
+
+
+def estimate_count(queryset):
+    """
+    Return the planner's row estimate for ``queryset``, or ``None`` when the
+    database does not expose one.
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    plan = json.loads(queryset.explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def adjust_task_counts(owner_id, completed, delta):
+    """
+    Add ``delta`` to the cached counts a task with ``completed`` belongs to,
+    once the current transaction commits. Counts that are not cached are
+    left alone, they are counted on the next read.
+    """
+
+    def adjust():
+        # Bumped first, so a count cached too late for the increments sees
+        # the generation changed
+        bump_count_generation(owner_id)
+        for key in (count_key(owner_id), count_key(owner_id, completed)):
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                pass
+
+    transaction.on_commit(adjust)
+
+
+def invalidate_task_counts(owner_ids):
+    """
+    Drop the cached counts of ``owner_ids`` once the current transaction
+    commits. Used by writes that do not send model signals, like
+    ``bulk_create`` and ``bulk_update``.
+    """
+    keys = [
+        count_key(owner_id, completed)
+        for owner_id in set(owner_ids)
+        for completed in COMPLETED_STATES
+    ]
+
+    def invalidate():
+        for owner_id in set(owner_ids):
+            bump_count_generation(owner_id)
+        cache.delete_many(keys)
+
+    transaction.on_commit(invalidate)
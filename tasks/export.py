@@ -0,0 +1,72 @@
+import csv
+import json
+
+from rest_framework import renderers
+
+from .serializers import TASK_READ_FIELDS, iter_task_rows
+
+
+class _ExportRenderer(renderers.BaseRenderer):
+    """
+    Base renderer for the export formats.
+
+    Exports are written straight to a ``StreamingHttpResponse``, so this
+    renderer only takes part in content negotiation and renders error
+    responses as JSON.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class NDJSONRenderer(_ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class CSVRenderer(_ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class _Echo:
+    """File-like object returning what is written to it, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(rows, chunk_size):
+    """
+    Yield rows as newline delimited JSON, ``chunk_size`` rows per chunk.
+    """
+    lines = []
+    for row in iter_task_rows(rows):
+        lines.append(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+        if len(lines) >= chunk_size:
+            lines.append("")
+            yield "\n".join(lines)
+            lines = []
+    if lines:
+        lines.append("")
+        yield "\n".join(lines)
+
+
+def iter_csv(rows, chunk_size):
+    """
+    Yield a header line followed by rows as CSV, ``chunk_size`` rows per chunk.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(TASK_READ_FIELDS)
+    lines = []
+    for row in iter_task_rows(rows):
+        lines.append(writer.writerow([row[field] for field in TASK_READ_FIELDS]))
+        if len(lines) >= chunk_size:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
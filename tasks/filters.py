@@ -0,0 +1,62 @@
+from django import forms
+from django_filters import rest_framework as filters
+
+from .models import Task, TaskWithArchived
+from .search import search_tasks
+
+
+class TaskFilter(filters.FilterSet):
+    """Filters available on the task list."""
+
+    completed = filters.BooleanFilter(method="filter_completed")
+    search = filters.CharFilter(
+        method="filter_search",
+        label="Words the title or description must contain, most relevant first.",
+    )
+    include_archived = filters.BooleanFilter(
+        method="filter_include_archived",
+        label="Include the archived tasks.",
+    )
+
+    class Meta:
+        model = Task
+        fields = ["completed", "search", "include_archived"]
+
+    def filter_completed(self, queryset, name, value):
+        # ``completed=True`` is rendered as a bare ``WHERE "completed"`` on
+        # SQLite, which its planner cannot match against an index on
+        # ``completed``. ``IN (...)`` is rendered as a comparison, so the
+        # ``(completed, created_at, id)`` index is used on every backend.
+        return queryset.filter(**{f"{name}__in": [value]})
+
+    def filter_search(self, queryset, name, value):
+        return search_tasks(queryset, value)
+
+    def filter_include_archived(self, queryset, name, value):
+        # The view picks the tasks to read from, see `includes_archived`.
+        return queryset
+
+
+def includes_archived(query_params):
+    """Return whether ``include_archived`` is true in ``query_params``."""
+    value = query_params.get("include_archived")
+    return forms.NullBooleanField().to_python(value) is True
+
+
+class TaskWithArchivedFilter(TaskFilter):
+    """`TaskFilter` of the live and archived tasks."""
+
+    class Meta(TaskFilter.Meta):
+        model = TaskWithArchived
+
+
+class TaskFilterBackend(filters.DjangoFilterBackend):
+    """
+    `DjangoFilterBackend` filtering the live and archived tasks with
+    `TaskWithArchivedFilter`, and the live tasks with the view's filterset.
+    """
+
+    def get_filterset_class(self, view, queryset=None):
+        if queryset is not None and queryset.model is TaskWithArchived:
+            return TaskWithArchivedFilter
+        return super().get_filterset_class(view, queryset)
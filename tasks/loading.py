@@ -0,0 +1,417 @@
+import bz2
+import gzip
+import json
+import lzma
+import random
+import re
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, make_password
+from django.core.management.color import no_style
+from django.core.serializers.base import DeserializedObject
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.db import connections, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from .counts import invalidate_task_counts
+from .models import Task
+from .response_cache import ALL_SCOPE, completed_scope, response_cache
+from .search import deferred_sqlite_search_index
+
+# Characters read from a fixture at a time.
+READ_SIZE = 1 << 16
+# Largest object of a JSON array fixture, in characters. Beyond it the
+# fixture is assumed to be malformed rather than read into memory.
+MAX_ITEM_SIZE = 1 << 26
+
+COMPRESSED_FIXTURES = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+JSON_LINES_SUFFIXES = {".jsonl", ".ndjson"}
+
+WHITESPACE = re.compile(r"\s*")
+
+
+def chunked(iterable, size):
+    """Yield lists of ``size`` items of ``iterable``, the last may be shorter."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def iter_json_array(file, read_size=READ_SIZE):
+    """
+    Yield the items of the JSON array in the text ``file`` one at a time,
+    reading it in blocks of ``read_size`` characters.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position = "", 0
+    # "[" before the array, "first" after it, "," after an item and
+    # "item" after a comma
+    expected = "["
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            buffer, position = file.read(read_size), 0
+            if not buffer:
+                raise ValueError("Unexpected end of the JSON array.")
+            continue
+
+        char = buffer[position]
+        if expected == "[":
+            if char != "[":
+                raise ValueError("The fixture is not a JSON array.")
+            position += 1
+            expected = "first"
+        elif char == "]" and expected in ("first", ","):
+            return
+        elif expected == ",":
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']', found {char!r}.")
+            position += 1
+            expected = "item"
+        else:
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    end = None
+                if end is not None and end < len(buffer):
+                    break
+                # The item is incomplete, or may continue in the next block.
+                block = file.read(read_size)
+                if not block:
+                    if end is None:
+                        raise ValueError("Unexpected end of the JSON array.")
+                    break
+                if len(buffer) - position > MAX_ITEM_SIZE:
+                    raise ValueError("Malformed or oversized object in the fixture.")
+                buffer, position = buffer[position:] + block, 0
+            yield item
+            position = end
+            expected = ","
+
+
+def iter_json_lines(file):
+    """Yield the JSON value of each non-blank line of the text ``file``."""
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_fixture(path):
+    """
+    Yield the objects of a fixture in Django's serialization format, a JSON
+    array (``.json``) or JSON Lines (``.jsonl`` or ``.ndjson``), optionally
+    compressed with gzip, bzip2 or xz. The file is read incrementally.
+    """
+    suffixes = path.suffixes
+    open_fixture = open
+    if suffixes and suffixes[-1] in COMPRESSED_FIXTURES:
+        open_fixture = COMPRESSED_FIXTURES[suffixes.pop()]
+    parse = iter_json_array
+    if suffixes and suffixes[-1] in JSON_LINES_SUFFIXES:
+        parse = iter_json_lines
+    with open_fixture(path, "rt", encoding="utf-8") as file:
+        yield from parse(file)
+
+
+def deserialize_fixture(path, using):
+    """Yield the `DeserializedObject` of each object of the fixture at ``path``."""
+    return PythonDeserializer(iter_fixture(path), using=using)
+
+
+def hash_passwords(objects):
+    """
+    Hash the passwords of the users among ``objects``, which are all plain
+    text except empty and unusable ones. Each distinct password is hashed
+    once, users sharing it share the hash.
+    """
+    User = get_user_model()
+    hashes = {}
+    for deserialized in objects:
+        user = deserialized.object
+        password = user.password if isinstance(user, User) else None
+        if password and not password.startswith(UNUSABLE_PASSWORD_PREFIX):
+            if password not in hashes:
+                hashes[password] = make_password(password)
+            user.password = hashes[password]
+        yield deserialized
+
+
+@contextmanager
+def bulk_load_mode(connection):
+    """
+    Tune the database for the bulk load in the block. SQLite stops syncing
+    to disk, unless a transaction is open, and indexes new tasks for search
+    once the block ends.
+    """
+    if connection.vendor != "sqlite":
+        yield
+        return
+    synchronous = None
+    if not connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            (synchronous,) = cursor.fetchone()
+            cursor.execute("PRAGMA synchronous=OFF")
+    try:
+        with deferred_sqlite_search_index(connection):
+            yield
+    finally:
+        if synchronous is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA synchronous={int(synchronous)}")
+
+
+class BulkLoader:
+    """
+    Insert deserialized objects with batched statements, ``batch_size``
+    rows at a time, committing every ``chunk_size`` objects.
+
+    Objects are inserted as they are, like ``loaddata`` does: no ``save()``,
+    signals or ``auto_now`` updates. Objects with a primary key replace the
+    existing row with that key. Objects without one are appended, through
+    ``COPY`` on PostgreSQL.
+    """
+
+    def __init__(self, using, batch_size=1000, chunk_size=20000):
+        self.using = using
+        self.connection = connections[using]
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        # model label -> objects loaded
+        self.loaded = {}
+        self.models_with_pks = set()
+
+    def load(self, objects):
+        """Load ``objects``, `DeserializedObject` instances, in chunks."""
+        for chunk in chunked(objects, self.chunk_size):
+            # Grouped in the order models first appear, foreign keys are
+            # checked when the chunk commits.
+            groups = {}
+            for deserialized in chunk:
+                instance = deserialized.object
+                key = (type(instance), instance.pk is not None)
+                groups.setdefault(key, []).append(deserialized)
+            with transaction.atomic(using=self.using):
+                if self.connection.vendor == "postgresql":
+                    with self.connection.cursor() as cursor:
+                        cursor.execute("SET LOCAL synchronous_commit TO OFF")
+                for (model, with_pks), group in groups.items():
+                    self.insert(model, [item.object for item in group], with_pks)
+                    self.insert_m2m(model, group)
+                    if with_pks:
+                        self.models_with_pks.add(model)
+                    label = model._meta.label
+                    self.loaded[label] = self.loaded.get(label, 0) + len(group)
+        self.reset_sequences()
+
+    def insert(self, model, instances, with_pks):
+        connection = self.connection
+        quote_name = connection.ops.quote_name
+        fields = [
+            field
+            for field in model._meta.local_concrete_fields
+            if with_pks or not field.primary_key
+        ]
+        now = timezone.now()
+        for field in fields:
+            if getattr(field, "auto_now", False) or getattr(
+                field, "auto_now_add", False
+            ):
+                for instance in instances:
+                    if getattr(instance, field.attname) is None:
+                        setattr(instance, field.attname, now)
+        rows = (
+            [
+                field.get_db_prep_save(getattr(instance, field.attname), connection)
+                for field in fields
+            ]
+            for instance in instances
+        )
+        table = quote_name(model._meta.db_table)
+        columns = ", ".join(quote_name(field.column) for field in fields)
+
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql" and not with_pks:
+                with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+                    table,
+                    columns,
+                    ", ".join(["%s"] * len(fields)),
+                )
+                if with_pks:
+                    sql += " " + connection.ops.on_conflict_suffix_sql(
+                        fields,
+                        OnConflict.UPDATE,
+                        [field.column for field in fields if not field.primary_key],
+                        [model._meta.pk.column],
+                    )
+                for batch in chunked(rows, self.batch_size):
+                    cursor.executemany(sql, batch)
+
+        if model is Task:
+            self.invalidate_task_caches(instances, with_pks)
+
+    def insert_m2m(self, model, group):
+        """Add the many-to-many relations of the objects in ``group``."""
+        through_rows = {}
+        for deserialized in group:
+            for name, values in (deserialized.m2m_data or {}).items():
+                if not values:
+                    continue
+                if deserialized.object.pk is None:
+                    raise ValueError(
+                        f"{model._meta.label} objects need a primary key to be "
+                        f"loaded with {name!r}."
+                    )
+                field = model._meta.get_field(name)
+                through = field.remote_field.through
+                source = f"{field.m2m_field_name()}_id"
+                target = f"{field.m2m_reverse_field_name()}_id"
+                through_rows.setdefault(through, []).extend(
+                    through(**{source: deserialized.object.pk, target: value})
+                    for value in values
+                )
+        for through, rows in through_rows.items():
+            through.objects.using(self.using).bulk_create(
+                rows, batch_size=self.batch_size, ignore_conflicts=True
+            )
+
+    def invalidate_task_caches(self, tasks, with_pks):
+        """Make the cached counts and responses of the loaded tasks stale."""
+        owner_ids = {task.owner_id for task in tasks}
+        invalidate_task_counts(owner_ids)
+        if with_pks:
+            response_cache.invalidate_tasks(tasks)
+        else:
+            for owner_id in owner_ids:
+                response_cache.invalidate(
+                    owner_id,
+                    [ALL_SCOPE, completed_scope(True), completed_scope(False)],
+                )
+
+    def reset_sequences(self):
+        """Move the id sequences past the primary keys loaded from fixtures."""
+        statements = self.connection.ops.sequence_reset_sql(
+            no_style(), list(self.models_with_pks)
+        )
+        if statements:
+            with self.connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+
+# Vocabulary of the generated tasks.
+TASK_VERBS = [
+    "Review",
+    "Update",
+    "Write",
+    "Fix",
+    "Prepare",
+    "Plan",
+    "Email",
+    "Organize",
+    "Schedule",
+    "Clean up",
+    "Refactor",
+    "Deploy",
+    "Test",
+    "Book",
+    "Pay",
+    "Renew",
+    "Draft",
+    "Submit",
+    "Follow up on",
+    "Archive",
+]
+TASK_SUBJECTS = [
+    "quarterly report",
+    "project proposal",
+    "team meeting notes",
+    "invoice",
+    "dentist appointment",
+    "budget",
+    "release notes",
+    "client feedback",
+    "onboarding docs",
+    "database backup",
+    "car insurance",
+    "expense report",
+    "blog post",
+    "database migration",
+    "travel plans",
+    "grocery list",
+    "presentation slides",
+    "code review",
+    "support tickets",
+    "contract",
+]
+TASK_DETAILS = [
+    "Check the numbers with finance before sending it.",
+    "Ask the team for comments by Friday.",
+    "The previous version is in the shared drive.",
+    "Needs sign-off from the project lead.",
+    "Keep it short, one page at most.",
+    "Blocked until the vendor replies.",
+    "Include the figures from last month.",
+    "Remember to attach the receipts.",
+    "Split it into smaller tasks if it takes more than a day.",
+    "Low priority, only if there is time left this week.",
+]
+
+
+def generate_users(count, password, using, prefix="seed"):
+    """
+    Create ``count`` users named ``<prefix>-<n>``, unless they exist, all with
+    ``password`` hashed once. Return their ids.
+    """
+    User = get_user_model()
+    password = make_password(password)
+    usernames = [f"{prefix}-{n}" for n in range(count)]
+    for batch in chunked(usernames, 1000):
+        User.objects.using(using).bulk_create(
+            (User(username=username, password=password) for username in batch),
+            ignore_conflicts=True,
+        )
+    return list(
+        User.objects.using(using)
+        .filter(username__in=usernames)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def generate_tasks(count, owner_ids, days=365, seed=None):
+    """
+    Yield ``count`` made-up tasks of ``owner_ids`` as `DeserializedObject`
+    instances, created over the last ``days`` days. A few owners have most
+    of the tasks, and older tasks are more often completed.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    span = timedelta(days=days)
+    start = now - span
+    for n in range(count):
+        age = 1 - n / count
+        created_at = start + span * (n / count) + timedelta(seconds=rng.random())
+        updated_at = min(now, created_at + timedelta(days=rng.expovariate(1 / 2) * age))
+        description = None
+        if rng.random() < 0.7:
+            description = " ".join(rng.sample(TASK_DETAILS, rng.randint(1, 3)))
+        yield DeserializedObject(
+            Task(
+                owner_id=owner_ids[int(len(owner_ids) * rng.random() ** 2)],
+                title=f"{rng.choice(TASK_VERBS)} {rng.choice(TASK_SUBJECTS)}",
+                description=description,
+                completed=rng.random() < 0.2 + 0.6 * age,
+                created_at=created_at,
+                updated_at=updated_at,
+            )
+        )
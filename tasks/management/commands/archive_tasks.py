@@ -0,0 +1,55 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from tasks.archive import archive_tasks, get_archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the completed tasks not updated for TASKS_ARCHIVE_AFTER_DAYS "
+        "days from the task table to the archive, in batches of one "
+        "transaction each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Archive the completed tasks not updated for this many days "
+            "(default: TASKS_ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Tasks moved per transaction (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to archive tasks in (default: %(default)s).",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] is not None and options["days"] < 0:
+            raise CommandError("--days must not be negative.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        cutoff = get_archive_cutoff(options["days"])
+
+        started = perf_counter()
+        archived = 0
+        for moved in archive_tasks(
+            cutoff, options["batch_size"], using=options["database"]
+        ):
+            archived += moved
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Archived {archived} tasks...")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {archived} tasks completed and last updated before "
+                f"{cutoff:%Y-%m-%d %H:%M} in {perf_counter() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,152 @@
+import re
+from datetime import datetime, timezone
+from itertools import product
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.http import HttpRequest, QueryDict
+from django_filters.filters import BooleanFilter
+from rest_framework.request import Request
+
+from tasks.models import TaskTombstone
+from tasks.sync import filter_after
+from tasks.views import TaskViewSet
+
+# Plan fragments that indicate a full table scan or a sort that is not
+# satisfied by an index, per database vendor.
+FULL_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"\bSCAN (?:TABLE )?\w+(?! USING| VIRTUAL TABLE)(?:\s|$)"),
+    "postgresql": re.compile(r"\bSeq Scan on\b"),
+    "mysql": re.compile(r"\btype\W+ALL\b|\bALL\b"),
+}
+FILESORT_PATTERNS = {
+    "sqlite": re.compile(r"USE TEMP B-TREE FOR ORDER BY"),
+    "postgresql": re.compile(r"(?<!Incremental )\bSort\b(?! Key)"),
+    "mysql": re.compile(r"Using filesort"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the querysets generated by TaskViewSet and report the "
+        "ones that fall back to a full scan or a filesort."
+    )
+    # Queries ordered by relevance, their matches are always sorted.
+    ranked_queries = {"search"}
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database alias to run EXPLAIN against (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--fail-on-issues",
+            action="store_true",
+            help="Exit with an error when any query needs a full scan or filesort.",
+        )
+        parser.add_argument(
+            "--user-id",
+            type=int,
+            default=1,
+            help="Id of the user the task queries are scoped to (default: %(default)s).",
+        )
+
+    def handle(self, *args, **options):
+        database = options["database"]
+        vendor = connections[database].vendor
+        full_scan = FULL_SCAN_PATTERNS.get(vendor)
+        filesort = FILESORT_PATTERNS.get(vendor)
+        if full_scan is None:
+            raise CommandError(f"EXPLAIN analysis is not supported on {vendor}.")
+
+        self.user = get_user_model()(pk=options["user_id"])
+        issues = 0
+        for label, queryset in self.get_querysets():
+            plan = queryset.using(database).explain()
+            problems = []
+            if full_scan.search(plan):
+                problems.append("full scan")
+            if filesort.search(plan) and label not in self.ranked_queries:
+                problems.append("filesort")
+
+            if problems:
+                issues += 1
+                self.stdout.write(self.style.WARNING(f"{label}: {', '.join(problems)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{label}: ok"))
+            if options["verbosity"] > 1 or problems:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if issues and options["fail_on_issues"]:
+            raise CommandError(f"{issues} task queries need a full scan or filesort.")
+
+    def get_view(self, action, query_params=None, **kwargs):
+        """Build a TaskViewSet instance as it would be for a GET request."""
+        http_request = HttpRequest()
+        http_request.method = "GET"
+        http_request.GET = QueryDict(urlencode(query_params or {}))
+        request = Request(http_request)
+        request.user = self.user
+        return TaskViewSet(
+            request=request, action=action, format_kwarg=None, args=(), kwargs=kwargs
+        )
+
+    def get_querysets(self):
+        """Yield ``(label, queryset)`` for every query the list/detail views run."""
+        filter_names = [
+            name
+            for name, field in TaskViewSet.filterset_class.base_filters.items()
+            if isinstance(field, BooleanFilter)
+        ]
+        filter_values = [[None, "true", "false"] for _ in filter_names]
+        for values in product(*filter_values):
+            params = {
+                name: value
+                for name, value in zip(filter_names, values)
+                if value is not None
+            }
+            label = urlencode(params) or "no filters"
+            list_view = self.get_view("list", params)
+            queryset = list_view.filter_queryset(list_view.get_queryset())
+
+            yield f"list [{label}]", queryset[: list_view.paginator.page_size]
+            position = datetime(2000, 1, 1, tzinfo=timezone.utc)
+            yield (
+                f"keyset page [{label}]",
+                queryset.order_by("created_at", "id").filter(
+                    Q(created_at__gt=position) | Q(created_at=position, id__gt=1)
+                )[: list_view.paginator.page_size],
+            )
+
+        search_view = self.get_view("list", {"search": "report"})
+        yield (
+            "search",
+            search_view.filter_queryset(search_view.get_queryset())[
+                : search_view.paginator.page_size
+            ],
+        )
+
+        detail_view = self.get_view("retrieve", pk=1)
+        yield "detail", detail_view.get_queryset().filter(pk=1)
+
+        sync_view = self.get_view("sync")
+        yield (
+            "sync changes",
+            filter_after(sync_view.get_queryset(), "updated_at", position, 1).order_by(
+                "updated_at", "id"
+            )[: list_view.paginator.page_size],
+        )
+        yield (
+            "sync deletions",
+            filter_after(
+                TaskTombstone.objects.filter(owner_id=self.user.pk),
+                "deleted_at",
+                position,
+                1,
+            ).order_by("deleted_at", "id")[: list_view.paginator.page_size],
+        )
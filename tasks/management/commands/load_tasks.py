@@ -0,0 +1,131 @@
+from itertools import chain
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from tasks.loading import (
+    BulkLoader,
+    bulk_load_mode,
+    deserialize_fixture,
+    generate_tasks,
+    generate_users,
+    hash_passwords,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load large user and task fixtures, JSON arrays or JSON Lines in the "
+        "loaddata format and optionally compressed, reading them incrementally "
+        "and inserting rows in batches. With --generate, seed made-up tasks "
+        "for benchmarks instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "fixtures",
+            nargs="*",
+            help="Fixture files (.json, .jsonl or .ndjson, optionally .gz, .bz2 or .xz).",
+        )
+        parser.add_argument(
+            "--plain-passwords",
+            action="store_true",
+            help="The user passwords of the fixtures are plain text, hash them. "
+            "Otherwise they are loaded as they are, like loaddata does.",
+        )
+        parser.add_argument(
+            "--generate",
+            type=int,
+            metavar="TASKS",
+            help="Generate this many tasks instead of loading fixtures.",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=100,
+            help="Users owning the generated tasks (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--password",
+            default="pa$$word4u",
+            help="Password of the generated users (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Days over which the generated tasks were created "
+            "(default: %(default)s).",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            help="Random seed, to generate the same tasks again.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows inserted per statement batch (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=20000,
+            help="Objects inserted per transaction (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to load into (default: %(default)s).",
+        )
+
+    def handle(self, *args, **options):
+        fixtures = [Path(fixture) for fixture in options["fixtures"]]
+        if bool(fixtures) == (options["generate"] is not None):
+            raise CommandError("Give either fixtures or --generate.")
+        for fixture in fixtures:
+            if not fixture.is_file():
+                raise CommandError(f"No fixture named {fixture}.")
+        using = options["database"]
+        loader = BulkLoader(
+            using,
+            batch_size=options["batch_size"],
+            chunk_size=options["chunk_size"],
+        )
+
+        started = perf_counter()
+        with bulk_load_mode(connections[using]):
+            if fixtures:
+                objects = chain.from_iterable(
+                    deserialize_fixture(fixture, using) for fixture in fixtures
+                )
+                if options["plain_passwords"]:
+                    objects = hash_passwords(objects)
+            else:
+                owner_ids = generate_users(options["users"], options["password"], using)
+                objects = generate_tasks(
+                    options["generate"],
+                    owner_ids,
+                    days=options["days"],
+                    seed=options["seed"],
+                )
+            try:
+                loader.load(objects)
+            except (DeserializationError, ValueError) as exc:
+                raise CommandError(f"Could not load the fixtures: {exc}") from exc
+        elapsed = perf_counter() - started
+
+        total = sum(loader.loaded.values())
+        details = ", ".join(
+            f"{count} {label}" for label, count in loader.loaded.items()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Loaded {total} objects ({details or 'none'}) in {elapsed:.1f}s, "
+                f"{total / elapsed if elapsed else 0:.0f} objects/s."
+            )
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import TaskTombstone
+from tasks.sync import get_tombstone_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the tombstones of deleted tasks that are older than "
+        "TASKS_SYNC_TOMBSTONE_RETENTION_DAYS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of tombstones deleted per query (default: %(default)s).",
+        )
+
+    def handle(self, *args, **options):
+        expired = TaskTombstone.objects.filter(deleted_at__lt=get_tombstone_cutoff())
+        pruned = 0
+        while True:
+            ids = list(expired.values_list("id", flat=True)[: options["batch_size"]])
+            if not ids:
+                break
+            deleted, _ = TaskTombstone.objects.filter(id__in=ids).delete()
+            pruned += deleted
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} task tombstones."))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+from tasks.operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL.
+    atomic = False
+
+    dependencies = [
+        ("tasks", "0001_initial"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name="task",
+            index=models.Index(
+                fields=["completed", "created_at", "id"],
+                name="task_completed_created_idx",
+            ),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name="task",
+            index=models.Index(fields=["created_at", "id"], name="task_created_idx"),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name="task",
+            index=models.Index(fields=["updated_at"], name="task_updated_idx"),
+        ),
+    ]
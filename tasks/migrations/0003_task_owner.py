@@ -0,0 +1,54 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from tasks.operations import (
+    AddIndexConcurrentlyIfSupported,
+    RemoveIndexConcurrentlyIfSupported,
+)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL.
+    atomic = False
+
+    dependencies = [
+        ("tasks", "0002_task_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tasks",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name="task",
+            index=models.Index(
+                fields=["owner", "created_at", "id"], name="task_owner_created_idx"
+            ),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name="task",
+            index=models.Index(
+                fields=["owner", "completed", "created_at", "id"],
+                name="task_owner_completed_idx",
+            ),
+        ),
+        # superseded by task_owner_completed_idx, every list is scoped to an owner
+        RemoveIndexConcurrentlyIfSupported(
+            model_name="task",
+            name="task_completed_created_idx",
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:02
+
+from django.conf import settings
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+def backfill_task_owner(apps, schema_editor):
+    """
+    Assign tasks without an owner to the first superuser (or the first user
+    when there is no superuser), one batch per transaction so the table is
+    never locked for long.
+    """
+    Task = apps.get_model("tasks", "Task")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    db_alias = schema_editor.connection.alias
+
+    users = User.objects.using(db_alias).order_by("-is_superuser", "pk")
+    owner_id = users.values_list("pk", flat=True).first()
+    if owner_id is None:
+        return
+
+    unowned = Task.objects.using(db_alias).filter(owner__isnull=True)
+    while True:
+        with transaction.atomic(using=db_alias):
+            ids = list(unowned.order_by("pk").values_list("pk", flat=True)[:BATCH_SIZE])
+            if not ids:
+                break
+            Task.objects.using(db_alias).filter(pk__in=ids).update(owner_id=owner_id)
+
+
+class Migration(migrations.Migration):
+
+    # Each batch is committed on its own.
+    atomic = False
+
+    dependencies = [
+        ("tasks", "0003_task_owner"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_task_owner, migrations.RunPython.noop),
+    ]
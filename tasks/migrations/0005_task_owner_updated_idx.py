@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+from tasks.operations import (
+    AddIndexConcurrentlyIfSupported,
+    RemoveIndexConcurrentlyIfSupported,
+)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL.
+    atomic = False
+
+    dependencies = [
+        ("tasks", "0004_backfill_task_owner"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name="task",
+            index=models.Index(
+                fields=["owner", "updated_at", "id"], name="task_owner_updated_idx"
+            ),
+        ),
+        RemoveIndexConcurrentlyIfSupported(
+            model_name="task",
+            name="task_updated_idx",
+        ),
+    ]
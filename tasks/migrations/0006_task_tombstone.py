@@ -0,0 +1,41 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0005_task_owner_updated_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("task_id", models.BigIntegerField()),
+                ("owner_id", models.BigIntegerField(null=True)),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "ordering": ["deleted_at", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["owner_id", "deleted_at", "id"],
+                        name="tombstone_owner_deleted_idx",
+                    ),
+                    models.Index(fields=["deleted_at"], name="tombstone_deleted_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:21
+
+import django.db.models.deletion
+import tasks.models
+from django.db import migrations, models
+
+from tasks.operations import CreateTaskSearchIndex
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL.
+    atomic = False
+
+    dependencies = [
+        ("tasks", "0006_task_tombstone"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskSearchIndex",
+            fields=[
+                (
+                    "task",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_index",
+                        serialize=False,
+                        to="tasks.task",
+                    ),
+                ),
+                ("title", models.TextField()),
+                ("description", models.TextField()),
+                (
+                    "document",
+                    tasks.models.SearchDocumentField(db_column="tasks_task_fts"),
+                ),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "tasks_task_fts",
+                "managed": False,
+            },
+        ),
+        CreateTaskSearchIndex(),
+    ]
@@ -1,9 +1,23 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Lookup
+from django.utils import timezone
 
 
 class Task(models.Model):
     """Model representing a task in the task manager application."""
 
+    # Rows created before tasks had owners are backfilled by a migration, the
+    # column is nullable so it can be added to a live table first.
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="tasks",
+        null=True,
+        blank=True,
+        # covered by the composite indexes below, which start with owner
+        db_index=False,
+    )
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
     completed = models.BooleanField(default=False)
@@ -12,6 +26,179 @@ class Task(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # a user's list, ordered by (created_at, id)
+            models.Index(
+                fields=["owner", "created_at", "id"], name="task_owner_created_idx"
+            ),
+            # a user's list filtered on completed, ordered by (created_at, id)
+            models.Index(
+                fields=["owner", "completed", "created_at", "id"],
+                name="task_owner_completed_idx",
+            ),
+            # unscoped list in the admin
+            models.Index(fields=["created_at", "id"], name="task_created_idx"),
+            # a user's last change and task count, for conditional requests
+            models.Index(
+                fields=["owner", "updated_at", "id"], name="task_owner_updated_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded, the count signals compare against it.
+        instance._loaded_values = {
+            field: value
+            for field, value in zip(field_names, values)
+            if value is not models.DEFERRED
+        }
+        return instance
+
+
+class TaskTombstone(models.Model):
+    """
+    Record of a deleted task, so syncing clients learn about the deletion.
+
+    Tombstones are kept for ``TASKS_SYNC_TOMBSTONE_RETENTION_DAYS`` and then
+    pruned. The owner is stored as a plain id, a tombstone may outlive its
+    owner until it is pruned.
+    """
+
+    task_id = models.BigIntegerField()
+    owner_id = models.BigIntegerField(null=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["deleted_at", "id"]
+        indexes = [
+            # a user's deletions since a watermark, in (deleted_at, id) order
+            models.Index(
+                fields=["owner_id", "deleted_at", "id"],
+                name="tombstone_owner_deleted_idx",
+            ),
+            # pruning by age
+            models.Index(fields=["deleted_at"], name="tombstone_deleted_idx"),
+        ]
+
+    def __str__(self):
+        return f"Task {self.task_id} deleted at {self.deleted_at}"
+
+
+class ArchivedTask(models.Model):
+    """
+    A completed task moved out of the task table by ``manage.py
+    archive_tasks``, so the live table only holds the tasks in use.
+
+    It keeps the id, owner and timestamps of the task. Archived tasks are
+    read-only, clients list them with ``include_archived=true``.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_tasks",
+        null=True,
+        blank=True,
+        # covered by the composite indexes below, which start with owner
+        db_index=False,
+    )
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    completed = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            # a user's list, ordered by (created_at, id)
+            models.Index(
+                fields=["owner", "created_at", "id"],
+                name="archived_owner_created_idx",
+            ),
+            # a user's last change, for conditional requests
+            models.Index(
+                fields=["owner", "updated_at", "id"],
+                name="archived_owner_updated_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class TaskWithArchived(models.Model):
+    """
+    The live and the archived tasks, read from a ``UNION ALL`` view, see
+    `tasks.archive`.
+    """
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        related_name="+",
+        null=True,
+        db_constraint=False,
+    )
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    completed = models.BooleanField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived = models.BooleanField()
+
+    class Meta:
+        managed = False
+        db_table = "tasks_task_with_archived"
+        ordering = ["created_at"]
+
+    def __str__(self):
+        return self.title
+
+
+class SearchDocumentField(models.TextField):
+    """The hidden column of an FTS5 table, named after the table."""
+
+
+@SearchDocumentField.register_lookup
+class Match(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", (*lhs_params, *rhs_params)
+
+
+class TaskSearchIndex(models.Model):
+    """
+    SQLite FTS5 index of the task titles and descriptions.
+
+    The virtual table reads its content from the task table and is kept in
+    sync by triggers, see `tasks.search`. It is only created on SQLite,
+    PostgreSQL searches a GIN index on the tasks instead.
+    """
+
+    task = models.OneToOneField(
+        Task,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        related_name="search_index",
+    )
+    title = models.TextField()
+    description = models.TextField()
+    document = SearchDocumentField(db_column="tasks_task_fts")
+    # BM25 score of a match, lower is more relevant
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "tasks_task_fts"
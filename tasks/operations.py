@@ -0,0 +1,159 @@
+from django.db.migrations.operations import AddIndex, RemoveIndex
+from django.db.migrations.operations.base import Operation
+
+
+class AddIndexConcurrentlyIfSupported(AddIndex):
+    """
+    Create an index, using ``CREATE INDEX CONCURRENTLY`` on PostgreSQL so the
+    table is not locked against writes while the index is being built.
+
+    Other backends fall back to a regular ``CREATE INDEX``. Migrations using
+    this operation must set ``atomic = False``.
+    """
+
+    def describe(self):
+        return "Create index %s on field(s) %s of model %s (concurrently if supported)" % (
+            self.index.name,
+            ", ".join(self.index.fields),
+            self.model_name,
+        )
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == "postgresql":
+                schema_editor.add_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == "postgresql":
+                schema_editor.remove_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.remove_index(model, self.index)
+
+
+class RemoveIndexConcurrentlyIfSupported(RemoveIndex):
+    """
+    Remove an index, using ``DROP INDEX CONCURRENTLY`` on PostgreSQL.
+
+    Other backends fall back to a regular ``DROP INDEX``. Migrations using
+    this operation must set ``atomic = False``.
+    """
+
+    def describe(self):
+        return "Remove index %s from %s (concurrently if supported)" % (
+            self.name,
+            self.model_name,
+        )
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            from_model_state = from_state.models[app_label, self.model_name_lower]
+            index = from_model_state.get_index_by_name(self.name)
+            if schema_editor.connection.vendor == "postgresql":
+                schema_editor.remove_index(model, index, concurrently=True)
+            else:
+                schema_editor.remove_index(model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            to_model_state = to_state.models[app_label, self.model_name_lower]
+            index = to_model_state.get_index_by_name(self.name)
+            if schema_editor.connection.vendor == "postgresql":
+                schema_editor.add_index(model, index, concurrently=True)
+            else:
+                schema_editor.add_index(model, index)
+
+
+class CreateTaskSearchIndex(Operation):
+    """
+    Create the full-text index of the tasks: an FTS5 table kept in sync by
+    triggers on SQLite, a GIN index built concurrently on PostgreSQL.
+
+    Migrations using this operation must set ``atomic = False``.
+    """
+
+    reversible = True
+    index_name = "task_search_idx"
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def get_index(self):
+        from django.contrib.postgres.indexes import GinIndex
+
+        from tasks.search import get_search_vector
+
+        return GinIndex(get_search_vector(), name=self.index_name)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        from tasks.search import SQLITE_SEARCH_SQL, install_sqlite_search_triggers
+
+        model = to_state.apps.get_model(app_label, "task")
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        vendor = schema_editor.connection.vendor
+        if vendor == "postgresql":
+            schema_editor.add_index(model, self.get_index(), concurrently=True)
+        elif vendor == "sqlite":
+            for sql in SQLITE_SEARCH_SQL:
+                schema_editor.execute(sql)
+            install_sqlite_search_triggers(schema_editor.connection)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        from tasks.search import SQLITE_DROP_SEARCH_SQL
+
+        model = from_state.apps.get_model(app_label, "task")
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        vendor = schema_editor.connection.vendor
+        if vendor == "postgresql":
+            schema_editor.remove_index(model, self.get_index(), concurrently=True)
+        elif vendor == "sqlite":
+            for sql in SQLITE_DROP_SEARCH_SQL:
+                schema_editor.execute(sql)
+
+    def describe(self):
+        return "Create the full-text search index of tasks"
+
+    @property
+    def migration_name_fragment(self):
+        return "task_search"
+
+
+class CreateTaskArchiveView(Operation):
+    """
+    Create the ``UNION ALL`` view of the live and archived tasks read by
+    `TaskWithArchived`.
+    """
+
+    reversible = True
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        from tasks.archive import install_archive_view
+
+        model = to_state.apps.get_model(app_label, "archivedtask")
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            install_archive_view(schema_editor.connection)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        from tasks.archive import DROP_ARCHIVE_VIEW_SQL
+
+        model = from_state.apps.get_model(app_label, "archivedtask")
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute(DROP_ARCHIVE_VIEW_SQL)
+
+    def describe(self):
+        return "Create the view of the live and archived tasks"
+
+    @property
+    def migration_name_fragment(self):
+        return "task_archive_view"
@@ -0,0 +1,247 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from functools import partial
+
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    CursorPagination,
+    PageNumberPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .counts import get_count_filter, get_task_count
+
+KeysetCursor = namedtuple("KeysetCursor", ["created_at", "pk", "reverse"])
+
+
+class TaskKeysetPagination(CursorPagination):
+    """
+    Keyset pagination for tasks on ``(created_at, id)``.
+
+    Each page is fetched with a ``WHERE (created_at, id) > (...)`` range
+    condition instead of an ``OFFSET``, so the cost of a page does not grow
+    with its depth. The cursor tokens are opaque and no total count is
+    returned. Pages are always in that order, search results are not
+    ranked by relevance.
+    """
+
+    ordering = ("created_at", "id")
+    # Query parameter used by clients to opt in to this pagination mode.
+    mode_query_param = "pagination"
+    mode_query_value = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        if reverse:
+            queryset = queryset.order_by("-created_at", "-id")
+        else:
+            queryset = queryset.order_by("created_at", "id")
+
+        if self.cursor is not None:
+            created_at, pk = self.cursor.created_at, self.cursor.pk
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                )
+
+        # Fetch one extra row to find out whether there is a following page.
+        results = list(queryset[: self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.cursor is not None
+
+        # Positions are taken before the rows are handed to the serializer,
+        # which may convert them in place.
+        if self.page:
+            self.next_cursor = self._get_cursor(self.page[-1], reverse=False)
+            self.previous_cursor = self._get_cursor(self.page[0], reverse=True)
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Paging backwards past the start leaves us on an empty page, the
+            # next page is then the first one.
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.next_cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.previous_cursor)
+
+    def decode_cursor(self, request):
+        """
+        Given a request with a cursor, return a `KeysetCursor` instance.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            token = urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+            reverse, created_at, pk = token.split("|")
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError(token)
+            return KeysetCursor(
+                created_at=created_at, pk=int(pk), reverse=bool(int(reverse))
+            )
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        """
+        Given a `KeysetCursor` instance, return an url with encoded cursor.
+        """
+        token = "%d|%s|%d" % (cursor.reverse, cursor.created_at.isoformat(), cursor.pk)
+        encoded = urlsafe_b64encode(token.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_cursor(self, instance, reverse):
+        if isinstance(instance, dict):
+            return KeysetCursor(instance["created_at"], instance["id"], reverse)
+        return KeysetCursor(instance.created_at, instance.pk, reverse)
+
+
+class CachedCountPaginator(DjangoPaginator):
+    """
+    Django paginator that reads its count from the task counter cache.
+    """
+
+    def __init__(self, object_list, per_page, *, owner_id, completed, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.owner_id = owner_id
+        self.completed = completed
+
+    @cached_property
+    def count(self):
+        return get_task_count(self.owner_id, self.completed, self.object_list)
+
+
+class TaskPageNumberPagination(PageNumberPagination):
+    """
+    Page number pagination for tasks with a cached ``count``.
+
+    The number of a user's tasks, per ``completed`` filter, is served from a
+    counter cache that task saves and deletes keep up to date, instead of a
+    ``SELECT COUNT(*)`` per page. Lists filtered in other ways are counted
+    exactly. Clients that do not need the count can skip it with
+    ``?count=false``, ``count`` is then ``null``.
+    """
+
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.include_count = self.get_include_count(request)
+        if not self.include_count:
+            return self.paginate_queryset_without_count(queryset, request)
+
+        cached_filter = self.get_cached_filter(request, view)
+        if cached_filter is None:
+            self.django_paginator_class = DjangoPaginator
+        else:
+            self.django_paginator_class = partial(
+                CachedCountPaginator, owner_id=request.user.id, **cached_filter
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_include_count(self, request):
+        value = request.query_params.get(self.count_query_param, "")
+        return value.lower() not in ("false", "0")
+
+    def get_cached_filter(self, request, view):
+        """
+        Return the filter arguments of the cached count for the request, or
+        ``None`` when the count is not cached for its filters.
+        """
+        filterset_class = getattr(view, "filterset_class", None)
+        if filterset_class is None:
+            return {"completed": None}
+        return get_count_filter(filterset_class(request.query_params, request=request))
+
+    def paginate_queryset_without_count(self, queryset, request):
+        """
+        Return the requested page without counting the tasks, one extra row
+        is fetched to find out whether there is a next page.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        try:
+            self.page_number = _positive_int(
+                request.query_params.get(self.page_query_param) or 1, strict=True
+            )
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+
+        offset = (self.page_number - 1) * page_size
+        results = list(queryset[offset : offset + page_size + 1])
+        if not results and self.page_number > 1:
+            raise NotFound(self.invalid_page_message)
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if self.include_count:
+            return super().get_paginated_response(data)
+        return Response(
+            {
+                "count": None,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["required"] = ["results"]
+        response_schema["properties"]["count"]["nullable"] = True
+        return response_schema
+
+    def get_next_link(self):
+        if self.include_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.include_count:
+            return super().get_previous_link()
+        if self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
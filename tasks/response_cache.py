@@ -0,0 +1,165 @@
+import threading
+import time
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core.cache import is_shared
+
+# Scopes a task belongs to: every list of its owner, the lists filtered on
+# its completed state and its own detail.
+ALL_SCOPE = "all"
+
+
+def completed_scope(completed):
+    return ALL_SCOPE if completed is None else str(completed).lower()
+
+
+def task_scope(pk):
+    return f"task-{pk}"
+
+
+class CachedEntry:
+    """Result of a cache lookup, to be filled with the response on a miss."""
+
+    def __init__(self, key, version, conditional=None, data=None):
+        self.key = key
+        self.version = version
+        self.conditional = conditional
+        self.data = data
+
+    @property
+    def hit(self):
+        return self.data is not None
+
+
+class TaskResponseCache:
+    """
+    Cache of serialized task list and detail responses.
+
+    Entries are keyed by the user, the full URL and the accepted media type,
+    so they never leak between users or representations. Each entry records
+    the version of its scope it was built from, a per-user counter bumped
+    after every task write in that scope. An entry whose version is behind
+    is stale and rebuilt, ``TASKS_RESPONSE_CACHE_TIMEOUT`` only bounds how
+    long unused entries are kept. Workers only see each other's versions
+    through a shared cache, the response cache is off without one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stale": 0}
+
+    @property
+    def cache(self):
+        return caches[settings.TASKS_RESPONSE_CACHE_ALIAS]
+
+    @property
+    def enabled(self):
+        return settings.TASKS_RESPONSE_CACHE_TIMEOUT > 0 and is_shared(self.cache)
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self):
+        """Return the hit, miss and stale counts of this process."""
+        with self._lock:
+            return dict(self._counters)
+
+    def collect_metrics(self):
+        """Return the lookup counts as a metrics collector, see `core.metrics`."""
+        return [
+            (
+                "tasks_response_cache_lookups_total",
+                "Task response cache lookups by result.",
+                "counter",
+                {(("result", name),): count for name, count in self.stats().items()},
+            )
+        ]
+
+    def version_key(self, owner_id, scope):
+        return f"tasks:response-version:{owner_id}:{scope}"
+
+    def entry_key(self, request):
+        renderer = getattr(request, "accepted_renderer", None)
+        url = request.build_absolute_uri()
+        media_type = renderer.media_type if renderer else ""
+        digest = sha256(f"{url}|{media_type}".encode()).hexdigest()[:32]
+        return f"tasks:response:{request.user.id}:{digest}"
+
+    def get(self, request, scope):
+        """
+        Return the `CachedEntry` of the request in ``scope``, ``hit`` tells
+        whether it holds a current response. Nothing is cached for a
+        ``None`` scope.
+        """
+        if not self.enabled or scope is None:
+            return CachedEntry(None, None)
+        key = self.entry_key(request)
+        version_key = self.version_key(request.user.id, scope)
+        found = self.cache.get_many([key, version_key])
+        version = found.get(version_key)
+        if version is None:
+            # Start from an unpredictable version, so entries written before
+            # the counter was evicted can never match it again.
+            self.cache.add(version_key, time.time_ns(), None)
+            version = self.cache.get(version_key)
+
+        entry = found.get(key)
+        if entry is None:
+            self._count("misses")
+        elif entry[0] != version:
+            self._count("stale")
+        else:
+            self._count("hits")
+            return CachedEntry(key, version, *entry[1:])
+        return CachedEntry(key, version)
+
+    def set(self, entry, conditional, data):
+        """Store a response built for the lookup ``entry``."""
+        if entry.version is None:
+            return
+        self.cache.set(
+            entry.key,
+            (entry.version, conditional, data),
+            settings.TASKS_RESPONSE_CACHE_TIMEOUT,
+        )
+
+    def invalidate(self, owner_id, scopes):
+        """
+        Bump the versions of a user's ``scopes`` once the current transaction
+        commits, which makes their cached responses stale.
+        """
+        if not self.enabled:
+            return
+        keys = [self.version_key(owner_id, scope) for scope in set(scopes)]
+
+        def bump():
+            for key in keys:
+                try:
+                    self.cache.incr(key)
+                except ValueError:
+                    # Nothing is cached against a missing version.
+                    pass
+
+        transaction.on_commit(bump)
+
+    def invalidate_tasks(self, tasks):
+        """
+        Make the cached responses of a batch of tasks stale, for writes that
+        do not send model signals.
+        """
+        scopes = {}
+        for task in tasks:
+            scopes.setdefault(
+                task.owner_id,
+                [ALL_SCOPE, completed_scope(True), completed_scope(False)],
+            ).append(task_scope(task.pk))
+        for owner_id, owner_scopes in scopes.items():
+            self.invalidate(owner_id, owner_scopes)
+
+
+response_cache = TaskResponseCache()
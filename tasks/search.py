@@ -0,0 +1,146 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.models import F, Q
+
+from .models import Task, TaskSearchIndex
+
+# Text search configuration of the PostgreSQL index and queries.
+SEARCH_CONFIG = "english"
+
+# Index every task again from the task table.
+SQLITE_REBUILD_SEARCH_SQL = (
+    "INSERT INTO tasks_task_fts(tasks_task_fts) VALUES ('rebuild')"
+)
+# Titles weigh more than descriptions in the ranking.
+SQLITE_SEARCH_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_task_fts USING fts5("
+    "title, description, content='tasks_task', content_rowid='id', "
+    "tokenize='porter unicode61 remove_diacritics 2')",
+    "INSERT INTO tasks_task_fts(tasks_task_fts, rank) "
+    "VALUES ('rank', 'bm25(10.0, 1.0)')",
+    SQLITE_REBUILD_SEARCH_SQL,
+]
+SQLITE_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS tasks_task_fts_insert AFTER INSERT ON tasks_task "
+    "BEGIN "
+    "INSERT INTO tasks_task_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_task_fts_delete AFTER DELETE ON tasks_task "
+    "BEGIN "
+    "INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_task_fts_update "
+    "AFTER UPDATE OF title, description ON tasks_task "
+    "BEGIN "
+    "INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO tasks_task_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); "
+    "END",
+]
+SQLITE_DROP_SEARCH_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS tasks_task_fts_insert",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_delete",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_update",
+]
+SQLITE_DROP_SEARCH_SQL = [
+    *SQLITE_DROP_SEARCH_TRIGGERS,
+    "DROP TABLE IF EXISTS tasks_task_fts",
+]
+
+
+def get_search_vector():
+    """Return the document expression of the PostgreSQL GIN index."""
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector("title", weight="A", config=SEARCH_CONFIG) + SearchVector(
+        "description", weight="B", config=SEARCH_CONFIG
+    )
+
+
+def install_sqlite_search_triggers(connection):
+    """
+    Create the triggers keeping the FTS5 index in sync with the tasks.
+
+    SQLite migrations that rebuild the task table drop its triggers, they
+    are created again after every ``migrate``.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        if "tasks_task_fts" not in connection.introspection.table_names(cursor):
+            return
+        for sql in SQLITE_SEARCH_TRIGGERS:
+            cursor.execute(sql)
+
+
+@contextmanager
+def deferred_sqlite_search_index(connection):
+    """
+    Drop the search triggers for the duration of the block, then rebuild the
+    FTS5 index in one pass and restore the triggers. Faster than indexing
+    each row when loading many tasks.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor != "sqlite" or (
+            "tasks_task_fts" not in connection.introspection.table_names(cursor)
+        ):
+            yield
+            return
+        for sql in SQLITE_DROP_SEARCH_TRIGGERS:
+            cursor.execute(sql)
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(SQLITE_REBUILD_SEARCH_SQL)
+        install_sqlite_search_triggers(connection)
+
+
+def get_sqlite_match_query(text):
+    """
+    Return ``text`` as an FTS5 query matching all its words, quoted so that
+    FTS5 operators and syntax errors in user input are never interpreted.
+    """
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", text))
+
+
+def search_tasks(queryset, text):
+    """
+    Filter ``queryset`` to the tasks matching all the words of ``text`` in
+    their title or description, most relevant first.
+
+    Matches are found through the full-text index of the database, so the
+    cost depends on the number of matches and not on the number of tasks.
+    """
+    if connections[queryset.db].vendor == "postgresql":
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            queryset.alias(search_document=get_search_vector())
+            .filter(search_document=query)
+            .alias(search_rank=SearchRank(F("search_document"), query))
+            .order_by("-search_rank", "created_at", "id")
+        )
+
+    match_query = get_sqlite_match_query(text)
+    if not match_query:
+        return queryset.none()
+    if queryset.model is not Task:
+        # Live and archived tasks: the archived ones are not in the FTS5
+        # index, they are matched on substrings of their words, unranked.
+        live = TaskSearchIndex.objects.filter(document__match=match_query)
+        archived = Q(archived=True)
+        for word in re.findall(r"\w+", text):
+            archived &= Q(title__icontains=word) | Q(description__icontains=word)
+        return queryset.filter(
+            Q(archived=False, id__in=live.values("task_id")) | archived
+        ).order_by("created_at", "id")
+    return queryset.filter(search_index__document__match=match_query).order_by(
+        "search_index__rank", "created_at", "id"
+    )
@@ -1,6 +1,91 @@
-from rest_framework import serializers
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
+from core.metrics import measure_serialization
+
+from .counts import invalidate_task_counts
 from .models import Task
+from .response_cache import response_cache
+
+# Fields of the task representation, in the order TaskSerializer outputs them.
+TASK_READ_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "completed",
+    "created_at",
+    "updated_at",
+)
+
+
+class TaskListSerializer(serializers.ListSerializer):
+    """
+    List serializer used for batches of tasks.
+
+    Creates and updates are written with ``bulk_create``/``bulk_update``
+    instead of one query per task.
+    """
+
+    @measure_serialization
+    def to_representation(self, data):
+        return super().to_representation(data)
+
+    def run_child_validation(self, data):
+        """
+        For bulk updates ``self.instance`` maps ids to tasks, validate each
+        item against the task it updates.
+        """
+        if self.instance is None:
+            return super().run_child_validation(data)
+
+        task = self.instance.get(data.get("id")) if isinstance(data, dict) else None
+        if task is None:
+            raise serializers.ValidationError({"id": ["No Task matches the given id."]})
+        self.child.instance = task
+        self.child.initial_data = data
+        try:
+            validated = super().run_child_validation(data)
+        finally:
+            self.child.instance = None
+        validated["id"] = task.pk
+        return validated
+
+    def create(self, validated_data):
+        """
+        Create all tasks with a single ``bulk_create``.
+        """
+        tasks = [Task(**attrs) for attrs in validated_data]
+        tasks = Task.objects.bulk_create(
+            tasks, batch_size=settings.TASKS_BULK_BATCH_SIZE
+        )
+        invalidate_task_counts(task.owner_id for task in tasks)
+        response_cache.invalidate_tasks(tasks)
+        return tasks
+
+    def update(self, instance, validated_data):
+        """
+        Update all tasks with a single ``bulk_update``.
+        """
+        now = timezone.now()
+        tasks = []
+        fields = {"updated_at"}
+        for attrs in validated_data:
+            task = instance[attrs.pop("id")]
+            for attr, value in attrs.items():
+                setattr(task, attr, value)
+                fields.add(attr)
+            # bulk_update() does not go through save(), so auto_now is not applied.
+            task.updated_at = now
+            tasks.append(task)
+        Task.objects.bulk_update(
+            tasks, sorted(fields), batch_size=settings.TASKS_BULK_BATCH_SIZE
+        )
+        if "completed" in fields:
+            invalidate_task_counts(task.owner_id for task in tasks)
+        response_cache.invalidate_tasks(tasks)
+        return tasks
 
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -8,8 +93,13 @@ class TaskSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Task
-        fields = "__all__"
+        exclude = ("owner",)
         read_only_fields = ("created_at", "updated_at")
+        list_serializer_class = TaskListSerializer
+
+    @measure_serialization
+    def to_representation(self, instance):
+        return super().to_representation(instance)
 
     def validate(self, data):
         """Validate the data for creating or updating a task."""
@@ -28,3 +118,72 @@ class TaskSerializer(serializers.ModelSerializer):
         Update an existing task instance.
         """
         return super().update(instance, validated_data)
+
+
+class TaskBulkDeleteSerializer(serializers.Serializer):
+    """Serializer for the ids of a bulk task deletion."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+    )
+
+    def validate_ids(self, value):
+        """Validate the number of tasks deleted in one request."""
+        if len(value) > settings.TASKS_BULK_MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {settings.TASKS_BULK_MAX_ITEMS} elements."
+            )
+        return value
+
+
+def get_datetime_formatter():
+    """
+    Return a function formatting datetimes exactly like ``DateTimeField``
+    does with the current settings and active timezone.
+
+    The ISO 8601 case is precompiled to a plain function so formatting does
+    not go through the field machinery for every value.
+    """
+    output_format = api_settings.DATETIME_FORMAT
+    if output_format is None:
+        return lambda value: value
+    if output_format.lower() != ISO_8601 or not settings.USE_TZ:
+        return serializers.DateTimeField().to_representation
+
+    current_timezone = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if not value:
+            return None
+        value = value.astimezone(current_timezone).isoformat()
+        if value.endswith("+00:00"):
+            return value[:-6] + "Z"
+        return value
+
+    return format_datetime
+
+
+def iter_task_rows(rows):
+    """
+    Convert ``Task.objects.values(*TASK_READ_FIELDS)`` rows to the same
+    representation as ``TaskSerializer``, in place, yielding each row.
+
+    This is the read path used by the task list, detail and export views.
+    It skips the per-field ``to_representation`` dispatch of
+    ``ModelSerializer``, the other fields of a row are already in their
+    primitive form.
+    """
+    format_datetime = get_datetime_formatter()
+    for row in rows:
+        row["created_at"] = format_datetime(row["created_at"])
+        row["updated_at"] = format_datetime(row["updated_at"])
+        yield row
+
+
+@measure_serialization
+def serialize_task_rows(rows):
+    """
+    Return the list of task representations for ``values()`` rows.
+    """
+    return list(iter_task_rows(rows))
@@ -0,0 +1,91 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_migrate
+from django.dispatch import receiver
+
+from .archive import drop_archive_view, install_archive_view
+from .counts import adjust_task_counts, invalidate_task_counts
+from .models import Task, TaskTombstone
+from .response_cache import ALL_SCOPE, completed_scope, response_cache, task_scope
+from .search import install_sqlite_search_triggers
+
+
+def get_task_scopes(completed, pk):
+    """Return the response cache scopes a task is part of."""
+    return [ALL_SCOPE, completed_scope(completed), task_scope(pk)]
+
+
+@receiver(post_save, sender=Task)
+def update_task_caches_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Keep the cached task counts in step with a saved task: count it in when
+    it is created, move it between counters when its owner or completed
+    state changes. Cached responses the task is part of, before and after
+    the save, become stale.
+    """
+    loaded = getattr(instance, "_loaded_values", {})
+    current = {"owner_id": instance.owner_id, "completed": instance.completed}
+    instance._loaded_values = {**loaded, **current}
+
+    scopes = get_task_scopes(instance.completed, instance.pk)
+    if not created and loaded.get("completed") != instance.completed:
+        # Completed changed, or its previous value is unknown.
+        scopes.append(completed_scope(not instance.completed))
+    response_cache.invalidate(instance.owner_id, scopes)
+    previous_owner_id = loaded.get("owner_id", instance.owner_id)
+    if previous_owner_id != instance.owner_id:
+        response_cache.invalidate(previous_owner_id, scopes)
+
+    if raw:
+        invalidate_task_counts([instance.owner_id])
+    elif created:
+        adjust_task_counts(instance.owner_id, instance.completed, 1)
+    elif any(field not in loaded for field in current):
+        # Saved without being loaded first, the previous state is unknown.
+        invalidate_task_counts([instance.owner_id])
+    elif any(loaded[field] != value for field, value in current.items()):
+        adjust_task_counts(loaded["owner_id"], loaded["completed"], -1)
+        adjust_task_counts(instance.owner_id, instance.completed, 1)
+
+
+@receiver(post_delete, sender=Task)
+def update_task_caches_on_delete(sender, instance, **kwargs):
+    adjust_task_counts(instance.owner_id, instance.completed, -1)
+    response_cache.invalidate(
+        instance.owner_id, get_task_scopes(instance.completed, instance.pk)
+    )
+
+
+@receiver(post_delete, sender=Task)
+def record_task_tombstone(sender, instance, origin=None, **kwargs):
+    """
+    Leave a tombstone for syncing clients in place of a deleted task.
+
+    Tasks deleted along with their owner get none, nobody can sync them
+    anymore. Bulk deletes record their tombstones with a single insert
+    instead, without sending signals.
+    """
+    if origin is not None and getattr(origin, "model", type(origin)) is not Task:
+        return
+    TaskTombstone.objects.create(task_id=instance.pk, owner_id=instance.owner_id)
+
+
+@receiver(post_migrate)
+def install_search_triggers(sender, using, **kwargs):
+    """
+    Restore the search triggers dropped by migrations rebuilding tasks, and
+    the archive view dropped before the migrations.
+    """
+    if sender.name == "tasks":
+        install_sqlite_search_triggers(connections[using])
+        install_archive_view(connections[using])
+
+
+@receiver(pre_migrate)
+def drop_archive_view_before_migrate(sender, using, **kwargs):
+    """
+    Drop the view of the live and archived tasks, which would stop
+    migrations from rebuilding or altering the task tables. It is created
+    again after the migrations.
+    """
+    if sender.name == "tasks":
+        drop_archive_view(connections[using])
@@ -0,0 +1,166 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import Task, TaskTombstone
+from .serializers import TASK_READ_FIELDS, serialize_task_rows
+
+# Rows changed this long before a sync are returned again by the next one,
+# in case their transaction committed after one with a later timestamp.
+SYNC_OVERLAP = timedelta(seconds=30)
+
+# Positions of the last task change and the last deletion a client has
+# seen, each as an (at, id) pair, and the time of its last sync.
+Watermark = namedtuple(
+    "Watermark", ["updated_at", "task_id", "deleted_at", "tombstone_id", "synced_at"]
+)
+
+
+class WatermarkExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = (
+        "The watermark is older than the tombstone retention window, "
+        "sync again without a watermark."
+    )
+    default_code = "watermark_expired"
+
+
+def get_tombstone_cutoff():
+    """Return the time before which tombstones are pruned."""
+    days = settings.TASKS_SYNC_TOMBSTONE_RETENTION_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def encode_watermark(watermark):
+    """Return ``watermark`` as an opaque token."""
+    values = []
+    for value in watermark:
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        values.append("" if value is None else str(value))
+    token = "|".join(values)
+    return urlsafe_b64encode(token.encode("ascii")).decode("ascii")
+
+
+def decode_watermark(encoded):
+    """
+    Return the `Watermark` encoded in a token, or ``None`` for no token.
+    """
+    if not encoded:
+        return None
+    try:
+        token = urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+        updated_at, task_id, deleted_at, tombstone_id, synced_at = token.split("|")
+        watermark = Watermark(
+            updated_at=parse_datetime(updated_at) if updated_at else None,
+            task_id=int(task_id) if task_id else None,
+            deleted_at=parse_datetime(deleted_at) if deleted_at else None,
+            tombstone_id=int(tombstone_id) if tombstone_id else None,
+            synced_at=parse_datetime(synced_at),
+        )
+    except (TypeError, ValueError, UnicodeError):
+        watermark = None
+    if watermark is None or watermark.synced_at is None:
+        raise ValidationError({"since": ["Invalid watermark."]})
+    return watermark
+
+
+def filter_after(queryset, field, position, pk):
+    """Filter ``queryset`` to the rows after ``(position, pk)`` in keyset order."""
+    if position is None:
+        return queryset
+    return queryset.filter(
+        Q(**{f"{field}__gt": position}) | Q(**{field: position, "id__gt": pk})
+    )
+
+
+def hold_back(position, pk, horizon):
+    """
+    Return the keyset position ``(position, pk)``, moved back to ``horizon``
+    when it is later, or when there is none.
+    """
+    if position is None or position > horizon:
+        return horizon, 0
+    return position, pk
+
+
+def sync_tasks(owner_id, watermark, page_size):
+    """
+    Return the tasks of a user changed, and the ids of the tasks deleted,
+    since ``watermark``, at most ``page_size`` of each, with the watermark
+    to send next time. ``has_more`` tells whether the client should sync
+    again straight away.
+
+    Without a watermark every task is returned, deletions are reported
+    from then on. The last page's watermark is no later than
+    ``SYNC_OVERLAP`` before the sync, so the changes and deletions since
+    then are returned again and clients dedupe them by id.
+    """
+    now = timezone.now()
+    tombstones = TaskTombstone.objects.filter(owner_id=owner_id)
+    if watermark is None:
+        last_tombstone = (
+            tombstones.order_by("-deleted_at", "-id")
+            .values_list("deleted_at", "id")
+            .first()
+        )
+        watermark = Watermark(None, None, *(last_tombstone or (None, None)), now)
+    elif watermark.synced_at < get_tombstone_cutoff():
+        raise WatermarkExpired()
+
+    changed = list(
+        filter_after(
+            Task.objects.filter(owner_id=owner_id),
+            "updated_at",
+            watermark.updated_at,
+            watermark.task_id,
+        )
+        .order_by("updated_at", "id")
+        .values(*TASK_READ_FIELDS)[: page_size + 1]
+    )
+    deleted = list(
+        filter_after(
+            tombstones, "deleted_at", watermark.deleted_at, watermark.tombstone_id
+        )
+        .order_by("deleted_at", "id")
+        .values("id", "task_id", "deleted_at")[: page_size + 1]
+    )
+    has_more = len(changed) > page_size or len(deleted) > page_size
+    changed, deleted = changed[:page_size], deleted[:page_size]
+
+    # Positions are taken before the rows are serialized in place.
+    if changed:
+        watermark = watermark._replace(
+            updated_at=changed[-1]["updated_at"], task_id=changed[-1]["id"]
+        )
+    if deleted:
+        watermark = watermark._replace(
+            deleted_at=deleted[-1]["deleted_at"], tombstone_id=deleted[-1]["id"]
+        )
+    if not has_more:
+        horizon = now - SYNC_OVERLAP
+        updated_at, task_id = hold_back(
+            watermark.updated_at, watermark.task_id, horizon
+        )
+        deleted_at, tombstone_id = hold_back(
+            watermark.deleted_at, watermark.tombstone_id, horizon
+        )
+        watermark = watermark._replace(
+            updated_at=updated_at,
+            task_id=task_id,
+            deleted_at=deleted_at,
+            tombstone_id=tombstone_id,
+        )
+    return {
+        "changed": serialize_task_rows(changed),
+        "deleted": [tombstone["task_id"] for tombstone in deleted],
+        "watermark": encode_watermark(watermark._replace(synced_at=now)),
+        "has_more": has_more,
+    }
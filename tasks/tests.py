@@ -1,11 +1,37 @@
+import csv
+import gzip
+import json
+import tempfile
+import time
+import timeit
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
 from rest_framework.serializers import ValidationError
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Task
-from .serializers import TaskSerializer
+from .counts import count_key
+from .loading import iter_json_array
+from .models import ArchivedTask, Task, TaskTombstone
+from .response_cache import response_cache
+from .serializers import TASK_READ_FIELDS, TaskSerializer, serialize_task_rows
+from .sync import SYNC_OVERLAP
 
 
 class TestTask(TestCase):
@@ -88,6 +114,7 @@ class TestTaskSerializer(TestCase):
 
 class TestTaskAPI(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         # Create a test user for authentication
         self.user = User.objects.create_user(
@@ -120,10 +147,16 @@ class TestTaskAPI(TestCase):
     def test_task_api_list(self):
         """Test the API endpoint for listing tasks"""
         Task.objects.create(
-            title="API Task 1", description="First task via API", completed=False
+            owner=self.user,
+            title="API Task 1",
+            description="First task via API",
+            completed=False,
         )
         Task.objects.create(
-            title="API Task 2", description="Second task via API", completed=True
+            owner=self.user,
+            title="API Task 2",
+            description="Second task via API",
+            completed=True,
         )
 
         response = self.client.get("/tasks/", format="json")
@@ -135,6 +168,7 @@ class TestTaskAPI(TestCase):
     def test_task_api_update(self):
         """Test the API endpoint for updating a task"""
         task = Task.objects.create(
+            owner=self.user,
             title="Task to Update",
             description="This task will be updated",
             completed=False,
@@ -156,6 +190,7 @@ class TestTaskAPI(TestCase):
     def test_task_api_delete(self):
         """Test the API endpoint for deleting a task"""
         task = Task.objects.create(
+            owner=self.user,
             title="Task to Delete",
             description="This task will be deleted",
             completed=False,
@@ -188,3 +223,1355 @@ class TestTaskAPI(TestCase):
         self.assertIsInstance(response.data["title"][0], ErrorDetail)
         self.assertRaises(ValidationError)
         self.assertEqual(str(response.data["title"][0]), "This field is required.")
+
+    def test_task_api_create_sets_owner(self):
+        """Test that a created task is owned by the requesting user"""
+        response = self.client.post(
+            "/tasks/", {"title": "Owned Task", "owner": 999}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("owner", response.data)
+        self.assertEqual(Task.objects.get(id=response.data["id"]).owner, self.user)
+
+    def test_task_api_scoped_to_owner(self):
+        """Test that users can neither see nor change other users' tasks"""
+        other = User.objects.create_user(
+            username="otheruser", email="other@example.com", password="testpassword"
+        )
+        task = Task.objects.create(owner=other, title="Other Task")
+        Task.objects.create(owner=self.user, title="My Task")
+
+        response = self.client.get("/tasks/", format="json")
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["title"], "My Task")
+        for method in ("get", "put", "patch", "delete"):
+            response = getattr(self.client, method)(
+                f"/tasks/{task.id}/", {"title": "Hijacked"}, format="json"
+            )
+            self.assertEqual(response.status_code, 404)
+        response = self.client.delete("/tasks/bulk/", {"ids": [task.id]}, format="json")
+        self.assertEqual(response.data, {"deleted": 0, "not_found": [task.id]})
+        task.refresh_from_db()
+        self.assertEqual(task.title, "Other Task")
+
+
+class TestTaskKeysetPagination(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tasks = [
+            Task.objects.create(
+                owner=self.user, title=f"Task {i}", completed=i % 2 == 0
+            )
+            for i in range(25)
+        ]
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def test_keyset_pages_cover_all_tasks_in_order(self):
+        """Test that following next links returns every task exactly once"""
+        url = "/tasks/?pagination=cursor"
+        titles = []
+        while url:
+            response = self.client.get(url, format="json")
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            titles.extend(task["title"] for task in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(titles, [task.title for task in self.tasks])
+
+    def test_keyset_previous_link(self):
+        """Test that the previous link returns the preceding page"""
+        first = self.client.get("/tasks/?pagination=cursor", format="json")
+        second = self.client.get(first.data["next"], format="json")
+        self.assertIsNone(first.data["previous"])
+
+        previous = self.client.get(second.data["previous"], format="json")
+        self.assertEqual(previous.data["results"], first.data["results"])
+
+    def test_keyset_with_filter(self):
+        """Test that keyset pagination keeps the completed filter"""
+        response = self.client.get(
+            "/tasks/?pagination=cursor&completed=true", format="json"
+        )
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertTrue(all(task["completed"] for task in response.data["results"]))
+
+        response = self.client.get(response.data["next"], format="json")
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertIsNone(response.data["next"])
+
+    def test_keyset_pages_are_not_counted(self):
+        """Test that keyset pages run no COUNT or MAX aggregate, even searched"""
+        for params in ({}, {"search": "task"}):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(
+                    "/tasks/", {"pagination": "cursor", **params}, format="json"
+                )
+            self.assertEqual(len(response.data["results"]), 10)
+            aggregates = [
+                q
+                for q in ctx.captured_queries
+                if "COUNT(" in q["sql"] or "MAX(" in q["sql"]
+            ]
+            self.assertEqual(aggregates, [])
+
+    def test_keyset_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get("/tasks/?pagination=cursor&cursor=bogus")
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_pagination_is_default(self):
+        """Test that page number pagination is still used by default"""
+        response = self.client.get("/tasks/", format="json")
+        self.assertEqual(response.data["count"], 25)
+
+
+class TestTaskCachedCount(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        Task.objects.bulk_create(
+            [
+                Task(owner=self.user, title=f"Task {i}", completed=i % 3 == 0)
+                for i in range(25)
+            ]
+        )
+
+    def tearDown(self):
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def get_counted(self, params=None):
+        """Return the list response and the number of COUNT queries it ran"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/tasks/", params, format="json")
+        counts = [q for q in ctx.captured_queries if "COUNT(" in q["sql"]]
+        return response, len(counts)
+
+    def test_count_is_cached_per_filter(self):
+        """Test that each filter is counted once, then served from the cache"""
+        for params, expected in ((None, 25), ({"completed": "true"}, 9)):
+            response, queries = self.get_counted(params)
+            self.assertEqual((response.data["count"], queries), (expected, 1))
+            response, queries = self.get_counted(params)
+            self.assertEqual((response.data["count"], queries), (expected, 0))
+
+    def test_count_follows_writes(self):
+        """Test that creates, updates and deletes keep the cached counts right"""
+        self.get_counted()
+        self.get_counted({"completed": "true"})
+        self.get_counted({"completed": "false"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/tasks/", {"title": "New"}, format="json")
+        task = Task.objects.filter(owner=self.user, completed=False).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/tasks/{task.id}/",
+                {"title": "Done", "completed": True},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        task = Task.objects.filter(owner=self.user, completed=True).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/tasks/{task.id}/")
+
+        for params, completed in ((None, None), ({"completed": "true"}, True)):
+            response, queries = self.get_counted(params)
+            expected = Task.objects.filter(owner=self.user)
+            if completed is not None:
+                expected = expected.filter(completed=completed)
+            self.assertEqual(queries, 0)
+            self.assertEqual(response.data["count"], expected.count())
+
+    def test_bulk_writes_invalidate_count(self):
+        """Test that bulk writes, which send no signals, drop the cached count"""
+        self.get_counted()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/tasks/bulk/", [{"title": "Bulk"}], format="json")
+        response, queries = self.get_counted()
+        self.assertEqual((response.data["count"], queries), (26, 1))
+
+    def test_count_changed_while_counted_is_dropped(self):
+        """Test that a count missing a write made while it was counted is dropped"""
+        add = cache.add
+        key = count_key(self.user.id)
+        written = []
+
+        def add_after_write(*args, **kwargs):
+            if args[0] == key and not written:
+                written.append(True)
+                # The key is missing, the adjustment of the write is dropped
+                with self.captureOnCommitCallbacks(execute=True):
+                    Task.objects.create(owner=self.user, title="Concurrent")
+            return add(*args, **kwargs)
+
+        with mock.patch.object(cache, "add", side_effect=add_after_write):
+            response, queries = self.get_counted()
+        # Dropped, then counted again by the paginator
+        self.assertEqual((response.data["count"], queries), (26, 2))
+
+        response, queries = self.get_counted()
+        self.assertEqual((response.data["count"], queries), (26, 0))
+
+    def test_count_can_be_skipped(self):
+        """Test that ?count=false pages without counting"""
+        response, queries = self.get_counted({"count": "false"})
+        self.assertEqual(queries, 0)
+        self.assertIsNone(response.data["count"])
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertIsNone(response.data["previous"])
+        self.assertIn("page=2", response.data["next"])
+
+        response = self.client.get("/tasks/", {"count": "false", "page": 3})
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertIsNone(response.data["next"])
+        self.assertIn("page=2", response.data["previous"])
+
+        response = self.client.get("/tasks/", {"count": "false", "page": 4})
+        self.assertEqual(response.status_code, 404)
+
+    def test_uncounted_list_is_conditional(self):
+        """Test that ?count=false lists get a 304 until a task of the page changes"""
+        response, _ = self.get_counted({"count": "false"})
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                "/tasks/", {"count": "false"}, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in ctx.captured_queries if "COUNT(" in q["sql"]])
+
+        task = Task.objects.filter(owner=self.user).order_by("created_at").first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/tasks/{task.id}/")
+        response = self.client.get(
+            "/tasks/", {"count": "false"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class TestTaskConditionalGet(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tasks = [
+            Task.objects.create(owner=self.user, title=f"Task {i}") for i in range(3)
+        ]
+
+    def tearDown(self):
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def test_detail_not_modified(self):
+        """Test that an unchanged task gets a 304 until it is updated"""
+        url = f"/tasks/{self.tasks[0].id}/"
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn("Last-Modified", response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                url, {"title": "Done", "completed": True}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_detail_if_modified_since(self):
+        """Test that If-Modified-Since is honoured without an ETag"""
+        url = f"/tasks/{self.tasks[0].id}/"
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(TASKS_RESPONSE_CACHE_TIMEOUT=0)
+    def test_list_not_modified(self):
+        """Test that an unchanged list gets a 304 from one aggregate query"""
+        etag = self.client.get("/tasks/")["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn("MAX(", ctx.captured_queries[0]["sql"])
+
+    def test_list_changes_on_writes(self):
+        """Test that creating or deleting any task changes the list ETag"""
+        etag = self.client.get("/tasks/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/tasks/{self.tasks[0].id}/")
+        response = self.client.get("/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/tasks/", {"title": "New"}, format="json")
+        response = self.client.get("/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_has_no_last_modified(self):
+        """Test that a list is not answered from If-Modified-Since after a delete"""
+        response = self.client.get("/tasks/")
+        self.assertNotIn("Last-Modified", response)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/tasks/{self.tasks[0].id}/")
+        response = self.client.get(
+            "/tasks/", HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+
+    def test_list_etag_varies(self):
+        """Test that the list ETag differs per query and per user"""
+        etag = self.client.get("/tasks/")["ETag"]
+        response = self.client.get("/tasks/", {"completed": "false"})
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("Authorization", response["Vary"])
+
+        other = User.objects.create_user(username="otheruser", password="password")
+        self.client.force_authenticate(user=other)
+        response = self.client.get("/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class TestTaskSync(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tasks = [
+            Task.objects.create(owner=self.user, title=f"Task {i}") for i in range(5)
+        ]
+
+    def tearDown(self):
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def sync(self, watermark=None, overlap=timedelta(0)):
+        """Sync, by default without syncing recent changes again."""
+        params = {"since": watermark} if watermark else {}
+        with mock.patch("tasks.sync.SYNC_OVERLAP", overlap):
+            return self.client.get("/tasks/sync/", params)
+
+    def test_sync_changes_since_watermark(self):
+        """Test that a sync returns what changed since the previous one"""
+        response = self.sync()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [task["id"] for task in response.data["changed"]],
+            [task.id for task in self.tasks],
+        )
+        self.assertEqual(response.data["deleted"], [])
+        self.assertFalse(response.data["has_more"])
+        watermark = response.data["watermark"]
+
+        self.client.put(
+            f"/tasks/{self.tasks[1].id}/", {"title": "Renamed"}, format="json"
+        )
+        self.client.delete(f"/tasks/{self.tasks[2].id}/")
+        created = self.client.post("/tasks/", {"title": "New"}, format="json")
+
+        response = self.sync(watermark)
+        self.assertEqual(
+            [task["id"] for task in response.data["changed"]],
+            [self.tasks[1].id, created.data["id"]],
+        )
+        self.assertEqual(response.data["changed"][0]["title"], "Renamed")
+        self.assertEqual(response.data["deleted"], [self.tasks[2].id])
+
+        response = self.sync(response.data["watermark"])
+        self.assertEqual((response.data["changed"], response.data["deleted"]), ([], []))
+
+    @override_settings(TASKS_SYNC_PAGE_SIZE=2)
+    def test_sync_pages(self):
+        """Test that has_more pages through every change exactly once"""
+        watermark = self.sync().data["watermark"]
+        for task in self.tasks:
+            task.save()
+        self.client.delete("/tasks/bulk/", {"ids": [self.tasks[0].id]}, format="json")
+
+        changed, deleted, has_more = [], [], True
+        while has_more:
+            data = self.sync(watermark).data
+            changed += [task["id"] for task in data["changed"]]
+            deleted += data["deleted"]
+            watermark, has_more = data["watermark"], data["has_more"]
+        self.assertEqual(changed, [task.id for task in self.tasks[1:]])
+        self.assertEqual(deleted, [self.tasks[0].id])
+
+    def test_sync_returns_recent_changes_again(self):
+        """Test that changes within the overlap window are synced again"""
+        response = self.sync(overlap=SYNC_OVERLAP)
+        self.client.delete(f"/tasks/{self.tasks[0].id}/")
+
+        response = self.sync(response.data["watermark"], overlap=SYNC_OVERLAP)
+        self.assertEqual(
+            [task["id"] for task in response.data["changed"]],
+            [task.id for task in self.tasks[1:]],
+        )
+        self.assertEqual(response.data["deleted"], [self.tasks[0].id])
+
+    def test_sync_late_commit(self):
+        """Test that a change committed after a later one is still synced"""
+        watermark = self.sync(overlap=SYNC_OVERLAP).data["watermark"]
+        # Timestamped before the last synced task, committed after the sync
+        late = Task.objects.create(owner=self.user, title="Late")
+        Task.objects.filter(id=late.id).update(
+            updated_at=self.tasks[-1].updated_at - timedelta(seconds=1)
+        )
+
+        response = self.sync(watermark, overlap=SYNC_OVERLAP)
+        self.assertIn(late.id, [task["id"] for task in response.data["changed"]])
+
+    def test_sync_scoped_to_owner(self):
+        """Test that other users' changes and deletions are not synced"""
+        watermark = self.sync().data["watermark"]
+        other = User.objects.create_user(username="otheruser", password="password")
+        Task.objects.create(owner=other, title="Other").delete()
+
+        response = self.sync(watermark)
+        self.assertEqual((response.data["changed"], response.data["deleted"]), ([], []))
+
+    def test_sync_invalid_watermark(self):
+        """Test that a malformed watermark is rejected"""
+        response = self.sync("not-a-watermark")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("since", response.data)
+
+    def test_sync_expired_watermark(self):
+        """Test that a watermark older than the tombstone retention gets a 410"""
+        watermark = self.sync().data["watermark"]
+        with override_settings(TASKS_SYNC_TOMBSTONE_RETENTION_DAYS=0):
+            response = self.sync(watermark)
+        self.assertEqual(response.status_code, 410)
+
+    def test_prune_task_tombstones(self):
+        """Test that only tombstones older than the retention are pruned"""
+        old_id, recent_id = self.tasks[0].id, self.tasks[1].id
+        self.tasks[0].delete()
+        self.tasks[1].delete()
+        TaskTombstone.objects.filter(task_id=old_id).update(
+            deleted_at=timezone.now() - timedelta(days=31)
+        )
+        out = StringIO()
+        call_command("prune_task_tombstones", "--batch-size", "1", stdout=out)
+        self.assertIn("Pruned 1 task tombstones.", out.getvalue())
+        self.assertEqual(
+            list(TaskTombstone.objects.values_list("task_id", flat=True)), [recent_id]
+        )
+
+
+class TestTaskResponseCache(TestCase):
+    def setUp(self):
+        # The response cache is only used with a cache shared by the workers
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared_cache = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": directory.name,
+                }
+            }
+        )
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.open_task = Task.objects.create(owner=self.user, title="Open")
+        self.done_task = Task.objects.create(
+            owner=self.user, title="Done", completed=True
+        )
+
+    def tearDown(self):
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def get(self, url, params=None):
+        """Return the response and how the response cache served it"""
+        before = response_cache.stats()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        after = response_cache.stats()
+        served = [name for name in after if after[name] != before[name]]
+        return response, served, len(ctx.captured_queries)
+
+    def test_repeated_request_is_served_from_cache(self):
+        """Test that an identical request is answered without queries"""
+        first, served, _ = self.get("/tasks/", {"completed": "false"})
+        self.assertEqual(served, ["misses"])
+        second, served, queries = self.get("/tasks/", {"completed": "false"})
+        self.assertEqual((served, queries), (["hits"], 0))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_writes_invalidate_only_their_scopes(self):
+        """Test that a change makes only the responses it affects stale"""
+        for params in (None, {"completed": "true"}, {"completed": "false"}):
+            self.get("/tasks/", params)
+        self.get(f"/tasks/{self.done_task.id}/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                f"/tasks/{self.open_task.id}/", {"title": "Renamed"}, format="json"
+            )
+
+        response, served, _ = self.get("/tasks/", {"completed": "false"})
+        self.assertEqual(served, ["stale"])
+        self.assertEqual(response.data["results"][0]["title"], "Renamed")
+        self.assertEqual(self.get("/tasks/")[1], ["stale"])
+        self.assertEqual(self.get("/tasks/", {"completed": "true"})[1], ["hits"])
+        self.assertEqual(self.get(f"/tasks/{self.done_task.id}/")[1], ["hits"])
+
+    def test_completed_change_invalidates_both_filters(self):
+        """Test that moving a task between filters refreshes both lists"""
+        self.get("/tasks/", {"completed": "true"})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                "/tasks/bulk/",
+                [{"id": self.open_task.id, "title": "Open", "completed": True}],
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        response, served, _ = self.get("/tasks/", {"completed": "true"})
+        self.assertEqual(served, ["stale"])
+        self.assertEqual(response.data["count"], 2)
+
+    def test_cache_is_per_user(self):
+        """Test that users never get each other's cached responses"""
+        self.get("/tasks/")
+        other = User.objects.create_user(username="otheruser", password="password")
+        self.client.force_authenticate(user=other)
+        response, served, _ = self.get("/tasks/")
+        self.assertEqual(served, ["misses"])
+        self.assertEqual(response.data["count"], 0)
+
+    @override_settings(TASKS_RESPONSE_CACHE_TIMEOUT=0)
+    def test_cache_can_be_disabled(self):
+        """Test that a zero timeout turns the response cache off"""
+        self.get("/tasks/")
+        response, served, queries = self.get("/tasks/")
+        self.assertEqual(served, [])
+        self.assertGreater(queries, 0)
+
+    def test_cache_needs_shared_cache(self):
+        """Test that a per process cache turns the response cache off"""
+        with override_settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+            }
+        ):
+            self.get("/tasks/")
+            response, served, queries = self.get("/tasks/")
+        self.assertEqual(served, [])
+        self.assertGreater(queries, 0)
+
+
+class TestTaskSearch(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.in_description = Task.objects.create(
+            owner=self.user,
+            title="Call the bank",
+            description="Ask about the invoice for the garden",
+        )
+        self.in_title = Task.objects.create(
+            owner=self.user, title="Pay garden invoice", completed=True
+        )
+        self.unrelated = Task.objects.create(
+            owner=self.user, title="Walk the dog", description="Before dinner"
+        )
+
+    def tearDown(self):
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def search(self, text, **params):
+        response = self.client.get("/tasks/", {"search": text, **params})
+        self.assertEqual(response.status_code, 200)
+        return [task["id"] for task in response.data["results"]]
+
+    def test_search_ranks_title_matches_first(self):
+        """Test that matches in the title rank above description matches"""
+        self.assertEqual(
+            self.search("garden invoice"), [self.in_title.id, self.in_description.id]
+        )
+
+    def test_search_matches_all_words(self):
+        """Test that a task must contain every searched word"""
+        self.assertEqual(self.search("bank invoice"), [self.in_description.id])
+        self.assertEqual(self.search("bank dog"), [])
+
+    def test_search_stems_words(self):
+        """Test that searching matches other forms of a word"""
+        self.assertEqual(self.search("walking"), [self.unrelated.id])
+
+    def test_search_follows_changes(self):
+        """Test that the index follows created, updated and deleted tasks"""
+        created = Task.objects.create(owner=self.user, title="Water the garden")
+        self.in_title.title = "Pay rent"
+        self.in_title.save()
+        unrelated_id = self.unrelated.id
+        self.unrelated.delete()
+
+        self.assertEqual(self.search("garden"), [created.id, self.in_description.id])
+        self.assertEqual(self.search("rent"), [self.in_title.id])
+        self.assertEqual(self.search("dog"), [])
+        self.assertNotIn(unrelated_id, self.search("dinner"))
+
+    def test_search_combined_with_filters(self):
+        """Test that search applies along with the completed filter"""
+        self.assertEqual(self.search("invoice", completed="true"), [self.in_title.id])
+        response = self.client.get(
+            "/tasks/", {"search": "invoice", "completed": "false"}
+        )
+        self.assertEqual(response.data["count"], 1)
+
+    def test_search_scoped_to_owner(self):
+        """Test that other users' tasks are never found"""
+        other = User.objects.create_user(username="other", password="testpassword")
+        Task.objects.create(owner=other, title="Garden party")
+
+        self.assertEqual(
+            self.search("garden"), [self.in_title.id, self.in_description.id]
+        )
+
+    def test_search_query_syntax_is_ignored(self):
+        """Test that FTS operators in the search text are matched as words"""
+        self.assertEqual(self.search('"garden" (pay*'), [self.in_title.id])
+        self.assertEqual(self.search("NOT"), [])
+        self.assertEqual(self.search("-:*"), [])
+
+
+class TestExplainTaskQueries(TestCase):
+    def test_task_queries_use_indexes(self):
+        """Test that no ViewSet query needs a full scan or a filesort"""
+        out = StringIO()
+        call_command("explain_task_queries", "--fail-on-issues", stdout=out)
+        self.assertIn("list [completed=true]: ok", out.getvalue())
+        self.assertIn("search: ok", out.getvalue())
+
+
+class TestTaskBulkAPI(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def test_bulk_create(self):
+        """Test creating a batch of tasks with a single insert"""
+        payload = [{"title": f"Bulk Task {i}", "completed": i == 0} for i in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/tasks/bulk/", payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 5)
+        self.assertTrue(all(task["id"] for task in response.data))
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Task.objects.count(), 5)
+        self.assertTrue(Task.objects.get(title="Bulk Task 0").completed)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """Test that invalid items are reported and nothing is created"""
+        payload = [{"title": "Valid"}, {"description": "No title"}]
+        response = self.client.post("/tasks/bulk/", payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("title", response.data[1])
+        self.assertEqual(Task.objects.count(), 0)
+
+    @override_settings(TASKS_BULK_MAX_ITEMS=2)
+    def test_bulk_create_limit(self):
+        """Test that batches larger than the limit are rejected"""
+        payload = [{"title": f"Bulk Task {i}"} for i in range(3)]
+        response = self.client.post("/tasks/bulk/", payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.count(), 0)
+
+    def test_bulk_update(self):
+        """Test updating a batch of tasks"""
+        first = Task.objects.create(owner=self.user, title="First")
+        second = Task.objects.create(owner=self.user, title="Second")
+        payload = [
+            {"id": first.id, "title": "First", "completed": True},
+            {"id": second.id, "title": "Second updated"},
+        ]
+        response = self.client.patch("/tasks/bulk/", payload, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.completed)
+        self.assertEqual(second.title, "Second updated")
+        self.assertGreater(first.updated_at, first.created_at)
+
+    @override_settings(TASKS_BULK_MAX_ITEMS=2)
+    def test_bulk_update_limit(self):
+        """Test that batches larger than the limit are rejected before loading"""
+        tasks = [
+            Task.objects.create(owner=self.user, title=f"Task {i}") for i in range(3)
+        ]
+        payload = [{"id": task.id, "title": "Renamed"} for task in tasks]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch("/tasks/bulk/", payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse([q for q in ctx.captured_queries if "tasks_task" in q["sql"]])
+
+    def test_bulk_update_unknown_id(self):
+        """Test that unknown ids are reported per item"""
+        task = Task.objects.create(owner=self.user, title="Task")
+        payload = [{"id": task.id, "title": "Renamed"}, {"id": 999, "title": "X"}]
+        response = self.client.patch("/tasks/bulk/", payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("id", response.data[1])
+        task.refresh_from_db()
+        self.assertEqual(task.title, "Task")
+
+    def test_bulk_delete(self):
+        """Test deleting a batch of tasks by id"""
+        tasks = [
+            Task.objects.create(owner=self.user, title=f"Task {i}") for i in range(3)
+        ]
+        self.assertEqual(self.client.get("/tasks/").data["count"], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                "/tasks/bulk/", {"ids": [tasks[0].id, tasks[1].id, 999]}, format="json"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"deleted": 2, "not_found": [999]})
+        self.assertEqual(list(Task.objects.all()), [tasks[2]])
+        # The cached count and response are dropped
+        self.assertEqual(self.client.get("/tasks/").data["count"], 1)
+        self.assertEqual(
+            sorted(TaskTombstone.objects.values_list("task_id", "owner_id")),
+            [(tasks[0].id, self.user.id), (tasks[1].id, self.user.id)],
+        )
+
+    def test_bulk_delete_runs_constant_queries(self):
+        """Test that the tombstones of a bulk delete are inserted at once"""
+        ids = [
+            task.id
+            for task in Task.objects.bulk_create(
+                Task(owner=self.user, title=f"Task {i}") for i in range(20)
+            )
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.delete("/tasks/bulk/", {"ids": ids}, format="json")
+
+        self.assertEqual(response.data["deleted"], 20)
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        deletes = [q for q in ctx.captured_queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(TaskTombstone.objects.count(), 20)
+
+    def test_owner_delete_leaves_no_tombstones(self):
+        """Test that tasks deleted along with their owner get no tombstones"""
+        Task.objects.create(owner=self.user, title="Task")
+        self.user.delete()
+
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(TaskTombstone.objects.exists())
+
+
+class TestTaskExportAPI(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        Task.objects.create(
+            owner=self.user, title="Open Task", description="Not done yet"
+        )
+        Task.objects.create(owner=self.user, title="Done Task", completed=True)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    @override_settings(TASKS_EXPORT_CHUNK_SIZE=1)
+    def test_export_ndjson(self):
+        """Test that the export streams one JSON object per line"""
+        response = self.client.get("/tasks/export/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+
+        listed = self.client.get("/tasks/", format="json").json()["results"]
+        self.assertEqual(rows, listed)
+
+    def test_export_csv(self):
+        """Test that the export can be requested as CSV"""
+        response = self.client.get("/tasks/export/", HTTP_ACCEPT="text/csv")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(
+            csv.reader(b"".join(response.streaming_content).decode().splitlines())
+        )
+        self.assertEqual(rows[0], list(TASK_READ_FIELDS))
+        self.assertEqual([row[1] for row in rows[1:]], ["Open Task", "Done Task"])
+
+    def test_export_with_filter(self):
+        """Test that the export applies the completed filter"""
+        response = self.client.get("/tasks/export/?format=csv&completed=true")
+
+        rows = list(
+            csv.reader(b"".join(response.streaming_content).decode().splitlines())
+        )
+        self.assertEqual([row[1] for row in rows[1:]], ["Done Task"])
+
+    def test_export_requires_authentication(self):
+        """Test that anonymous clients get a JSON error"""
+        self.client.force_authenticate(user=None)
+        response = self.client.get("/tasks/export/")
+
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("detail", json.loads(response.content))
+
+
+class TestTaskReadPath(TestCase):
+    page_sizes = (10, 100, 1000)
+
+    def setUp(self):
+        Task.objects.bulk_create(
+            Task(
+                title=f"Task {i}   é",
+                description=None if i % 3 == 0 else f"Description {i}",
+                completed=i % 2 == 0,
+            )
+            for i in range(max(self.page_sizes))
+        )
+
+    def render_serializer(self, size):
+        tasks = Task.objects.all()[:size]
+        return JSONRenderer().render(TaskSerializer(tasks, many=True).data)
+
+    def render_rows(self, size):
+        rows = Task.objects.values(*TASK_READ_FIELDS)[:size]
+        return JSONRenderer().render(serialize_task_rows(rows))
+
+    def test_read_fields_match_serializer(self):
+        """Test that the read path outputs the serializer's fields in order"""
+        self.assertEqual(TASK_READ_FIELDS, tuple(TaskSerializer().fields))
+
+    def test_read_path_output_is_identical(self):
+        """Test that both read paths produce byte-identical JSON"""
+        for size in self.page_sizes:
+            with self.subTest(size=size):
+                self.assertEqual(self.render_rows(size), self.render_serializer(size))
+
+    def test_read_path_output_is_identical_in_other_timezone(self):
+        """Test that datetimes are converted to the active timezone"""
+        with timezone.override("Asia/Kolkata"):
+            self.assertEqual(self.render_rows(10), self.render_serializer(10))
+
+    def test_read_path_benchmark(self):
+        """Benchmark both read paths at several page sizes"""
+        for size in self.page_sizes:
+            number = max(1, 1000 // size)
+            serializer_time = min(
+                timeit.repeat(
+                    lambda: self.render_serializer(size), number=number, repeat=3
+                )
+            )
+            rows_time = min(
+                timeit.repeat(lambda: self.render_rows(size), number=number, repeat=3)
+            )
+            print(
+                f"\ntask read path, page size {size}: "
+                f"serializer {serializer_time / number * 1000:.2f} ms, "
+                f"values() rows {rows_time / number * 1000:.2f} ms"
+            )
+            if size == max(self.page_sizes):
+                self.assertLess(rows_time, serializer_time)
+
+
+class TestAsyncTaskAPI(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        access = RefreshToken.for_user(self.user).access_token
+        self.auth = {"Authorization": f"Bearer {access}"}
+        self.task = Task.objects.create(
+            owner=self.user, title="Async Task", description="Served by an async view"
+        )
+
+    async def test_async_list_matches_sync_list(self):
+        """Test that the async list returns the same JSON as the sync list"""
+        await Task.objects.acreate(
+            owner=self.user, title="Another Task", completed=True
+        )
+        response = await self.async_client.get("/async/tasks/", headers=self.auth)
+        sync_response = await sync_to_async(self.client.get)(
+            "/tasks/", headers=self.auth
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, sync_response.content)
+
+    async def test_async_list_filter_and_pages(self):
+        """Test filtering and page links of the async list"""
+        for i in range(12):
+            await Task.objects.acreate(
+                owner=self.user, title=f"Done {i}", completed=True
+            )
+        response = await self.async_client.get(
+            "/async/tasks/", {"completed": "true"}, headers=self.auth
+        )
+        data = response.json()
+        self.assertEqual(data["count"], 12)
+        self.assertEqual(len(data["results"]), 10)
+        self.assertIsNone(data["previous"])
+
+        response = await self.async_client.get(data["next"], headers=self.auth)
+        data = response.json()
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIsNone(data["next"])
+        self.assertIn("completed=true", data["previous"])
+
+        response = await self.async_client.get(
+            "/async/tasks/?page=9", headers=self.auth
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_retrieve(self):
+        """Test retrieving a task through the async view"""
+        response = await self.async_client.get(
+            f"/async/tasks/{self.task.id}/", headers=self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "Async Task")
+
+        response = await self.async_client.get("/async/tasks/999/", headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["detail"], "No Task matches the given query.")
+
+    async def test_async_create(self):
+        """Test creating a task through the async view"""
+        response = await self.async_client.post(
+            "/async/tasks/",
+            {"title": "Created Async", "completed": True},
+            content_type="application/json",
+            headers=self.auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Task.objects.filter(title="Created Async").aexists())
+
+        response = await self.async_client.post(
+            "/async/tasks/",
+            {"description": "No title"},
+            content_type="application/json",
+            headers=self.auth,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("title", response.json())
+
+    async def test_async_update_and_delete(self):
+        """Test updating and deleting a task through the async views"""
+        url = f"/async/tasks/{self.task.id}/"
+        response = await self.async_client.patch(
+            url,
+            {"title": "Renamed", "completed": True},
+            content_type="application/json",
+            headers=self.auth,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "Renamed")
+
+        response = await self.async_client.delete(url, headers=self.auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(await Task.objects.filter(id=self.task.id).aexists())
+
+    async def test_async_requires_authentication(self):
+        """Test that anonymous clients get a 401"""
+        response = await self.async_client.get("/async/tasks/")
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
+
+    async def test_async_scoped_to_owner(self):
+        """Test that the async views only serve the user's own tasks"""
+        other = await User.objects.acreate(username="otheruser")
+        task = await Task.objects.acreate(owner=other, title="Other Task")
+
+        response = await self.async_client.get("/async/tasks/", headers=self.auth)
+        self.assertEqual(response.json()["count"], 1)
+        response = await self.async_client.get(
+            f"/async/tasks/{task.id}/", headers=self.auth
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TestLoadTasks(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.fixture_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.fixture_dir.cleanup)
+
+    def load(self, *args):
+        stdout = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("load_tasks", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def write_jsonl_gz(self, objects):
+        path = Path(self.fixture_dir.name) / "fixture.jsonl.gz"
+        with gzip.open(path, "wt") as file:
+            for item in objects:
+                file.write(json.dumps(item) + "\n")
+        return path
+
+    def test_load_json_fixture(self):
+        """Test that db.json loads like loaddata, keeping its timestamps"""
+        output = self.load(str(settings.BASE_DIR / "db.json"))
+
+        self.assertIn("20 tasks.Task", output)
+        self.assertEqual(Task.objects.count(), 20)
+        task = Task.objects.get(pk=1)
+        self.assertEqual(task.owner.username, "user")
+        self.assertEqual(
+            task.created_at.isoformat(), "2025-06-28T14:01:26.385000+00:00"
+        )
+        self.assertEqual(User.objects.get(username="user").user_permissions.count(), 4)
+        # Indexed for search once the load ends
+        self.assertEqual(
+            Task.objects.filter(search_index__document__match="15").count(), 1
+        )
+
+    def test_reload_replaces_rows(self):
+        """Test that objects with a primary key replace the existing rows"""
+        fixture = str(settings.BASE_DIR / "db.json")
+        self.load(fixture)
+        Task.objects.filter(pk=1).update(title="Changed")
+
+        self.load(fixture)
+
+        self.assertEqual(Task.objects.count(), 20)
+        self.assertEqual(Task.objects.get(pk=1).title, "Task 1")
+
+    def test_load_json_lines(self):
+        """Test a compressed JSON Lines fixture with plain-text passwords"""
+        users = [
+            {
+                "model": "auth.user",
+                "pk": 100 + n,
+                "fields": {"username": f"loaded-{n}", "password": "same-secret"},
+            }
+            for n in range(3)
+        ]
+        tasks = [
+            {"model": "tasks.task", "fields": {"owner": 100 + n % 3, "title": f"T{n}"}}
+            for n in range(10)
+        ]
+        path = self.write_jsonl_gz(users + tasks)
+
+        with mock.patch("tasks.loading.make_password", wraps=make_password) as hashed:
+            self.load(
+                str(path), "--chunk-size=4", "--batch-size=3", "--plain-passwords"
+            )
+
+        self.assertEqual(hashed.call_count, 1)
+        user = User.objects.get(username="loaded-1")
+        self.assertTrue(user.check_password("same-secret"))
+        self.assertEqual(
+            Task.objects.filter(owner__username__startswith="loaded").count(), 10
+        )
+        task = Task.objects.get(title="T4")
+        self.assertEqual(task.owner_id, 101)
+        self.assertFalse(task.completed)
+        self.assertIsNotNone(task.created_at)
+
+    def test_hashed_passwords_are_kept(self):
+        """Test that passwords are loaded as they are without --plain-passwords"""
+        passwords = ["md5$salt$5f4dcc3b5aa765d61d8327deb882cf99", "bcrypt$$2b$12$abc"]
+        path = self.write_jsonl_gz(
+            [
+                {
+                    "model": "auth.user",
+                    "pk": 100 + n,
+                    "fields": {"username": f"hashed-{n}", "password": password},
+                }
+                for n, password in enumerate(passwords)
+            ]
+        )
+
+        self.load(str(path))
+
+        self.assertEqual(
+            list(
+                User.objects.filter(username__startswith="hashed")
+                .order_by("pk")
+                .values_list("password", flat=True)
+            ),
+            passwords,
+        )
+
+    def test_load_invalidates_cached_counts(self):
+        """Test that the cached counts of the owners of loaded tasks are dropped"""
+        user = User.objects.create_user(username="owner", password="x")
+        cache.set(count_key(user.id), 5)
+        path = self.write_jsonl_gz(
+            [{"model": "tasks.task", "fields": {"owner": user.id, "title": "New"}}]
+        )
+
+        self.load(str(path))
+
+        self.assertIsNone(cache.get(count_key(user.id)))
+
+    def test_malformed_fixture(self):
+        """Test that a malformed fixture fails with a command error"""
+        path = Path(self.fixture_dir.name) / "broken.json"
+        path.write_text('[{"model": "tasks.task", "fields": {"title": "A"}} {}]')
+
+        with self.assertRaisesMessage(CommandError, "Expected ',' or ']'"):
+            self.load(str(path))
+
+    def test_iter_json_array(self):
+        """Test that arrays are parsed the same whatever the block size"""
+        text = json.dumps([{"title": "a]b,c", "n": n} for n in range(20)], indent=1)
+        for read_size in (1, 2, 7, 1000):
+            self.assertEqual(
+                list(iter_json_array(StringIO(text), read_size)), json.loads(text)
+            )
+        self.assertEqual(list(iter_json_array(StringIO(" [ ] "))), [])
+
+    def test_generate(self):
+        """Test that --generate seeds users and made-up tasks"""
+        self.load("--generate=300", "--users=4", "--days=30", "--seed=1")
+
+        self.assertEqual(User.objects.filter(username__startswith="seed-").count(), 4)
+        tasks = Task.objects.filter(owner__username__startswith="seed-")
+        self.assertEqual(tasks.count(), 300)
+        self.assertTrue(tasks.filter(completed=True).exists())
+        self.assertTrue(tasks.filter(completed=False).exists())
+        oldest = tasks.order_by("created_at").first().created_at
+        self.assertGreater(oldest, timezone.now() - timedelta(days=31))
+        self.assertTrue(
+            User.objects.get(username="seed-0").check_password("pa$$word4u")
+        )
+
+
+class TestArchiveTasks(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.old_done = [
+            Task.objects.create(
+                owner=self.user, title=f"Old report {i}", completed=True
+            )
+            for i in range(3)
+        ]
+        self.old_open = Task.objects.create(owner=self.user, title="Old open task")
+        self.recent_done = Task.objects.create(
+            owner=self.user, title="Recent task", completed=True
+        )
+        long_ago = timezone.now() - timedelta(
+            days=settings.TASKS_ARCHIVE_AFTER_DAYS + 1
+        )
+        Task.objects.filter(
+            pk__in=[task.pk for task in [*self.old_done, self.old_open]]
+        ).update(updated_at=long_ago)
+
+    def tearDown(self):
+        self.client.force_authenticate(user=None)
+        return super().tearDown()
+
+    def archive(self, *args):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("archive_tasks", *args, stdout=out)
+        return out.getvalue()
+
+    def ids(self, response):
+        return [task["id"] for task in response.json()["results"]]
+
+    def test_archive_command(self):
+        """Test that old completed tasks are moved in batches, unchanged"""
+        before = Task.objects.values(*TASK_READ_FIELDS).get(pk=self.old_done[0].pk)
+
+        output = self.archive("--batch-size", "2")
+
+        self.assertIn("Archived 3 tasks", output)
+        old_done_ids = [task.pk for task in self.old_done]
+        self.assertEqual(
+            list(ArchivedTask.objects.values_list("id", flat=True)), old_done_ids
+        )
+        self.assertEqual(
+            ArchivedTask.objects.values(*TASK_READ_FIELDS).get(pk=before["id"]),
+            before,
+        )
+        self.assertEqual(
+            set(Task.objects.values_list("id", flat=True)),
+            {self.old_open.pk, self.recent_done.pk},
+        )
+        # Gone from the live tasks for syncing clients
+        self.assertEqual(
+            sorted(TaskTombstone.objects.values_list("task_id", flat=True)),
+            old_done_ids,
+        )
+        self.assertIn("Archived 0 tasks", self.archive())
+
+    def test_archive_days(self):
+        """Test that --days sets the age of the archived tasks"""
+        self.archive("--days", "0")
+
+        self.assertEqual(ArchivedTask.objects.count(), 4)
+        self.assertEqual(Task.objects.get().pk, self.old_open.pk)
+
+    def test_list(self):
+        """Test that lists only include archived tasks when asked to"""
+        # Cached count and responses, updated by the archiving
+        self.assertEqual(self.client.get("/tasks/").json()["count"], 5)
+        self.client.get("/tasks/", {"completed": "true"})
+        self.archive()
+
+        response = self.client.get("/tasks/")
+        self.assertEqual(response.json()["count"], 2)
+        self.assertEqual(self.ids(response), [self.old_open.pk, self.recent_done.pk])
+        response = self.client.get("/tasks/", {"completed": "true"})
+        self.assertEqual(self.ids(response), [self.recent_done.pk])
+        self.assertEqual(cache.get(count_key(self.user.id)), 2)
+
+        response = self.client.get("/tasks/", {"include_archived": "true"})
+        self.assertEqual(response.json()["count"], 5)
+        self.assertEqual(
+            self.ids(response),
+            [
+                *(task.pk for task in self.old_done),
+                self.old_open.pk,
+                self.recent_done.pk,
+            ],
+        )
+        response = self.client.get(
+            "/tasks/", {"include_archived": "true", "completed": "true"}
+        )
+        self.assertEqual(len(self.ids(response)), 4)
+        response = self.client.get(
+            "/tasks/", {"include_archived": "true", "pagination": "cursor"}
+        )
+        self.assertEqual(len(self.ids(response)), 5)
+        response = self.client.get(
+            "/tasks/", {"include_archived": "true", "search": "report"}
+        )
+        self.assertEqual(self.ids(response), [task.pk for task in self.old_done])
+
+    def test_detail(self):
+        """Test that archived tasks can be read when asked for, not changed"""
+        self.archive()
+        url = f"/tasks/{self.old_done[0].pk}/"
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(url, {"include_archived": "true"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "Old report 0")
+        response = self.client.patch(
+            f"{url}?include_archived=true", {"title": "Changed"}, format="json"
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_export(self):
+        """Test that the export includes archived tasks when asked to"""
+        self.archive()
+
+        response = self.client.get("/tasks/export/", {"include_archived": "true"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+
+    def test_other_users_archived_tasks(self):
+        """Test that users never see the archived tasks of others"""
+        self.archive()
+        other = User.objects.create_user(username="other", password="testpassword")
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get("/tasks/", {"include_archived": "true"})
+        self.assertEqual(response.json()["count"], 0)
+        response = self.client.get(
+            f"/tasks/{self.old_done[0].pk}/", {"include_archived": "true"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_list(self):
+        """Test that the async views include archived tasks when asked to"""
+        await sync_to_async(self.archive)()
+        token = await sync_to_async(RefreshToken.for_user)(self.user)
+        headers = {"Authorization": f"Bearer {token.access_token}"}
+
+        response = await self.async_client.get("/async/tasks/", headers=headers)
+        self.assertEqual(response.json()["count"], 2)
+        response = await self.async_client.get(
+            "/async/tasks/", {"include_archived": "true"}, headers=headers
+        )
+        self.assertEqual(response.json()["count"], 5)
+        response = await self.async_client.get(
+            f"/async/tasks/{self.old_done[0].pk}/",
+            {"include_archived": "true"},
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 200)
@@ -1,5 +1,7 @@
+from django.urls import path
 from rest_framework import routers
 
+from tasks.async_views import AsyncTaskDetailView, AsyncTaskListView
 from tasks.views import TaskViewSet
 
 # Create a router and register the TaskViewSet with it
@@ -8,4 +10,12 @@ from tasks.views import TaskViewSet
 router = routers.DefaultRouter()
 router.register(r"tasks", TaskViewSet)
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    # Async versions of the task list/detail endpoints, for ASGI deployments
+    path("async/tasks/", AsyncTaskListView.as_view(), name="async-task-list"),
+    path(
+        "async/tasks/<int:pk>/",
+        AsyncTaskDetailView.as_view(),
+        name="async-task-detail",
+    ),
+]
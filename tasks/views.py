@@ -1,8 +1,35 @@
-from django_filters import rest_framework as filters
-from rest_framework import viewsets
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
 
-from .models import Task
-from .serializers import TaskSerializer
+from core.db import (
+    delete_rows,
+    is_pinned_to_primary,
+    pin_to_primary,
+    replica_reads,
+    use_replica_reads,
+)
+from core.docs import swagger_auto_schema
+
+from .conditional import ConditionalGet
+from .counts import get_count_filter, get_task_count, invalidate_task_counts
+from .export import CSVRenderer, NDJSONRenderer, iter_csv, iter_ndjson
+from .filters import TaskFilter, TaskFilterBackend, includes_archived
+from .models import Task, TaskTombstone, TaskWithArchived
+from .pagination import TaskKeysetPagination, TaskPageNumberPagination
+from .response_cache import completed_scope, response_cache, task_scope
+from .serializers import (
+    TASK_READ_FIELDS,
+    TaskBulkDeleteSerializer,
+    TaskSerializer,
+    serialize_task_rows,
+)
+from .sync import decode_watermark, sync_tasks
 
 
 class TaskViewSet(viewsets.ModelViewSet):
@@ -10,6 +37,343 @@ class TaskViewSet(viewsets.ModelViewSet):
 
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
-    filter_backends = [filters.DjangoFilterBackend]
-    filterset_fields = ["completed"]
+    filter_backends = [TaskFilterBackend]
+    filterset_class = TaskFilter
     ordering = ["created_at"]
+    pagination_class = TaskPageNumberPagination
+    keyset_pagination_class = TaskKeysetPagination
+    # Read-only actions served from the read replica, sync stays on the
+    # primary so its watermarks never skip rows the replica has not applied.
+    replica_actions = {"list", "retrieve", "export"}
+    # Read-only actions that also read the archived tasks, when the client
+    # asks for them with ``?include_archived=true``.
+    archive_actions = {"list", "retrieve", "export"}
+
+    @property
+    def paginator(self):
+        """
+        Use keyset pagination when the client opts in with
+        ``?pagination=cursor``, the default page number pagination otherwise.
+        """
+        if not hasattr(self, "_paginator"):
+            keyset = self.keyset_pagination_class
+            request = getattr(self, "request", None)
+            if (
+                request is not None
+                and request.query_params.get(keyset.mode_query_param)
+                == keyset.mode_query_value
+            ):
+                self._paginator = keyset()
+            else:
+                return super().paginator
+        return self._paginator
+
+    def dispatch(self, request, *args, **kwargs):
+        with use_replica_reads(False):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        """
+        Route the reads of read-only actions to the read replica, unless the
+        user wrote recently.
+        """
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and not is_pinned_to_primary(
+            request.user.id
+        ):
+            # Reset by the use_replica_reads() block of dispatch().
+            replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            request.method not in permissions.SAFE_METHODS
+            and response.status_code < 400
+        ):
+            pin_to_primary(getattr(request.user, "id", None))
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def get_queryset(self):
+        """
+        Return the tasks owned by the requesting user. Other users' tasks are
+        never listed and behave as if they did not exist. Archived tasks are
+        included when asked for, see `archive_actions`.
+        """
+        queryset = super().get_queryset()
+        if getattr(self, "swagger_fake_view", False):
+            # schema generation, there is no request user
+            return queryset.none()
+        if self.action in self.archive_actions and includes_archived(
+            self.request.query_params
+        ):
+            queryset = TaskWithArchived.objects.all()
+        return queryset.filter(owner_id=self.request.user.id)
+
+    def perform_create(self, serializer):
+        serializer.save(owner_id=self.request.user.id)
+
+    def list(self, request, *args, **kwargs):
+        """
+        List tasks, serialized straight from ``values()`` rows.
+
+        Responses are cached per user and URL until a task in the list's
+        scope changes. The ETag is derived from the latest ``updated_at``
+        and the number of the filtered tasks. There is no ``Last-Modified``,
+        deleting a task or moving it out of the filters does not move the
+        latest ``updated_at`` forward. The count
+        comes from the counter cache when it is kept for the filters,
+        otherwise it is read along with ``MAX(updated_at)`` in one aggregate
+        query. Unchanged lists get a 304 without being paginated or
+        serialized. Keyset pages and lists paged with ``?count=false`` are
+        not counted, see `list_without_count`.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        count_filter = get_count_filter(
+            self.filterset_class(request.query_params, request=request)
+        )
+        completed = None if count_filter is None else count_filter["completed"]
+        entry = response_cache.get(request, completed_scope(completed))
+        if entry.hit:
+            return self.get_cached_response(request, entry)
+
+        if not self.includes_count(request):
+            return self.list_without_count(request, queryset, entry)
+        if count_filter is None:
+            state = queryset.aggregate(
+                last_modified=Max("updated_at"), count=Count("id")
+            )
+        else:
+            state = queryset.aggregate(last_modified=Max("updated_at"))
+            state["count"] = get_task_count(request.user.id, completed, queryset)
+        conditional = ConditionalGet(
+            request, None, state["last_modified"], state["count"]
+        )
+        not_modified = conditional.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        queryset = queryset.values(*TASK_READ_FIELDS)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            data = self.get_paginated_response(serialize_task_rows(page)).data
+        else:
+            data = serialize_task_rows(list(queryset))
+        response_cache.set(entry, conditional, data)
+        return conditional.set_headers(Response(data))
+
+    def includes_count(self, request):
+        """Return whether the pagination counts the tasks."""
+        paginator = self.paginator
+        if isinstance(paginator, TaskKeysetPagination):
+            return False
+        if isinstance(paginator, TaskPageNumberPagination):
+            return paginator.get_include_count(request)
+        return True
+
+    def list_without_count(self, request, queryset, entry):
+        """
+        List tasks for keyset pages and ``?count=false``, without counting
+        them or reading their latest ``updated_at``. The ETag is derived from
+        the ids and ``updated_at`` of the tasks of the page, so the page is
+        read and serialized before a 304 can be answered.
+        """
+        page = self.paginate_queryset(queryset.values(*TASK_READ_FIELDS))
+        data = self.get_paginated_response(serialize_task_rows(page)).data
+        conditional = ConditionalGet(
+            request,
+            None,
+            [(row["id"], row["updated_at"]) for row in page],
+            data["next"],
+        )
+        not_modified = conditional.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        response_cache.set(entry, conditional, data)
+        return conditional.set_headers(Response(data))
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve a task, serialized straight from its ``values()`` row.
+
+        Responses are cached per user until the task changes. The ETag and
+        ``Last-Modified`` are derived from its ``updated_at``, an unchanged
+        task gets a 304 without being serialized.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        lookup = self.kwargs[lookup_url_kwarg]
+        # Only canonical ids match the scope bumped when the task changes.
+        canonical = lookup.isdigit() and str(int(lookup)) == lookup
+        entry = response_cache.get(request, task_scope(lookup) if canonical else None)
+        if entry.hit:
+            return self.get_cached_response(request, entry)
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*TASK_READ_FIELDS)
+        row = get_object_or_404(queryset, **{self.lookup_field: lookup})
+        self.check_object_permissions(request, row)
+        conditional = ConditionalGet(request, row["updated_at"], row["id"])
+        not_modified = conditional.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        data = serialize_task_rows([row])[0]
+        response_cache.set(entry, conditional, data)
+        return conditional.set_headers(Response(data))
+
+    def get_cached_response(self, request, entry):
+        """Return the response of a response cache hit, or a 304."""
+        not_modified = entry.conditional.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        return entry.conditional.set_headers(Response(entry.data))
+
+    def get_bulk_serializer(self, *args, **kwargs):
+        """
+        Return a list serializer for a batch of at most
+        ``TASKS_BULK_MAX_ITEMS`` tasks.
+        """
+        return self.get_serializer(
+            *args,
+            many=True,
+            allow_empty=False,
+            max_length=settings.TASKS_BULK_MAX_ITEMS,
+            **kwargs,
+        )
+
+    @swagger_auto_schema(
+        request_body=TaskSerializer(many=True),
+        responses={201: TaskSerializer(many=True)},
+    )
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request):
+        """
+        Create a batch of tasks. Errors are reported per item, in the order
+        of the request, and nothing is written unless every item is valid.
+        """
+        serializer = self.get_bulk_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save(owner_id=request.user.id)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        request_body=TaskSerializer(many=True),
+        responses={200: TaskSerializer(many=True)},
+    )
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        """
+        Partially update a batch of tasks, each item identified by its ``id``.
+        Errors are reported per item and nothing is written unless every item
+        is valid.
+        """
+        if (
+            not isinstance(request.data, list)
+            or len(request.data) > settings.TASKS_BULK_MAX_ITEMS
+        ):
+            # Let the list serializer report the error, without loading the
+            # tasks.
+            tasks = {}
+        else:
+            ids = [
+                item.get("id")
+                for item in request.data
+                if isinstance(item, dict) and isinstance(item.get("id"), int)
+            ]
+            tasks = self.get_queryset().in_bulk(ids)
+
+        serializer = self.get_bulk_serializer(tasks, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(request_body=TaskBulkDeleteSerializer)
+    @bulk_create.mapping.delete
+    def bulk_destroy(self, request):
+        """
+        Delete a batch of tasks by id with a single ``DELETE ... WHERE id IN``
+        and record their tombstones with a single ``INSERT``. Ids that do not
+        match a task are reported back in ``not_found``.
+        """
+        serializer = TaskBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = set(serializer.validated_data["ids"])
+
+        with transaction.atomic():
+            tasks = list(self.get_queryset().filter(id__in=ids).only("owner_id"))
+            found = {task.pk for task in tasks}
+            # Without loading the tasks again to send signals, the deleted
+            # tasks are accounted for below.
+            delete_rows(Task, found, router.db_for_write(Task))
+            TaskTombstone.objects.bulk_create(
+                TaskTombstone(task_id=task.pk, owner_id=task.owner_id) for task in tasks
+            )
+            invalidate_task_counts([request.user.id])
+            response_cache.invalidate_tasks(tasks)
+
+        return Response(
+            {"deleted": len(found), "not_found": sorted(ids - found)},
+            status=status.HTTP_200_OK,
+        )
+
+    @swagger_auto_schema(responses={200: "Stream of tasks as NDJSON or CSV"})
+    @action(
+        detail=False,
+        methods=["get"],
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+        pagination_class=None,
+    )
+    def export(self, request):
+        """
+        Stream every task matching the filters as NDJSON (default) or CSV,
+        selected with the ``Accept`` header or ``?format=ndjson|csv``.
+        Rows are read in chunks from a database cursor, so memory use does
+        not depend on the number of tasks.
+        """
+        chunk_size = settings.TASKS_EXPORT_CHUNK_SIZE
+        queryset = self.filter_queryset(self.get_queryset()).order_by(
+            "created_at", "id"
+        )
+        # The rows are read while the response streams, once dispatch() has
+        # reset the replica routing, so the database is picked now.
+        queryset = queryset.using(router.db_for_read(queryset.model))
+        rows = queryset.values(*TASK_READ_FIELDS).iterator(chunk_size=chunk_size)
+
+        renderer = request.accepted_renderer
+        if renderer.format == CSVRenderer.format:
+            content = iter_csv(rows, chunk_size)
+        else:
+            content = iter_ndjson(rows, chunk_size)
+
+        response = StreamingHttpResponse(
+            content, content_type=f"{renderer.media_type}; charset=utf-8"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="tasks.{renderer.format}"'
+        )
+        return response
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            {
+                "name": "since",
+                "in_": "query",
+                "description": "Watermark returned by the previous sync.",
+                "type": "string",
+            }
+        ],
+        responses={
+            200: "Tasks changed and ids of tasks deleted since the watermark",
+            410: "The watermark is too old, sync again without it",
+        },
+    )
+    @action(detail=False, methods=["get"], filter_backends=[], pagination_class=None)
+    def sync(self, request):
+        """
+        Return the tasks changed, in ``(updated_at, id)`` order, and the ids
+        of the tasks deleted since the ``since`` watermark, with the
+        watermark for the next sync. While ``has_more`` is true there are
+        more changes to fetch with the new watermark.
+        """
+        watermark = decode_watermark(request.query_params.get("since"))
+        return Response(
+            sync_tasks(request.user.id, watermark, settings.TASKS_SYNC_PAGE_SIZE)
+        )